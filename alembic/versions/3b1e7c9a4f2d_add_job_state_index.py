@@ -0,0 +1,23 @@
+"""Add index on job state
+
+Revision ID: 3b1e7c9a4f2d
+Revises: d0a6d945cf99
+Create Date: 2026-10-17 19:10:12.412870
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1e7c9a4f2d'
+down_revision = 'd0a6d945cf99'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_jobs_state_job_id', 'jobs', ['state', 'job_id'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_state_job_id', table_name='jobs')
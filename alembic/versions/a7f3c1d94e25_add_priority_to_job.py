@@ -0,0 +1,26 @@
+"""Add priority to job
+
+Revision ID: a7f3c1d94e25
+Revises: 8c4d2e6f1a3b
+Create Date: 2026-10-17 20:05:33.718402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7f3c1d94e25'
+down_revision = '8c4d2e6f1a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('jobs', sa.Column('priority', sa.Integer(), server_default='1', nullable=False))
+    op.create_index('ix_jobs_queue', 'jobs', ['state', 'pipeline', 'priority', 'job_id'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_queue', table_name='jobs')
+    op.drop_column('jobs', 'priority')
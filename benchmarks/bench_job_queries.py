@@ -0,0 +1,87 @@
+"""
+Benchmark the job read paths against a database with many jobs.
+
+Compares the previous listing path (hydrating every Job through the ORM,
+twice, before serializing it) with the JobRecord projection used by
+`JobRepository.get_jobs_page`. Run it with:
+
+    python benchmarks/bench_job_queries.py --jobs 100000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+from sequencing_report_service.models.db_models import SQLAlchemyBase, Job, State
+from sequencing_report_service.repositiories.job_repo import JobRepository
+
+
+def populate(engine, n_jobs):
+    """
+    Insert `n_jobs` finished jobs with a short log each
+    """
+    command = ';'.join(['nextflow', 'run', 'main.nf', '-profile', 'singularity', '--run_folder', '/data/runfolder'])
+    environment = json.dumps({'NXF_TEMP': '/tmp/', 'NXF_ANSI_LOG': 'false'})
+    rows = [
+        {'_command': command, '_environment': environment, 'pid': i, 'state': State.DONE, 'log': 'N E X T F L O W\n'}
+        for i in range(n_jobs)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Job), rows)
+
+
+def orm_listing(session_factory, limit):
+    """
+    The previous listing path: query all jobs twice, serialize every one of them
+    """
+    with JobRepository(session_factory) as job_repo:
+        for job in job_repo.session.query(Job).limit(limit).all():
+            job_repo.expunge_object(job)
+        return [job.to_dict() for job in job_repo.session.query(Job).limit(limit).all()]
+
+
+def record_listing(session_factory, limit):
+    """
+    The projection based listing path
+    """
+    with JobRepository(session_factory) as job_repo:
+        return [job.to_dict() for job in job_repo.get_jobs_page(limit=limit)]
+
+
+def measure(name, func, *args):
+    """
+    Run `func` and report its wall time and peak traced memory
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<28} {len(result):>8} jobs {elapsed * 1000:>10.1f} ms {peak / 2**20:>10.1f} MiB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=100_000, help='number of jobs in the database')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLAlchemyBase.metadata.create_all(engine)
+        populate(engine, args.jobs)
+        session_factory = scoped_session(sessionmaker(bind=engine))
+
+        for limit in (args.jobs, 100):
+            measure(f"orm, limit={limit}", orm_listing, session_factory, limit)
+            measure(f"records, limit={limit}", record_listing, session_factory, limit)
+
+
+if __name__ == '__main__':
+    main()
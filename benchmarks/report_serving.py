@@ -0,0 +1,122 @@
+"""
+Benchmark serving large reports through the ReportFileHandler, chunked
+through the StaticFileHandler and with sendfile.
+
+For each mode a server is started in a separate process, and a number of
+clients download a generated report of the given size at the same time.
+Reported are the throughput, the CPU time used by the server process and its
+peak resident set size, read from /proc, so this only runs on Linux.
+
+    python benchmarks/report_serving.py --size-mb 64 --clients 8 --requests 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import string
+import tempfile
+import time
+from pathlib import Path
+
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.web import Application
+
+from sequencing_report_service.app import routes
+from sequencing_report_service.repositiories.reports_repo import ReportsRepository
+
+
+def _write_report(reports_dir, size):
+    report_dir = Path(reports_dir) / "2024" / "bench_runfolder" / "reports" / "v1"
+    report_dir.mkdir(parents=True)
+    line = "".join(random.choices(string.ascii_letters, k=1023)) + "\n"
+    with open(report_dir / "multiqc_report.html", "w") as report_file:
+        for _ in range(size // len(line)):
+            report_file.write(line)
+
+
+def _serve(reports_dir, sock, sendfile):
+    reports_repo = ReportsRepository(reports_dir)
+    reports_repo.rescan()
+    app = Application(routes(reports_repo=reports_repo, report_sendfile=sendfile))
+    server = HTTPServer(app)
+    server.add_sockets([sock])
+    IOLoop.current().start()
+
+
+def _proc_stats(pid):
+    with open(f"/proc/{pid}/stat") as stat_file:
+        fields = stat_file.read().rsplit(")", 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    with open(f"/proc/{pid}/status") as status_file:
+        peak_rss_kb = next(int(line.split()[1]) for line in status_file if line.startswith("VmHWM:"))
+    return cpu_seconds, peak_rss_kb
+
+
+async def _download(url):
+    received = 0
+
+    def _count(chunk):
+        nonlocal received
+        received += len(chunk)
+
+    client = AsyncHTTPClient(force_instance=True, max_body_size=2 ** 40)
+    await client.fetch(url, streaming_callback=_count, decompress_response=False, request_timeout=600,
+                       headers={"Accept-Encoding": "identity"})
+    client.close()
+    return received
+
+
+async def _run_clients(url, clients, requests):
+    async def _client():
+        return sum([await _download(url) for _ in range(requests)])
+
+    return sum(await asyncio.gather(*[_client() for _ in range(clients)]))
+
+
+def _benchmark(reports_dir, sendfile, clients, requests):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(128)
+    sock.setblocking(False)
+    port = sock.getsockname()[1]
+    server = multiprocessing.Process(target=_serve, args=(reports_dir, sock, sendfile), daemon=True)
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{port}/reports/bench_runfolder/v1/"
+        # Warm up, so that the file is in the page cache and the runfolder indexed
+        asyncio.run(_run_clients(url, 1, 1))
+        cpu_before, _ = _proc_stats(server.pid)
+        start = time.monotonic()
+        received = asyncio.run(_run_clients(url, clients, requests))
+        elapsed = time.monotonic() - start
+        cpu_after, peak_rss_kb = _proc_stats(server.pid)
+    finally:
+        server.terminate()
+        server.join()
+    return received, elapsed, cpu_after - cpu_before, peak_rss_kb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64, help="size of the report")
+    parser.add_argument("--clients", type=int, default=8, help="number of clients downloading at the same time")
+    parser.add_argument("--requests", type=int, default=4, help="number of downloads per client")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as reports_dir:
+        _write_report(reports_dir, args.size_mb * 1024 * 1024)
+        print(f"{'mode':<10} {'MB/s':>8} {'server cpu s':>13} {'server peak rss MB':>19}")
+        for mode, sendfile in (("chunked", False), ("sendfile", True)):
+            received, elapsed, cpu_seconds, peak_rss_kb = _benchmark(reports_dir, sendfile, args.clients,
+                                                                     args.requests)
+            print(f"{mode:<10} {received / elapsed / 1024 ** 2:>8.0f} {cpu_seconds:>13.2f} "
+                  f"{peak_rss_kb / 1024:>19.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 Sets up routes and db for application, and allows it to be started.
 """
 
+import datetime
 import logging
 import functools
 
@@ -10,7 +11,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 from tornado.web import URLSpec as url
-from tornado.ioloop import PeriodicCallback
+from tornado.ioloop import IOLoop, PeriodicCallback
 
 from arteria.web.app import AppService
 
@@ -19,10 +20,19 @@ from alembic.command import upgrade as upgrade_db
 
 from sequencing_report_service.handlers.version_handler import VersionHandler
 from sequencing_report_service.handlers.job_handler import OneJobHandler, ManyJobHandler,\
-    JobStartHandler, JobStopHandler
-from sequencing_report_service.handlers.reports_handler import ReportFileHandler, ReportsHandler
+    JobStartHandler, JobPlanHandler, JobStopHandler, JobLogHandler, JobQueueHandler, JobTasksHandler
+from sequencing_report_service.handlers.reports_handler import ReportFileHandler, ReportsHandler, \
+    ReportArchiveHandler
+from sequencing_report_service.handlers.pipeline_handler import PipelinesHandler
+from sequencing_report_service.handlers.runfolder_handler import RunfoldersHandler
+from sequencing_report_service.handlers.metrics_handler import MetricsHandler, MetricHandler
 from sequencing_report_service.services.local_runner_service import LocalRunnerService
+from sequencing_report_service.services.pipeline_config_service import PipelineConfigService
+from sequencing_report_service.services.auto_start_service import AutoStartService
+from sequencing_report_service.services.report_compression_service import ReportCompressionService
+from sequencing_report_service.services.metrics_service import MetricsService
 from sequencing_report_service.repositiories.job_repo import JobRepository
+from sequencing_report_service.repositiories.metrics_repo import MetricsRepository
 from sequencing_report_service.repositiories.reports_repo import ReportsRepository
 from sequencing_report_service.repositiories.runfolder_repo import RunfolderRepository
 from sequencing_report_service.exceptions import ConfigurationError
@@ -40,10 +50,20 @@ def routes(**kwargs):
     return [
         url(r"/api/1.0/version", VersionHandler, name="version", kwargs=kwargs),
         url(r"/api/1.0/jobs/start/(\w+)/(?!.*\/)(.*)$", JobStartHandler, name="job_start", kwargs=kwargs),
+        url(r"/api/1.0/jobs/plan/(\w+)/(?!.*\/)(.*)$", JobPlanHandler, name="job_plan", kwargs=kwargs),
         url(r"/api/1.0/jobs/stop/(\d+)$", JobStopHandler, name="job_stop", kwargs=kwargs),
         url(r"/api/1.0/jobs/(\d+)$", OneJobHandler, name="one_job", kwargs=kwargs),
+        url(r"/api/1.0/jobs/(\d+)/log$", JobLogHandler, name="job_log", kwargs=kwargs),
+        url(r"/api/1.0/jobs/(\d+)/tasks$", JobTasksHandler, name="job_tasks", kwargs=kwargs),
         url(r"/api/1.0/jobs/$", ManyJobHandler, name="many_jobs", kwargs=kwargs),
+        url(r"/api/1.0/jobs/queue$", JobQueueHandler, name="job_queue", kwargs=kwargs),
+        url(r"/api/1.0/pipelines$", PipelinesHandler, name="pipelines", kwargs=kwargs),
+        url(r"/api/1.0/runfolders$", RunfoldersHandler, name="runfolders", kwargs=kwargs),
+        url(r"/api/1.0/metrics$", MetricsHandler, name="metrics", kwargs=kwargs),
+        url(r"/api/1.0/metrics/(.+)$", MetricHandler, name="metric", kwargs=kwargs),
         url(r"/reports/(?!.*\/)(.*)$", ReportsHandler, name="all_reports", kwargs=kwargs),
+        url(r"/reports/(\w+)/(v\d+|current)\.(tar|zip)$", ReportArchiveHandler, name="report_archive",
+            kwargs=kwargs),
         # Path is a required argument for the ReportsHandler (because it is subclassing the
         # static content handler, but it is not used. We use the configured repositories
         # to find the correct path for the report to serve. /JD 2018-11-27
@@ -86,6 +106,65 @@ def get_key_from_config(config, key):
         raise ConfigurationError("{} not specified in config".format(key)) from exc
 
 
+def get_optional_key_from_config(config, key, default=None):
+    """
+    Get the specific key from the provided config object, or `default` if the key
+    does not exist in the configuration.
+    :param config: dict-like object containing the config
+    :param key: key to look up
+    :param default: value to return if the key is not specified
+    :return: the configuration value
+    """
+    try:
+        return config[key]
+    except KeyError:
+        return default
+
+
+def _process_job_queue(runner_service):
+    try:
+        runner_service.process_job_queue()
+    except Exception:  # pylint: disable=W0703
+        log.exception("Failed to process the job queue")
+
+
+def _reload_pipeline_configs(pipeline_config_service):
+    try:
+        pipeline_config_service.reload()
+    except Exception:  # pylint: disable=W0703
+        log.exception("Failed to reload the pipeline configs")
+
+
+async def _rescan_runfolders(runfolder_repo, auto_start_service=None):
+    # Scanning the monitored directories may be slow, on NFS in particular,
+    # so it is done in a thread to not hold up requests meanwhile.
+    try:
+        changed = await IOLoop.current().run_in_executor(None, runfolder_repo.rescan)
+        if auto_start_service and changed:
+            auto_start_service.check(changed)
+    except Exception:  # pylint: disable=W0703
+        log.exception("Failed to rescan the monitored directories")
+
+
+def _auto_start_all(auto_start_service):
+    try:
+        auto_start_service.check_all()
+    except Exception:  # pylint: disable=W0703
+        log.exception("Failed to start pipelines on the runfolders which are ready")
+
+
+async def _rescan_reports(reports_repo, metrics_service=None):
+    try:
+        await IOLoop.current().run_in_executor(None, reports_repo.rescan)
+    except Exception:  # pylint: disable=W0703
+        log.exception("Failed to rescan the reports directory")
+    if metrics_service:
+        try:
+            await metrics_service.ingest_new_reports()
+        except Exception:  # pylint: disable=W0703
+            log.exception("Failed to ingest the metrics of new reports")
+
+
 def configure_routes(config):
     """
     Configure and return the list of routes for the application
@@ -110,25 +189,89 @@ def configure_routes(config):
     session_factory = scoped_session(sessionmaker())
     session_factory.configure(bind=engine)
 
+    # Load all pipeline configs up front, so that broken configs are reported
+    # at startup, and keep checking them for changes.
+    pipeline_config_service = PipelineConfigService(config['pipeline_config_dir'])
+    pipeline_config_service.reload()
+    pipeline_config_interval = get_optional_key_from_config(config, 'pipeline_config_poll_interval_seconds', 5)
+    PeriodicCallback(
+        functools.partial(_reload_pipeline_configs, pipeline_config_service),
+        pipeline_config_interval * 1000,
+    ).start()
+
     job_repo_factory = functools.partial(JobRepository, session_factory=session_factory)
     local_runner_service = LocalRunnerService(
         job_repo_factory,
         config['pipeline_config_dir'],
         config['nextflow_log_dirs'],
+        max_concurrent_jobs=get_optional_key_from_config(config, 'max_concurrent_jobs'),
+        max_concurrent_jobs_per_pipeline=get_optional_key_from_config(config, 'max_concurrent_jobs_per_pipeline'),
+        log_poll_interval=get_optional_key_from_config(config, 'log_poll_interval_seconds', 5),
     )
 
     monitored_dirs = get_key_from_config(config, 'monitored_directories')
-    runfolder_repo = RunfolderRepository(monitored_dirs)
+    runfolder_repo = RunfolderRepository(
+        monitored_dirs,
+        negative_cache_ttl=get_optional_key_from_config(config, 'runfolder_negative_cache_ttl_seconds', 30),
+    )
+    runfolder_repo.rescan()
     reports_dir = get_key_from_config(config, 'reports_dir')
-    reports_repo = ReportsRepository(reports_dir=reports_dir)
+    reports_repo = ReportsRepository(
+        reports_dir=reports_dir,
+        negative_cache_ttl=get_optional_key_from_config(config, 'reports_negative_cache_ttl_seconds', 60),
+        search_time_budget=get_optional_key_from_config(config, 'reports_search_time_budget_seconds', 1),
+    )
+    reports_repo.rescan()
+    metrics_service = MetricsService(functools.partial(MetricsRepository, session_factory=session_factory),
+                                     reports_repo)
+    reports_rescan_interval = get_optional_key_from_config(config, 'reports_rescan_interval_seconds', 30)
+    PeriodicCallback(
+        functools.partial(_rescan_reports, reports_repo, metrics_service),
+        reports_rescan_interval * 1000,
+    ).start()
+    report_compression_service = None
+    if get_optional_key_from_config(config, 'compress_reports', True):
+        report_compression_service = ReportCompressionService(
+            cache_dir=get_optional_key_from_config(config, 'report_cache_dir'),
+            encodings=get_optional_key_from_config(config, 'report_encodings'),
+        )
+
+    local_runner_service.reattach_running_jobs()
+
+    auto_start_pipelines = get_optional_key_from_config(config, 'auto_start_pipelines')
+    auto_start_service = None
+    if auto_start_pipelines:
+        ready_after = get_key_from_config(config, 'auto_start_ready_after')
+        if isinstance(ready_after, str):
+            ready_after = datetime.datetime.fromisoformat(ready_after)
+        auto_start_service = AutoStartService(local_runner_service, runfolder_repo, auto_start_pipelines,
+                                              ready_after=ready_after)
+        # Pick up the runfolders which became ready while the service was down,
+        # once the IOLoop is running, since starting jobs needs it
+        IOLoop.current().add_callback(_auto_start_all, auto_start_service)
+    runfolder_rescan_interval = get_optional_key_from_config(config, 'runfolder_rescan_interval_seconds', 30)
+    PeriodicCallback(
+        functools.partial(_rescan_runfolders, runfolder_repo, auto_start_service),
+        runfolder_rescan_interval * 1000,
+    ).start()
 
-    with job_repo_factory() as job_repo:
-        job_repo.clear_out_stale_jobs_at_startup()
+    # Jobs are started as soon as they are queued or another job finishes,
+    # checking the queue periodically as well picks up any jobs that were
+    # left pending, e.g. by a restart of the service.
+    job_queue_interval = get_optional_key_from_config(config, 'job_queue_interval_seconds', 10)
+    PeriodicCallback(
+        functools.partial(_process_job_queue, local_runner_service),
+        job_queue_interval * 1000,
+    ).start()
 
     return routes(config=config,
                   runner_service=local_runner_service,
+                  pipeline_config_service=pipeline_config_service,
                   runfolder_repo=runfolder_repo,
-                  reports_repo=reports_repo)
+                  reports_repo=reports_repo,
+                  metrics_service=metrics_service,
+                  report_compression_service=report_compression_service,
+                  report_sendfile=get_optional_key_from_config(config, 'report_sendfile', False))
 
 
 def start(package=__package__):
@@ -0,0 +1,151 @@
+"""
+Build tar and zip archives of directories as streams of chunks, without
+keeping more than a chunk of the archive in memory, or writing it to disk.
+"""
+
+import os
+import tarfile
+from stat import S_ISREG
+import zipfile
+
+CHUNK_SIZE = 256 * 1024
+
+ARCHIVE_CONTENT_TYPES = {
+    "tar": "application/x-tar",
+    "zip": "application/zip",
+}
+
+
+def _walk_files(directory, exclude=None):
+    """
+    Find the regular files in a directory, and its subdirectories, in sorted
+    order. Symlinks are not followed, so that the archive cannot include files
+    from outside of the directory.
+    :return: a generator of (path, path relative to `directory`, stat) tuples
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if exclude and exclude(name):
+                continue
+            path = os.path.join(root, name)
+            stat = os.lstat(path)
+            if S_ISREG(stat.st_mode):
+                yield path, os.path.relpath(path, directory), stat
+
+
+def _read_chunks(path, size):
+    """
+    Read `size` bytes of a file in chunks, padded with NUL if the file has
+    shrunk since its size was read, so that the archive stays consistent
+    """
+    remaining = size
+    with open(path, "rb") as source:
+        while remaining > 0:
+            chunk = source.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                chunk = b"\0" * min(CHUNK_SIZE, remaining)
+            remaining -= len(chunk)
+            yield chunk
+
+
+def tar_chunks(directory, arcname, exclude=None):
+    """
+    Stream a tar archive of a directory
+    :param directory: to archive
+    :param arcname: name of the directory in the archive
+    :param exclude: optional callable, files whose names it returns True for are left out
+    :return: a generator of chunks of the archive, as bytes
+    """
+    written = 0
+    for path, relative_path, stat in _walk_files(directory, exclude):
+        tarinfo = tarfile.TarInfo(f"{arcname}/{relative_path}")
+        tarinfo.size = stat.st_size
+        tarinfo.mtime = int(stat.st_mtime)
+        tarinfo.mode = stat.st_mode & 0o777
+        header = tarinfo.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        yield header
+        yield from _read_chunks(path, tarinfo.size)
+        padding = -tarinfo.size % tarfile.BLOCKSIZE
+        if padding:
+            yield b"\0" * padding
+        written += len(header) + tarinfo.size + padding
+
+    # The end of the archive is marked by two empty blocks, and archives are
+    # padded to a whole record
+    end = 2 * tarfile.BLOCKSIZE
+    end += -(written + end) % tarfile.RECORDSIZE
+    yield b"\0" * end
+
+
+class _ChunkBuffer:
+    """
+    An unseekable file object, which keeps what is written to it until it is taken
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        """
+        Keep the data until it is taken
+        """
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        """
+        The number of bytes written in total
+        """
+        return self._position
+
+    def seek(self, *args):
+        """
+        Seeking is not supported, which makes zipfile write the sizes of files after them
+        """
+        raise OSError("Seeking is not supported")
+
+    def flush(self):
+        """
+        Nothing to flush, data is kept until it is taken
+        """
+
+    def take(self):
+        """
+        Take the data written since the last time
+        :return: the data as bytes
+        """
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_chunks(directory, arcname, exclude=None):
+    """
+    Stream a zip archive of a directory, with the files compressed with deflate
+    :param directory: to archive
+    :param arcname: name of the directory in the archive
+    :param exclude: optional callable, files whose names it returns True for are left out
+    :return: a generator of chunks of the archive, as bytes
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for path, relative_path, _ in _walk_files(directory, exclude):
+            zipinfo = zipfile.ZipInfo.from_file(path, f"{arcname}/{relative_path}")
+            zipinfo.compress_type = zipfile.ZIP_DEFLATED
+            with zip_file.open(zipinfo, "w") as destination:
+                for chunk in _read_chunks(path, zipinfo.file_size):
+                    destination.write(chunk)
+                    data = buffer.take()
+                    if data:
+                        yield data
+    # The rest of the last file, and the central directory of the archive
+    yield buffer.take()
+
+
+ARCHIVE_FORMATS = {
+    "tar": tar_chunks,
+    "zip": zip_chunks,
+}
@@ -38,3 +38,18 @@ class NextflowConfigError(ConfigurationError):
     Exception thrown when there is a problem with the configuration of the nextflow job.
     """
     pass
+
+
+class MissingConfigVariables(NextflowConfigError, KeyError):
+    """
+    Exception thrown when a pipeline config, or samplesheet, refers to variables
+    which have no value. It is a KeyError, since that is what `str.format`
+    raises in this case.
+    """
+
+    def __init__(self, variables):
+        super().__init__(variables)
+        self.variables = variables
+
+    def __str__(self):
+        return f"Missing values for variables: {', '.join(self.variables)}"
@@ -1,12 +1,64 @@
 """
 Handlers for the sequencing_report_service
 """
+import datetime
+from urllib.parse import urlencode
+
+from tornado.web import HTTPError
 
 # Status codes
 OK = 200
 ACCEPTED = 202
 NO_CONTENT = 204
+PARTIAL_CONTENT = 206
 
+BAD_REQUEST = 400
 FORBIDDEN = 403
 NOT_FOUND = 404
+RANGE_NOT_SATISFIABLE = 416
 INTERNAL_SERVER_ERROR = 500
+
+
+def next_page_link(handler, route_name, page, limit, after):
+    """
+    Link to the next page of a listing which is paged with the `after` query
+    argument, keeping the other query arguments of the request
+    :param handler: the RequestHandler serving the current page
+    :param route_name: name of the route of the listing
+    :param page: the items on the current page
+    :param limit: the maximum number of items on a page
+    :param after: callable returning the value of `after` for the last item on the page
+    :return: the link, or None if this is the last page
+    """
+    if len(page) < limit:
+        return None
+    arguments = {
+        name: handler.get_query_arguments(name)
+        for name in handler.request.query_arguments
+        if name != 'after'
+    }
+    arguments['after'] = [after(page[-1])]
+    return (f"{handler.request.protocol}://"
+            f"{handler.request.host}"
+            f"{handler.reverse_url(route_name)}?{urlencode(arguments, doseq=True)}")
+
+
+def parse_datetime(name, value):
+    """
+    Parse an ISO 8601 datetime query argument. Timestamps are stored as naive
+    UTC in the database, so datetimes with a timezone are converted to that.
+    :param name: of the query argument
+    :param value: of the query argument
+    :return: a naive datetime
+    :raises: HTTPError, bad request, if `value` is not an ISO 8601 datetime
+    """
+    # Python before 3.11 does not accept Z for UTC
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise HTTPError(BAD_REQUEST, log_message=f"{name} must be an ISO 8601 datetime") from exc
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
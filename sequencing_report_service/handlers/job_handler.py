@@ -6,12 +6,18 @@
 Handlers start, stop and check jobs.
 """
 
+import os
+import re
+
 from tornado.web import HTTPError
 
 from arteria.web.handlers import BaseRestHandler
 
-from sequencing_report_service.handlers import ACCEPTED, NOT_FOUND, FORBIDDEN
-from sequencing_report_service.exceptions import UnableToStopJob, RunfolderNotFound
+from sequencing_report_service.handlers import ACCEPTED, NOT_FOUND, FORBIDDEN, BAD_REQUEST, PARTIAL_CONTENT, \
+    RANGE_NOT_SATISFIABLE, next_page_link, parse_datetime
+from sequencing_report_service.exceptions import UnableToStopJob, RunfolderNotFound, MissingConfigVariables
+from sequencing_report_service.models.db_models import State, Priority
+from sequencing_report_service.repositiories.job_repo import DEFAULT_PAGE_SIZE
 import importlib.metadata
 
 version = importlib.metadata.version("sequencing-report-service")
@@ -31,42 +37,145 @@ class OneJobHandler(BaseRestHandler):
     def get(self, job_id):
         """
         Will return the job object corresponding to a specific job id. It will
-        return or the form:
+        return or the form below, the log of the job is available from
+        /api/1.0/jobs/<job_id>/log. Pending jobs will also have a
+        `queue_position`, where 1 means that it is next in line to be started.
         {
             "job_id": 1,
             "command": "nextflow run socks --style emoji",
             "environment": "NXF_TEMP=/tmp",
+            "pipeline": "socks",
+            "priority": "normal",
             "pid": 3837,
             "state": "done",
             "created": "2018-11-27 12:06:26",
             "updated": "2018-11-27 12:06:44",
-            "log": "",
         }
         """
-        job = self.runner_service.get_job(job_id)
+        job = self.runner_service.get_job_record(job_id)
         if job:
             job_as_dicts = job.to_dict()
+            if job.state == State.PENDING:
+                job_as_dicts["queue_position"] = self.runner_service.get_queue_position(job.job_id)
             job_as_dicts["version"] = version
             self.write_object(job_as_dicts)
         else:
             raise HTTPError(NOT_FOUND)
 
 
+def _parse_byte_range(range_header, size):
+    """
+    Parse a `Range: bytes=...` header into a (start, end) offset pair, with
+    `end` being exclusive. Returns None for headers that are not supported
+    (e.g. multiple ranges), in which case the whole content should be served.
+    Raises a ValueError if the range cannot be satisfied.
+    """
+    matches = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not matches or not any(matches.groups()):
+        return None
+
+    first, last = matches.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+
+    if start >= end:
+        raise ValueError(f"Range {range_header} cannot be satisfied for size {size}")
+    return start, end
+
+
+def _tail_offset(log_file, size, lines, block_size):
+    """
+    Find the offset in `log_file` at which the last `lines` lines start,
+    reading the file backwards one block at a time.
+    """
+    if lines <= 0:
+        return size
+
+    position = size
+    if size:
+        log_file.seek(size - 1)
+        # A trailing newline ends the last line, rather than starting a new one
+        if log_file.read(1) == b"\n":
+            position = size - 1
+
+    newlines = 0
+    while position > 0:
+        read_size = min(block_size, position)
+        position -= read_size
+        log_file.seek(position)
+        block = log_file.read(read_size)
+        index = len(block)
+        while (index := block.rfind(b"\n", 0, index)) != -1:
+            newlines += 1
+            if newlines == lines:
+                return position + index + 1
+    return 0
+
+
 class ManyJobHandler(BaseRestHandler):
     """
     Handles checking the state of all jobs
     """
 
+    MAX_PAGE_SIZE = 1000
+    DATETIME_FILTERS = ('created_after', 'created_before', 'updated_after', 'updated_before')
+
     def initialize(self, runner_service, **kwargs):
         """
         Initalize a new instance of ManyJobHandler.
         """
         self.runner_service = runner_service
 
+    def _parse_filters(self):
+        filters = {}
+
+        try:
+            after = self.get_query_argument('after', None)
+            if after is not None:
+                filters['after'] = int(after)
+            filters['limit'] = int(self.get_query_argument('limit', DEFAULT_PAGE_SIZE))
+        except ValueError as exc:
+            raise HTTPError(BAD_REQUEST, log_message="after and limit must be integers") from exc
+
+        if not 0 < filters['limit'] <= self.MAX_PAGE_SIZE:
+            raise HTTPError(BAD_REQUEST, log_message=f"limit must be between 1 and {self.MAX_PAGE_SIZE}")
+
+        states = [
+            state
+            for argument in self.get_query_arguments('state')
+            for state in argument.split(',')
+            if state
+        ]
+        if states:
+            try:
+                filters['states'] = [State(state) for state in states]
+            except ValueError as exc:
+                raise HTTPError(BAD_REQUEST, log_message=f"unknown state in {states}") from exc
+
+        for name in self.DATETIME_FILTERS:
+            value = self.get_query_argument(name, None)
+            if value:
+                filters[name] = parse_datetime(name, value)
+
+        return filters
+
     def get(self):
         """
-        Will return the status of all jobs (or fewer depending on filter). The
-        return json has the format:
+        Will return one page of jobs, ordered by job id. The following query
+        parameters are supported:
+            - `after`: only return jobs with a job id larger than this
+            - `limit`: maximum number of jobs to return (default 100, max 1000)
+            - `state`: only return jobs in this state, may be repeated or comma separated
+            - `created_after`, `created_before`, `updated_after`, `updated_before`:
+              ISO 8601 datetimes to filter on
+        e.g.:
+            curl -w'\n' 'localhost:9999/api/1.0/jobs/?state=done,error&created_after=2018-11-27&limit=2'
+
+        The return json has the format below, where `next` is a link to the next
+        page, or null if this is the last page:
 
         {
         "jobs": [
@@ -74,28 +183,198 @@ class ManyJobHandler(BaseRestHandler):
                 "job_id": 1,
                 "command": "nextflow run socks --style emoji",
                 "environment": "NXF_TEMP=/tmp",
+                "pipeline": "socks",
+                "priority": "normal",
                 "pid": 3837,
                 "state": "done",
                 "created": "2018-11-27 12:06:26",
                 "updated": "2018-11-27 12:06:44",
-                "log": "",
             },
             {
                 "job_id": 2,
                 "command": "nextflow run socks --style ascii",
                 "environment": "NXF_TEMP=/tmp",
+                "pipeline": "socks",
+                "priority": "urgent",
                 "pid": 4394,
                 "state": "done",
                 "created": "2018-11-27 12:09:59",
                 "updated": "2018-11-27 12:11:11"
-                "log": "",
             }
-            ]
+            ],
+        "next": "http://localhost:9999/api/1.0/jobs/?state=done%2Cerror&created_after=2018-11-27&limit=2&after=2"
         }
         """
-        jobs = self.runner_service.get_jobs()
+        filters = self._parse_filters()
+        jobs = self.runner_service.get_jobs(**filters)
         jobs_as_dicts = list(map(lambda job: job.to_dict(), jobs))
-        self.write_object({"jobs": jobs_as_dicts, "version": version})
+        self.write_object({
+            "jobs": jobs_as_dicts,
+            "next": next_page_link(self, 'many_jobs', jobs, filters['limit'], lambda job: job.job_id),
+            "version": version,
+        })
+
+
+class JobQueueHandler(BaseRestHandler):
+    """
+    Handle checking the state of the job queue.
+    """
+
+    def initialize(self, runner_service, **kwargs):
+        """
+        Initalize a new instance of JobQueueHandler.
+        """
+        self.runner_service = runner_service
+
+    def get(self):
+        """
+        Will return the running jobs, the pending jobs ordered by priority and
+        age, and the configured concurrency limits (null
+        means no limit), e.g.:
+        {
+            "depth": 2,
+            "running": [3, 4],
+            "pending": [5, 6],
+            "max_concurrent_jobs": 2,
+            "max_concurrent_jobs_per_pipeline": {"seqreports": 2},
+            "version": "1.6.0"
+        }
+        """
+        queue_status = self.runner_service.get_queue_status()
+        self.write_object({
+            "depth": len(queue_status["pending"]),
+            **queue_status,
+            "version": version,
+        })
+
+
+class JobTasksHandler(BaseRestHandler):
+    """
+    Handle checking the performance of the tasks run by a job.
+    """
+
+    def initialize(self, runner_service, **kwargs):
+        """
+        Initalize a new instance of JobTasksHandler.
+        """
+        self.runner_service = runner_service
+
+    def get(self, job_id):
+        """
+        Will return the performance of the tasks the job has run so far, as
+        reported in its Nextflow trace file, aggregated per process. Processes
+        are ordered by the total time their tasks took, so the slowest steps of
+        the pipeline come first. Times are in milliseconds, and memory and I/O
+        in bytes:
+        {
+            "job_id": 1,
+            "processes": [
+                {
+                    "process": "FASTQC",
+                    "tasks": 8,
+                    "failed": 0,
+                    "total_realtime_ms": 1843000,
+                    "max_realtime_ms": 312000,
+                    "mean_cpu_percent": 97.3,
+                    "max_peak_rss": 524288000,
+                    "read_bytes": 12884901888,
+                    "write_bytes": 104857600
+                }
+            ],
+            "version": "1.6.0"
+        }
+        If there is no such job the status code will be 404 (NOT_FOUND).
+        """
+        if not self.runner_service.get_job_record(int(job_id)):
+            raise HTTPError(NOT_FOUND)
+
+        self.write_object({
+            "job_id": int(job_id),
+            "processes": self.runner_service.get_task_summary(int(job_id)),
+            "version": version,
+        })
+
+
+class JobLogHandler(BaseRestHandler):
+    """
+    Handle streaming the log of a job.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def initialize(self, runner_service, **kwargs):
+        """
+        Initalize a new instance of JobLogHandler.
+        """
+        self.runner_service = runner_service
+
+    async def get(self, job_id):
+        """
+        Will return the log of the job as plain text, e.g.:
+            curl -w'\n' localhost:9999/api/1.0/jobs/1/log
+
+        The log is streamed in chunks, so it is never loaded fully into memory.
+        Use `?tail=N` to only get the last N lines of the log, or a `Range`
+        header (e.g. `Range: bytes=1024-`) to get part of it, which can be used
+        to follow the log of a running job. If there is no log for the job, the
+        status code will be 404 (NOT_FOUND).
+        """
+        try:
+            tail = self.get_query_argument("tail", None)
+            tail = int(tail) if tail is not None else None
+        except ValueError as exc:
+            raise HTTPError(BAD_REQUEST, log_message="tail must be an integer") from exc
+
+        log_file = self.runner_service.open_job_log(int(job_id))
+        if not log_file:
+            raise HTTPError(NOT_FOUND)
+
+        with log_file:
+            size = log_file.seek(0, os.SEEK_END)
+            start, end = 0, size
+            range_header = self.request.headers.get("Range")
+
+            if tail is not None:
+                start = _tail_offset(log_file, size, tail, self.CHUNK_SIZE)
+            elif range_header:
+                try:
+                    byte_range = _parse_byte_range(range_header, size)
+                except ValueError:
+                    self.set_status(RANGE_NOT_SATISFIABLE)
+                    self.set_header("Content-Range", f"bytes */{size}")
+                    return
+                if byte_range:
+                    start, end = byte_range
+                    self.set_status(PARTIAL_CONTENT)
+                    self.set_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+
+            self.set_header("Content-Type", "text/plain; charset=utf-8")
+            self.set_header("Accept-Ranges", "bytes")
+            self.set_header("Content-Length", end - start)
+
+            log_file.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = log_file.read(min(self.CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                self.write(chunk)
+                await self.flush()
+
+
+def _job_arguments(request_data):
+    """
+    Get the arguments which determine the command of a job from the body of
+    a start, or plan, request
+    :param request_data: the body of the request as a dict
+    :return: a dict of keyword arguments for `LocalRunnerService.start` and `LocalRunnerService.plan`
+    """
+    return {
+        "input_samplesheet_content": request_data.get("input_samplesheet_content", ""),
+        "ext_args": request_data.get("ext_args", "").split(),
+        "config_params": request_data.get("config_parameters", {}),
+    }
 
 
 class JobStartHandler(BaseRestHandler):
@@ -122,17 +401,42 @@ class JobStartHandler(BaseRestHandler):
             - `input_samplesheet_content`: content of the nf-core input samplesheet to
             input to the pipeline
             - `ext_args`: extra arguments to pass to the pipeline
+            - `priority`: priority class of the job in the queue, one of `urgent`,
+            `normal` (default) or `bulk`
+            - `idempotency_key`: key identifying the request, can also be passed
+            in the `Idempotency-Key` header
+            - `force`: set to `true` to run the job even if an identical job
+            has already finished on the unchanged runfolder
+
+        Starting jobs is idempotent. If a job started with the same idempotency
+        key, or with the same arguments if no key is given, is still pending or
+        running, the link to that job is returned instead of starting a new one.
+        The same goes for a job which has finished successfully with the same
+        command on the runfolder, unless it has changed since, or `force` is set.
         """
+        request_data = self.body_as_object()
+        priority_name = request_data.get("priority", "normal")
+        try:
+            if not isinstance(priority_name, str):
+                raise KeyError(priority_name)
+            priority = Priority[priority_name.upper()]
+        except KeyError as exc:
+            raise HTTPError(
+                status_code=BAD_REQUEST,
+                log_message=f"Unknown priority: {priority_name}"
+            ) from exc
+
         try:
-            request_data = self.body_as_object()
             runfolder_path = self.runfolder_repo.get_runfolder(runfolder)
-            
+
             job_id = self.runner_service.start(
                 pipeline,
                 runfolder_path=runfolder_path,
-                input_samplesheet_content=request_data.get("input_samplesheet_content", ""),
-                ext_args=request_data.get("ext_args", "").split(" "),
-                config_params=request_data.get("config_parameters", {}),
+                **_job_arguments(request_data),
+                priority=priority,
+                idempotency_key=(request_data.get("idempotency_key")
+                                 or self.request.headers.get("Idempotency-Key")),
+                force=request_data.get("force") in (True, "true"),
             )
             self.set_status(status_code=ACCEPTED)
             self.write_object(
@@ -149,6 +453,60 @@ class JobStartHandler(BaseRestHandler):
                 status_code=NOT_FOUND,
                 log_message=str(exc)
             ) from exc
+        except MissingConfigVariables as exc:
+            raise HTTPError(
+                status_code=BAD_REQUEST,
+                log_message=str(exc)
+            ) from exc
+
+
+class JobPlanHandler(BaseRestHandler):
+    """
+    Handle planning jobs, i.e. rendering them without starting them.
+    """
+
+    def initialize(self, runner_service, runfolder_repo, **kwargs):
+        """
+        Initalize a new instance of JobPlanHandler.
+        """
+        self.runner_service = runner_service
+        self.runfolder_repo = runfolder_repo
+
+    def post(self, pipeline, runfolder):
+        """
+        Posting to this endpoint will render the job that posting to the
+        corresponding start endpoint would start, without starting it or
+        writing anything to the runfolder, e.g.:
+            curl -X POST -w'\n' localhost:9999/api/1.0/jobs/plan/socks/foo_runfolder
+        It accepts the same `input_samplesheet_content`, `ext_args` and
+        `config_parameters` parameters as the start endpoint, and returns:
+            {
+                "command": ["nextflow", "run", ...],
+                "environment": {...},
+                "input_samplesheet_path": "/path/to/foo_runfolder/socks_samplesheet.csv",
+                "input_samplesheet_content": "...",
+                "input_fingerprint": "...",
+                "reusable_job_id": 130,
+                "version": "1.0.0"
+            }
+        where `reusable_job_id` is the finished job the start endpoint would
+        return instead of starting a new one, if any.
+        """
+        request_data = self.body_as_object()
+        try:
+            runfolder_path = self.runfolder_repo.get_runfolder(runfolder)
+            plan = self.runner_service.plan(pipeline, runfolder_path=runfolder_path, **_job_arguments(request_data))
+        except (RunfolderNotFound, FileNotFoundError) as exc:
+            raise HTTPError(
+                status_code=NOT_FOUND,
+                log_message=str(exc)
+            ) from exc
+        except MissingConfigVariables as exc:
+            raise HTTPError(
+                status_code=BAD_REQUEST,
+                log_message=str(exc)
+            ) from exc
+        self.write_object({**plan, 'version': version})
 
 
 class JobStopHandler(BaseRestHandler):
@@ -0,0 +1,120 @@
+# pylint: disable=W0223,W0221,W0511,W0201
+# W0201 needs to be disabled because this is the way that tornado demands that handlers
+#       are setup
+# TODO: remove these exceptions, see DEVELOP-440
+"""
+Handlers to query the metrics of MultiQC reports across runfolders
+"""
+import datetime
+
+from tornado.web import HTTPError
+
+from arteria.web.handlers import BaseRestHandler
+
+from sequencing_report_service.handlers import BAD_REQUEST, parse_datetime
+from sequencing_report_service.repositiories.metrics_repo import DEFAULT_VERSION_LIMIT, METRIC_LEVELS
+
+import importlib.metadata
+
+version = importlib.metadata.version("sequencing-report-service")
+
+
+class MetricsHandler(BaseRestHandler):
+    """
+    List the metrics which have been ingested from MultiQC reports
+    """
+
+    def initialize(self, metrics_service, **kwargs):
+        """
+        Initialize new MetricsHandler
+        """
+        self.metrics_service = metrics_service
+
+    def get(self):
+        """
+        Will return the names of the metrics which have been ingested from the
+        general stats (level `sample`) and the per-lane tables (level `lane`)
+        of the MultiQC reports, e.g.:
+        {
+            "metrics": [
+                {"metric": "FastQC.percent_duplicates", "level": "sample"},
+                {"metric": "bcl2fastq.yieldQ30", "level": "lane"}
+            ],
+            "version": "1.0.0"
+        }
+        """
+        self.write_object({"metrics": self.metrics_service.get_metric_names(), "version": version})
+
+
+class MetricHandler(BaseRestHandler):
+    """
+    Query the values of one metric across runfolders
+    """
+
+    MAX_LIMIT = 10000
+
+    def initialize(self, metrics_service, **kwargs):
+        """
+        Initialize new MetricHandler
+        """
+        self.metrics_service = metrics_service
+
+    def get(self, metric):
+        """
+        Will return the values of the metric in the most recent report versions,
+        oldest first. The following query parameters are supported:
+            - `level`: `sample` (default) for general stats, or `lane` for per-lane metrics
+            - `runfolder`: only include this runfolder, may be repeated
+            - `since`, `until`: ISO 8601 datetimes, only include reports made in this range
+            - `limit`: maximum number of report versions to include (default 100, max 10000)
+            - `all_versions`: set to `true` to include all versions of the report of
+              each runfolder, not only the latest one
+        e.g. the yield over Q30 per lane, in the latest 500 runs:
+            curl -w'\\n' 'localhost:9999/api/1.0/metrics/bcl2fastq.yieldQ30?level=lane&limit=500'
+
+        The return json has the format below. Earlier report versions are fetched
+        by passing the `report_time` of the first report version as `until`.
+        {
+            "metric": "bcl2fastq.yieldQ30",
+            "level": "lane",
+            "reports": [
+                {
+                    "runfolder": "240101_A00001_0001_AHXXXXXXXX",
+                    "version": "v1",
+                    "report_time": "2024-01-02T03:04:05+00:00",
+                    "values": [{"lane": 1, "value": 123456789.0}]
+                }
+            ],
+            "version": "1.0.0"
+        }
+        """
+        level = self.get_query_argument('level', 'sample')
+        if level not in METRIC_LEVELS:
+            raise HTTPError(BAD_REQUEST, log_message=f"level must be one of {sorted(METRIC_LEVELS)}")
+        try:
+            limit = int(self.get_query_argument('limit', DEFAULT_VERSION_LIMIT))
+        except ValueError as exc:
+            raise HTTPError(BAD_REQUEST, log_message="limit must be an integer") from exc
+        if not 0 < limit <= self.MAX_LIMIT:
+            raise HTTPError(BAD_REQUEST, log_message=f"limit must be between 1 and {self.MAX_LIMIT}")
+
+        filters = {}
+        for name in ('since', 'until'):
+            value = self.get_query_argument(name, None)
+            if value:
+                filters[name] = parse_datetime(name, value)
+
+        reports = self.metrics_service.get_metric(
+            metric,
+            level=level,
+            runfolders=self.get_query_arguments('runfolder'),
+            all_versions=self.get_query_argument('all_versions', 'false') == 'true',
+            limit=limit,
+            **filters,
+        )
+        for report in reports:
+            report_time = report['report_time']
+            if not report_time.tzinfo:
+                report_time = report_time.replace(tzinfo=datetime.timezone.utc)
+            report['report_time'] = report_time.isoformat()
+        self.write_object({"metric": metric, "level": level, "reports": reports, "version": version})
@@ -0,0 +1,43 @@
+# pylint: disable=W0223,W0221,W0511,W0201
+# W0201 needs to be disabled because this is the way that tornado demands that handlers
+#       are setup
+# TODO: remove these exceptions, see DEVELOP-440
+"""
+Handlers related to pipelines
+"""
+from arteria.web.handlers import BaseRestHandler
+
+import importlib.metadata
+
+version = importlib.metadata.version("sequencing-report-service")
+
+
+class PipelinesHandler(BaseRestHandler):
+    """
+    List the pipelines which jobs can be started with
+    """
+
+    def initialize(self, pipeline_config_service, **kwargs):
+        """
+        Initialize new PipelinesHandler
+        """
+        self.pipeline_config_service = pipeline_config_service
+
+    def get(self):
+        """
+        Returns the pipelines which have a config, with the SHA-256 hash of the
+        loaded config and when it was loaded. If the config failed to load the
+        last time it changed, the error is included, e.g.:
+        {
+            "pipelines": [
+                {
+                    "pipeline": "seqreports",
+                    "config_hash": "9f86d081884c7d65...",
+                    "loaded_at": "2024-01-01T12:00:00+00:00",
+                    "error": null
+                }
+            ],
+            "version": "1.0.0"
+        }
+        """
+        self.write_object({"pipelines": self.pipeline_config_service.get_pipelines(), "version": version})
@@ -6,14 +6,34 @@
 Handlers to retrieve links to reports, and actual report files.
 """
 
+import asyncio
+import datetime
+import logging
+import mimetypes
+import os
 import re
 
-from tornado.web import StaticFileHandler, HTTPError
+from tornado.ioloop import IOLoop
+from tornado.iostream import SSLIOStream, StreamClosedError
+from tornado.web import RequestHandler, StaticFileHandler, HTTPError
 
 from arteria.web.handlers import BaseRestHandler
 
 from sequencing_report_service.handlers import NOT_FOUND
+from sequencing_report_service.archive import ARCHIVE_CONTENT_TYPES, ARCHIVE_FORMATS
 from sequencing_report_service.exceptions import RunfolderNotFound
+from sequencing_report_service.services.report_compression_service import SUFFIXES, accepted_encodings
+
+log = logging.getLogger(__name__)
+
+
+async def _warm_reports_repo(reports_repo, runfolder):
+    """
+    Look up runfolders which are not in the memory of the reports repository
+    in an executor, so that searching the file system does not block the IOLoop
+    """
+    if not reports_repo.is_cached(runfolder):
+        await IOLoop.current().run_in_executor(None, reports_repo.warm, runfolder)
 
 
 class ReportsHandler(BaseRestHandler):
@@ -27,36 +47,67 @@ class ReportsHandler(BaseRestHandler):
             "http://localhost:9999/reports/foo_runfolder/v2/"
             ]
         }
+    together with the metadata of each version, see `get`.
     """
 
-    def initialize(self, reports_repo, **kwargs):
+    def initialize(self, reports_repo, report_compression_service=None, **kwargs):
         """
         Instantiate a new ReportsHandler
         """
         self._reports_repo = reports_repo
+        self._report_compression_service = report_compression_service
 
-    def get(self, runfolder):
+    def _version_to_dict(self, runfolder, version):
+        compressed = []
+        if self._report_compression_service and version['mtime_ns'] is not None:
+            compressed = self._report_compression_service.get_encodings(version['path'], version['mtime_ns'])
+        mtime = version['mtime']
+        return {
+            'version': version['version'],
+            'link': '{}://{}{}'.format(self.request.protocol,
+                                       self.request.host,
+                                       self.reverse_url('report', '{}/{}'.format(runfolder, version['version']))),
+            'target': version['target'],
+            'size': version['size'],
+            'mtime': datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc).isoformat() if mtime else None,
+            'compressed': compressed,
+        }
+
+    async def get(self, runfolder):
         """
         Will return all reports available for a specific runfolder on the format:
             {
             "links": [
-                "http://localhost:9999/reports/foo_runfolder/v1/",
                 "http://localhost:9999/reports/foo_runfolder/current/",
+                "http://localhost:9999/reports/foo_runfolder/v1/",
                 "http://localhost:9999/reports/foo_runfolder/v2/"
+                ],
+            "versions": [
+                {
+                    "version": "current",
+                    "link": "http://localhost:9999/reports/foo_runfolder/current/",
+                    "target": "v2",
+                    "size": 52428800,
+                    "mtime": "2024-01-02T03:04:05+00:00",
+                    "compressed": ["gzip"]
+                },
+                ...
                 ]
             }
+        where `target` is the version `current` links to, or null for other
+        versions, `size` and `mtime` are those of the report file, and
+        `compressed` lists the encodings the report can be served compressed
+        with. The metadata is cached, and updated when the reports of the
+        runfolder change, so this does not read the reports directory.
         If there were no reports found for the specific runfolder the status will be 404 (NOT_FOUND).
         """
+        await _warm_reports_repo(self._reports_repo, runfolder)
         try:
-            report_versions = self._reports_repo.get_all_report_versions_for_runfolder(runfolder)
-            links = []
-            for version in report_versions:
-                links.append('{}://{}{}'.format(self.request.protocol,
-                                                self.request.host,
-                                                self.reverse_url('report', '{}/{}'.format(runfolder, version))))
-            self.write({'links': links})
+            report_versions = self._reports_repo.get_report_versions(runfolder)
         except RunfolderNotFound as exc:
             raise HTTPError(NOT_FOUND) from exc
+        versions = [self._version_to_dict(runfolder, version) for version in report_versions]
+        self.write({'links': [version['link'] for version in versions], 'versions': versions})
 
 
 class ReportFileHandler(StaticFileHandler):
@@ -65,12 +116,78 @@ class ReportFileHandler(StaticFileHandler):
     /<api route>/<runfolder_name>/<version, e.g. v1 or v2> or /<api route>/<runfolder_name>/current.
     This first option will return the version of the report specified. The second option will return the
     report which is set as current (most often the most recent one).
+
+    If a `report_compression_service` is given, reports are served compressed
+    to clients which accept it, once the compressed variant of the report has
+    been built. The ETag of a report is made from the inode, size and mtime of
+    the report file, so that it does not have to be read to check if a client
+    has the report cached. Reports with a version number never change, so
+    clients are told to cache them for good.
+
+    If `report_sendfile` is set, whole reports are sent with `os.sendfile`,
+    so that the kernel copies them from the file straight to the socket
+    rather than through Python in chunks. The connection is closed once the
+    report has been sent. Range requests, HEAD requests and TLS connections
+    are served by the StaticFileHandler as usual.
     """
 
-    def initialize(self, path, reports_repo, default_filename=None, **kwargs):
+    def initialize(self, path, reports_repo, default_filename=None, report_compression_service=None,
+                   report_sendfile=False, **kwargs):
         self._reports_repo = reports_repo
+        self._report_compression_service = report_compression_service
+        self._report_sendfile = report_sendfile
+        self._report_path = None
+        self._version = None
+        self._encoding = None
         super().initialize(path, default_filename=default_filename)
 
+    async def get(self, path, include_body=True):
+        # Resolve the runfolder before `validate_absolute_path` is called, so
+        # that it does not search the file system in the IOLoop
+        await _warm_reports_repo(self._reports_repo, path.split('/', 1)[0])
+        if include_body and self._can_sendfile():
+            await self._sendfile(path)
+        else:
+            await super().get(path, include_body=include_body)
+
+    def _can_sendfile(self):
+        connection = self.request.connection
+        return (self._report_sendfile
+                and not self.request.headers.get("Range")
+                and hasattr(connection, "detach")
+                and not isinstance(getattr(connection, "stream", None), SSLIOStream))
+
+    async def _sendfile(self, path):
+        """
+        Serve the report like `StaticFileHandler.get` does, but send the
+        contents of it with `os.sendfile`, on a connection detached from the
+        HTTP server
+        """
+        self.path = self.parse_url_path(path)
+        absolute_path = self.get_absolute_path(self.root, self.path)
+        self.absolute_path = self.validate_absolute_path(self.root, absolute_path)
+        if self.absolute_path is None:
+            return
+
+        self.modified = self.get_modified_time()
+        self.set_headers()
+        if self.should_return_304():
+            self.set_status(304)
+            return
+
+        with open(self.absolute_path, "rb") as report_file:
+            self.set_header("Content-Length", os.fstat(report_file.fileno()).st_size)
+            self.set_header("Connection", "close")
+            await self.flush()
+            self.application.log_request(self)
+            stream = self.detach()
+            try:
+                await asyncio.get_running_loop().sock_sendfile(stream.socket, report_file)
+            except OSError as exc:
+                log.info("Failed to send %s: %s", self.absolute_path, exc)
+            finally:
+                stream.close()
+
     def validate_absolute_path(self, root, absolute_path):
         # This regex will match the following type of paths
         # <path_to_root>/reports/foo_runfolder/current
@@ -97,4 +214,114 @@ class ReportFileHandler(StaticFileHandler):
         except RunfolderNotFound as exc:
             raise HTTPError(NOT_FOUND) from exc
 
+        self._report_path = report_path
+        self._version = version
+        if self._report_compression_service:
+            self.set_header("Vary", "Accept-Encoding")
+            accepted = accepted_encodings(self.request.headers.get("Accept-Encoding"))
+            encoding, variant_path = self._report_compression_service.get_variant(report_path, accepted)
+            if encoding:
+                self._encoding = encoding
+                self.set_header("Content-Encoding", encoding)
+                return str(variant_path)
+            if accepted.intersection(self._report_compression_service.encodings) and os.path.isfile(report_path):
+                # Serve this request uncompressed, rather than waiting for the report to be compressed
+                self._report_compression_service.build_variants(report_path)
+
         return report_path
+
+    def compute_etag(self):
+        try:
+            stat = os.stat(self._report_path)
+        except OSError:
+            return None
+        etag = f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+        if self._encoding:
+            etag += f"-{self._encoding}"
+        return f'"{etag}"'
+
+    def get_content_type(self):
+        if self._encoding:
+            return mimetypes.guess_type(self._report_path)[0] or "application/octet-stream"
+        return super().get_content_type()
+
+    def get_cache_time(self, path, modified, mime_type):
+        if self._version != "current":
+            return self.CACHE_MAX_AGE
+        return 0
+
+    def set_extra_headers(self, path):
+        if self._version != "current":
+            self.set_header("Cache-Control", f"public, max-age={self.CACHE_MAX_AGE}, immutable")
+        else:
+            # The current report changes when a new version is made, so clients have to check the ETag
+            self.set_header("Cache-Control", "no-cache")
+
+
+def _is_compressed_variant(name):
+    """
+    Check if a file is a compressed variant of a report, built by the ReportCompressionService
+    """
+    return name.startswith('.multiqc_report.html.') or name in {
+        'multiqc_report.html' + suffix for suffix in SUFFIXES.values()
+    }
+
+
+class ReportArchiveHandler(RequestHandler):
+    """
+    This handler will return a whole report version, i.e. the report html file
+    together with the MultiQC data and plots, as a tar or zip archive, e.g.
+    /reports/<runfolder_name>/v1.tar or /reports/<runfolder_name>/current.zip.
+    The archive is built while it is sent, a chunk at a time, in an executor,
+    so it is never kept in memory or on disk as a whole. Building it stops if
+    the client goes away.
+    """
+
+    def initialize(self, reports_repo, **kwargs):
+        """
+        Instantiate a new ReportArchiveHandler
+        """
+        self._reports_repo = reports_repo
+        self._closed = False
+
+    def on_connection_close(self):
+        self._closed = True
+
+    async def get(self, runfolder, version, archive_format):
+        """
+        Will return the report version as an archive, with the files in a
+        directory named <runfolder_name>_<version>, e.g.:
+            curl -o foo_runfolder_v1.tar localhost:9999/reports/foo_runfolder/v1.tar
+
+        The archive is sent with chunked transfer encoding, since its size is
+        not known up front. If there is no such runfolder, or report version,
+        the status code will be 404 (NOT_FOUND).
+        """
+        await _warm_reports_repo(self._reports_repo, runfolder)
+        try:
+            report_dir = self._reports_repo.get_report_with_version(runfolder, version).parent
+        except RunfolderNotFound as exc:
+            raise HTTPError(NOT_FOUND) from exc
+        if not report_dir.is_dir():
+            raise HTTPError(NOT_FOUND)
+
+        arcname = f"{runfolder}_{version}"
+        self.set_header("Content-Type", ARCHIVE_CONTENT_TYPES[archive_format])
+        self.set_header("Content-Disposition", f'attachment; filename="{arcname}.{archive_format}"')
+
+        chunks = ARCHIVE_FORMATS[archive_format](report_dir, arcname, exclude=_is_compressed_variant)
+        io_loop = IOLoop.current()
+        try:
+            while not self._closed:
+                chunk = await io_loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    self.write(chunk)
+                    await self.flush()
+        except StreamClosedError:
+            self._closed = True
+        finally:
+            chunks.close()
+        if self._closed:
+            log.info("Stopped sending %s.%s, the client went away.", arcname, archive_format)
@@ -0,0 +1,99 @@
+# pylint: disable=W0223,W0221,W0511,W0201
+# W0201 needs to be disabled because this is the way that tornado demands that handlers
+#       are setup
+# TODO: remove these exceptions, see DEVELOP-440
+"""
+Handlers related to runfolders
+"""
+import datetime
+
+from tornado.web import HTTPError
+
+from arteria.web.handlers import BaseRestHandler
+
+from sequencing_report_service.handlers import BAD_REQUEST, next_page_link
+
+import importlib.metadata
+
+version = importlib.metadata.version("sequencing-report-service")
+
+
+class RunfoldersHandler(BaseRestHandler):
+    """
+    List the runfolders in the monitored directories
+    """
+
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+
+    def initialize(self, runfolder_repo, **kwargs):
+        """
+        Initialize new RunfoldersHandler
+        """
+        self.runfolder_repo = runfolder_repo
+
+    @staticmethod
+    def _to_dict(runfolder, metadata):
+        runfolder_dict = {"name": runfolder["name"], "path": str(runfolder["path"])}
+        if metadata:
+            runfolder_dict.update({
+                "monitored_directory": str(runfolder["monitored_directory"]),
+                "mtime": datetime.datetime.fromtimestamp(runfolder["mtime"], datetime.timezone.utc).isoformat(),
+                "rta_complete": runfolder["rta_complete"],
+                "copy_complete": runfolder["copy_complete"],
+            })
+        return runfolder_dict
+
+    def get(self):
+        """
+        Will return one page of the runfolders in the monitored directories,
+        ordered by name. The following query parameters are supported:
+            - `after`: only return runfolders with names after this
+            - `limit`: maximum number of runfolders to return (default 100, max 1000)
+            - `prefix`: only return runfolders with names starting with this
+            - `metadata`: set to `true` to include the monitored directory of each
+              runfolder, its mtime, and whether sequencing (`RTAComplete.txt`) and
+              copying (`CopyComplete.txt`) of it has finished
+        e.g.:
+            curl -w'\\n' 'localhost:9999/api/1.0/runfolders?prefix=2401&metadata=true'
+
+        The return json has the format below, where `next` is a link to the next
+        page, or null if this is the last page:
+
+        {
+        "runfolders": [
+            {
+                "name": "240101_A00001_0001_AHXXXXXXXX",
+                "path": "/data/runfolders/240101_A00001_0001_AHXXXXXXXX",
+                "monitored_directory": "/data/runfolders",
+                "mtime": "2024-01-02T03:04:05+00:00",
+                "rta_complete": true,
+                "copy_complete": false
+            }
+        ],
+        "next": null,
+        "version": "1.0.0"
+        }
+
+        The runfolders are listed from an index of the monitored directories,
+        which is updated periodically, so new runfolders may take a little
+        while to show up.
+        """
+        try:
+            limit = int(self.get_query_argument('limit', self.DEFAULT_PAGE_SIZE))
+        except ValueError as exc:
+            raise HTTPError(BAD_REQUEST, log_message="limit must be an integer") from exc
+        if not 0 < limit <= self.MAX_PAGE_SIZE:
+            raise HTTPError(BAD_REQUEST, log_message=f"limit must be between 1 and {self.MAX_PAGE_SIZE}")
+        metadata = self.get_query_argument('metadata', 'false') == 'true'
+
+        runfolders = self.runfolder_repo.list_runfolders(
+            after=self.get_query_argument('after', None),
+            limit=limit,
+            prefix=self.get_query_argument('prefix', None),
+        )
+        self.write_object({
+            "runfolders": [self._to_dict(runfolder, metadata) for runfolder in runfolders],
+            "next": next_page_link(self, 'runfolders', runfolders, limit, lambda runfolder: runfolder["name"]),
+            "version": version,
+        })
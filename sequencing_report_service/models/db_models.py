@@ -10,7 +10,7 @@ import enum as base_enum
 
 import json
 
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Enum, DateTime, Text, Index, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -35,20 +35,61 @@ class State(base_enum.Enum):
     CANCELLED = ArteriaState.CANCELLED
 
 
+class Priority(base_enum.IntEnum):
+    """
+    Priority classes of jobs. Pending jobs with a lower value are started first.
+    """
+    URGENT = 0
+    NORMAL = 1
+    BULK = 2
+
+
 class Job(SQLAlchemyBase):
     """
     This table contains information about jobs that we have run.
     """
     __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_state_job_id', 'state', 'job_id'),
+        Index('ix_jobs_queue', 'state', 'pipeline', 'priority', 'job_id'),
+        Index('ix_jobs_request_key_state', 'request_key', 'state'),
+        Index('ix_jobs_input_fingerprint_state', 'input_fingerprint', 'state'),
+    )
 
     job_id = Column(Integer, primary_key=True, autoincrement=True)
     _command = Column(String, nullable=False)
     _environment = Column(String, nullable=True)
+    pipeline = Column(String, nullable=True)
+    priority = Column(Integer, nullable=False, default=Priority.NORMAL, server_default=str(int(Priority.NORMAL)))
     pid = Column(Integer, nullable=True)
+    # Idempotency key of the start request, or a fingerprint of its arguments,
+    # used to coalesce duplicate requests while the job is in flight
+    request_key = Column(String, nullable=True)
+    # Fingerprint of the command of the job and the runfolder it processes,
+    # used to reuse the results of a finished identical job
+    input_fingerprint = Column(String, nullable=True)
+    # Start time of the process, used together with the pid to identify it
+    pid_start_time = Column(String, nullable=True)
     state = Column(Enum(State))
     time_created = Column(DateTime(timezone=True), server_default=func.now())
     time_updated = Column(DateTime(timezone=True), onupdate=func.now())
+    # Logs are kept in the job's nextflow log dir, this column only holds
+    # logs of jobs which were run before that.
     log = Column(Text(), nullable=True)
+    # Progress of the job, ingested from its log while it runs
+    log_offset = Column(BigInteger, nullable=False, default=0, server_default='0')
+    tasks_submitted = Column(Integer, nullable=False, default=0, server_default='0')
+    tasks_cached = Column(Integer, nullable=False, default=0, server_default='0')
+    last_log_line = Column(String, nullable=True)
+    # Offset in bytes up to which the trace file of the job has been ingested
+    trace_offset = Column(BigInteger, nullable=False, default=0, server_default='0')
+    # Resource usage of the process of the job, as reported by the OS when it exited
+    cpu_user_seconds = Column(Float, nullable=True)
+    cpu_system_seconds = Column(Float, nullable=True)
+    max_rss_kb = Column(BigInteger, nullable=True)
+    block_input_ops = Column(BigInteger, nullable=True)
+    block_output_ops = Column(BigInteger, nullable=True)
+    wall_time_seconds = Column(Float, nullable=True)
 
     @property
     def command(self):
@@ -86,13 +127,108 @@ class Job(SQLAlchemyBase):
 
     def to_dict(self):
         """
-        Converts object to dict
+        Converts object to dict. The log is not included, since it can be
+        large, it is served separately by the job log endpoint.
         """
         return {'job_id': self.job_id,
                 'command': self.command,
                 'environment': self.environment,
+                'pipeline': self.pipeline,
+                'priority': Priority(self.priority).name.lower(),
                 'pid': self.pid if self.pid else '',
                 'state': self.state.value,
                 'created': str(self.time_created),
                 'updated': str(self.time_updated),
-                'log': str(self.log) if self.log else ''}
+                'progress': {
+                    'log_bytes': self.log_offset or 0,
+                    'tasks_submitted': self.tasks_submitted or 0,
+                    'tasks_cached': self.tasks_cached or 0,
+                    'last_log_line': self.last_log_line,
+                },
+                'resource_usage': {
+                    'cpu_user_seconds': self.cpu_user_seconds,
+                    'cpu_system_seconds': self.cpu_system_seconds,
+                    'max_rss_kb': self.max_rss_kb,
+                    'block_input_ops': self.block_input_ops,
+                    'block_output_ops': self.block_output_ops,
+                    'wall_time_seconds': self.wall_time_seconds,
+                }}
+
+
+class JobTask(SQLAlchemyBase):
+    """
+    This table contains performance records of the tasks run by jobs, as
+    reported in the Nextflow trace file of the job.
+    """
+    __tablename__ = 'job_tasks'
+    __table_args__ = (
+        Index('ix_job_tasks_job_id_task_id', 'job_id', 'task_id', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey('jobs.job_id'), nullable=False)
+    task_id = Column(Integer, nullable=True)
+    process = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    status = Column(String, nullable=True)
+    exit_status = Column(Integer, nullable=True)
+    realtime_ms = Column(BigInteger, nullable=True)
+    cpu_percent = Column(Float, nullable=True)
+    peak_rss = Column(BigInteger, nullable=True)
+    read_bytes = Column(BigInteger, nullable=True)
+    write_bytes = Column(BigInteger, nullable=True)
+
+
+class ReportVersion(SQLAlchemyBase):
+    """
+    This table contains the report versions whose MultiQC metrics have been ingested.
+    """
+    __tablename__ = 'report_versions'
+    __table_args__ = (
+        Index('ix_report_versions_runfolder_version', 'runfolder', 'version', unique=True),
+        Index('ix_report_versions_report_time', 'report_time'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    runfolder = Column(String, nullable=False)
+    version = Column(String, nullable=False)
+    # The number of the version, e.g. 2 for v2, to find the latest version of a runfolder
+    version_number = Column(Integer, nullable=False)
+    # When the report was made, i.e. the mtime of its MultiQC data
+    report_time = Column(DateTime(timezone=True), nullable=False)
+    time_ingested = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SampleMetric(SQLAlchemyBase):
+    """
+    This table contains the general stats of the samples in MultiQC reports,
+    one row per sample and metric.
+    """
+    __tablename__ = 'sample_metrics'
+    __table_args__ = (
+        Index('ix_sample_metrics_metric_report_version_id', 'metric', 'report_version_id'),
+        Index('ix_sample_metrics_report_version_id', 'report_version_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    report_version_id = Column(Integer, ForeignKey('report_versions.id'), nullable=False)
+    sample = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+
+
+class LaneMetric(SQLAlchemyBase):
+    """
+    This table contains the per-lane metrics of MultiQC reports, one row per lane and metric.
+    """
+    __tablename__ = 'lane_metrics'
+    __table_args__ = (
+        Index('ix_lane_metrics_metric_report_version_id', 'metric', 'report_version_id'),
+        Index('ix_lane_metrics_report_version_id', 'report_version_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    report_version_id = Column(Integer, ForeignKey('report_versions.id'), nullable=False)
+    lane = Column(Integer, nullable=False)
+    metric = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
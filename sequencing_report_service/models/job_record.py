@@ -0,0 +1,82 @@
+"""
+Read-only projections of jobs. These are used when jobs only need to be
+presented, e.g. by the job handlers, and allow us to skip hydrating full
+`Job` ORM objects (and the session bookkeeping that comes with them).
+"""
+import dataclasses
+import datetime
+import json
+from typing import Optional
+
+from sequencing_report_service.models.db_models import State, Priority
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class JobRecord:
+    """
+    Immutable, read-only view of a row in the jobs table. Column values are
+    kept as they are stored, and are only decoded when they are accessed.
+    """
+    job_id: int
+    raw_command: str
+    raw_environment: Optional[str]
+    pipeline: Optional[str]
+    priority: int
+    pid: Optional[int]
+    state: State
+    time_created: Optional[datetime.datetime]
+    time_updated: Optional[datetime.datetime]
+    log_offset: int
+    tasks_submitted: int
+    tasks_cached: int
+    last_log_line: Optional[str]
+    cpu_user_seconds: Optional[float] = None
+    cpu_system_seconds: Optional[float] = None
+    max_rss_kb: Optional[int] = None
+    block_input_ops: Optional[int] = None
+    block_output_ops: Optional[int] = None
+    wall_time_seconds: Optional[float] = None
+
+    @property
+    def command(self):
+        """
+        Get value of command
+        """
+        return self.raw_command.split(';')
+
+    @property
+    def environment(self):
+        """
+        Get value of environment
+        """
+        if not self.raw_environment:
+            return None
+        return json.loads(self.raw_environment)
+
+    def to_dict(self):
+        """
+        Converts record to dict, on the same format as `Job.to_dict`
+        """
+        return {'job_id': self.job_id,
+                'command': self.command,
+                'environment': self.environment,
+                'pipeline': self.pipeline,
+                'priority': Priority(self.priority).name.lower(),
+                'pid': self.pid if self.pid else '',
+                'state': self.state.value,
+                'created': str(self.time_created),
+                'updated': str(self.time_updated),
+                'progress': {
+                    'log_bytes': self.log_offset,
+                    'tasks_submitted': self.tasks_submitted,
+                    'tasks_cached': self.tasks_cached,
+                    'last_log_line': self.last_log_line,
+                },
+                'resource_usage': {
+                    'cpu_user_seconds': self.cpu_user_seconds,
+                    'cpu_system_seconds': self.cpu_system_seconds,
+                    'max_rss_kb': self.max_rss_kb,
+                    'block_input_ops': self.block_input_ops,
+                    'block_output_ops': self.block_output_ops,
+                    'wall_time_seconds': self.wall_time_seconds,
+                }}
@@ -0,0 +1,122 @@
+"""
+Read the metrics of MultiQC reports from the data files MultiQC writes next to them.
+"""
+
+import csv
+import json
+import re
+
+# Directory MultiQC writes its data files to, next to the report
+DATA_DIR = "multiqc_data"
+DATA_JSON = "multiqc_data.json"
+GENERAL_STATS_TSV = "multiqc_general_stats.txt"
+# Tables of per-lane metrics, e.g. multiqc_bcl2fastq_bylane.txt
+BY_LANE_PATTERN = re.compile(r"^multiqc_(\w+?)_?bylane$")
+
+_LANE_NUMBER = re.compile(r"(\d+)\s*$")
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _general_stats_metric(column):
+    """
+    Turn a column of the general stats table, e.g. `FastQC_mqc-generalstats-fastqc-percent_duplicates`,
+    into the name of the metric, e.g. `FastQC.percent_duplicates`
+    """
+    namespace, separator, rest = column.partition("_mqc-generalstats-")
+    if not separator:
+        return column
+    return f"{namespace}.{rest.split('-', 1)[-1]}"
+
+
+def _lane_number(lane):
+    matches = _LANE_NUMBER.search(str(lane))
+    return int(matches.group(1)) if matches else None
+
+
+def _lane_metrics(source, table):
+    metrics = []
+    for lane, values in table.items():
+        lane_number = _lane_number(lane)
+        if lane_number is None or not isinstance(values, dict):
+            continue
+        for key, value in values.items():
+            value = _to_float(value)
+            if value is not None:
+                metrics.append((lane_number, f"{source}.{key}", value))
+    return metrics
+
+
+def _read_json(data_json):
+    with open(data_json) as data_file:
+        data = json.load(data_file)
+
+    sample_metrics = []
+    headers = data.get("report_general_stats_headers") or []
+    for i, samples in enumerate(data.get("report_general_stats_data") or []):
+        module_headers = headers[i] if i < len(headers) else {}
+        for sample, values in samples.items():
+            for key, value in values.items():
+                value = _to_float(value)
+                if value is None:
+                    continue
+                namespace = module_headers.get(key, {}).get("namespace")
+                sample_metrics.append((sample, f"{namespace}.{key}" if namespace else key, value))
+
+    lane_metrics = []
+    for name, table in (data.get("report_saved_raw_data") or {}).items():
+        matches = BY_LANE_PATTERN.match(name)
+        if matches and isinstance(table, dict):
+            lane_metrics.extend(_lane_metrics(matches.group(1), table))
+    return sample_metrics, lane_metrics
+
+
+def _read_tsv(path):
+    with open(path, newline="") as tsv_file:
+        reader = csv.reader(tsv_file, delimiter="\t")
+        header = next(reader, None)
+        if not header:
+            return {}
+        return {row[0]: dict(zip(header[1:], row[1:])) for row in reader if row}
+
+
+def _read_tsvs(data_dir):
+    sample_metrics = []
+    for sample, values in _read_tsv(data_dir / GENERAL_STATS_TSV).items():
+        for column, value in values.items():
+            value = _to_float(value)
+            if value is not None:
+                sample_metrics.append((sample, _general_stats_metric(column), value))
+
+    lane_metrics = []
+    for path in sorted(data_dir.glob("multiqc_*bylane.txt")):
+        matches = BY_LANE_PATTERN.match(path.stem)
+        if matches:
+            lane_metrics.extend(_lane_metrics(matches.group(1), _read_tsv(path)))
+    return sample_metrics, lane_metrics
+
+
+def read_report_metrics(report_dir):
+    """
+    Read the general stats of the samples, and the per-lane metrics, of a
+    MultiQC report. They are read from `multiqc_data.json` if MultiQC wrote
+    one, otherwise from the general stats and `*bylane` tables. Values which
+    are not numbers are left out.
+    :param report_dir: Path to the directory of the report version
+    :return: a tuple of a list of (sample, metric, value) and a list of (lane, metric, value),
+             or None if there is neither `multiqc_data.json` nor a general stats table
+             yet, e.g. while MultiQC is still writing its data files
+    """
+    data_dir = report_dir / DATA_DIR
+    if (data_dir / DATA_JSON).is_file():
+        return _read_json(data_dir / DATA_JSON)
+    if (data_dir / GENERAL_STATS_TSV).is_file():
+        return _read_tsvs(data_dir)
+    return None
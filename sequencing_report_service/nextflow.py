@@ -3,15 +3,36 @@ Module dealing with interacting with Nextflow
 """
 
 import copy
+import functools
+import hashlib
 import logging
 import datetime
+import os
+import re
+import string
 from pathlib import Path
 import json
 import jsonschema
 import yaml
 
+from sequencing_report_service.exceptions import MissingConfigVariables
+
 log = logging.getLogger(__name__)
 
+# Lines logged for tasks when Nextflow runs with `NXF_ANSI_LOG=false`, e.g.
+# [6a/1f03c2] Submitted process > FASTQC (sample_1)
+LOG_TASK_PATTERN = re.compile(r"^\[[0-9a-f]{2}/[0-9a-f]{6}\] (Submitted|Cached) process > ")
+TRACE_DURATION_PATTERN = re.compile(r"([\d.]+)(ms|d|h|m|s)")
+
+# Sections of pipeline configs in which variables are interpolated
+TEMPLATE_SECTIONS = ("environment", "pipeline_parameters", "nextflow_parameters")
+
+# Compiled templates of parsed and validated pipeline configs, and compiled schema
+# validators, by path. Entries are invalidated when the inode, mtime or size of a
+# file changes.
+_config_cache = {}
+_validator_cache = {}
+
 
 def nextflow_command(
     pipeline,
@@ -56,18 +77,55 @@ def nextflow_command(
     -------
         command_with_env: dict
     """
-    raw_config = get_config(config_dir, pipeline)
+    plan = plan_nextflow_command(
+        pipeline,
+        runfolder_path,
+        config_dir,
+        input_samplesheet_content,
+        ext_args,
+        config_params,
+    )
+    write_input_samplesheet(plan)
+
+    return {"command": plan["command"], "environment": plan["environment"]}
+
+
+def plan_nextflow_command(
+    pipeline,
+    runfolder_path,
+    config_dir,
+    input_samplesheet_content="",
+    ext_args=None,
+    config_params=None,
+):
+    """
+    Generate the Nextflow command that `nextflow_command` would, without any
+    side effects, i.e. the input samplesheet is not written to the runfolder.
+
+    Parameters
+    ----------
+    See `nextflow_command`
+
+    Returns
+    -------
+    plan: dict
+        the `command` and `environment`, as well as the path and content of
+        the input samplesheet, `input_samplesheet_path` and
+        `input_samplesheet_content`, which are None if there is none
+    """
+    template = get_config_template(config_dir, pipeline)
+    raw_config = template.config
     input_samplesheet_content = (
         input_samplesheet_content
         or raw_config.get("input_samplesheet_content", "")
     )
-    config_values = build_config_variables(
+    config_values, input_samplesheet_content = _config_variables(
         pipeline,
         runfolder_path,
         input_samplesheet_content,
         config_params,
     )
-    config = interpolate_variables(raw_config, config_values)
+    config = template.render(config_values)
 
     env = config.get("environment", {})
     cmd = [
@@ -89,16 +147,25 @@ def nextflow_command(
 
     if ext_args:
         cmd += ext_args
-    
+
     log.debug("Generated command: %s", cmd)
 
-    return {"command": cmd, "environment": env}
+    return {
+        "command": cmd,
+        "environment": env,
+        "input_samplesheet_path": config_values.get("input_samplesheet_path"),
+        "input_samplesheet_content": input_samplesheet_content,
+    }
 
 
 def get_config(config_dir, pipeline):
     """
     Load and validate the config file for the requested pipeline.
 
+    Configs are only parsed and validated when they are first loaded, or when
+    the config file or the schema has changed since. Otherwise they are
+    served from an in-process cache.
+
     Parameters
     ----------
     config_dir: str
@@ -110,18 +177,88 @@ def get_config(config_dir, pipeline):
     -------
         config: dict
     """
+    return copy.deepcopy(get_config_template(config_dir, pipeline).config)
+
+
+def get_config_template(config_dir, pipeline):
+    """
+    Load, validate and compile the config file for the requested pipeline.
+    The compiled template is cached, see `get_config`.
+
+    Parameters
+    ----------
+    config_dir: str
+        path to directory containing the config files
+    pipeline: str
+        pipeline to load
+
+    Returns
+    -------
+        template: ConfigTemplate
+    """
     config_dir = Path(config_dir)
+    config_path = config_dir / f"{pipeline}.yml"
     try:
-        with open(config_dir / f"{pipeline}.yml", "r") as config_file:
-            config = yaml.safe_load(config_file.read())
-        with open(config_dir / "schema.json", "r") as pipeline_config_schema:
-            schema = json.load(pipeline_config_schema)
-        jsonschema.validate(config, schema)
+        validator = _get_validator(config_dir / "schema.json")
+        stamp = _file_stamp(config_path)
+        cached = _config_cache.get(config_path)
+        if cached and cached[0] == stamp and cached[1] is validator:
+            template = cached[2]
+        else:
+            with open(config_path, "rb") as config_file:
+                content = config_file.read()
+            config = yaml.safe_load(content.decode("utf-8"))
+            error = jsonschema.exceptions.best_match(validator.iter_errors(config))
+            if error is not None:
+                raise error
+            template = ConfigTemplate(config, digest=hashlib.sha256(content).hexdigest())
+            _config_cache[config_path] = (stamp, validator, template)
     except (FileNotFoundError, jsonschema.ValidationError):
         log.exception('')
         raise
 
-    return config
+    return template
+
+
+def clear_config_cache():
+    """
+    Drop all cached pipeline configs and schema validators.
+    """
+    _config_cache.clear()
+    _validator_cache.clear()
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _get_validator(schema_path):
+    """
+    Get a validator for the pipeline config schema, which is only compiled
+    again if the schema file has changed.
+
+    Parameters
+    ----------
+    schema_path: Path
+        path to the JSON schema of the pipeline configs
+
+    Returns
+    -------
+        validator: jsonschema validator
+    """
+    stamp = _file_stamp(schema_path)
+    cached = _validator_cache.get(schema_path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    with open(schema_path, "r") as pipeline_config_schema:
+        schema = json.load(pipeline_config_schema)
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+    _validator_cache[schema_path] = (stamp, validator)
+    return validator
 
 
 def build_config_variables(pipeline, runfolder_path, input_samplesheet_content, config_params):
@@ -147,6 +284,47 @@ def build_config_variables(pipeline, runfolder_path, input_samplesheet_content,
     -------
     config_values: dict
     """
+    config_values, input_samplesheet_content = _config_variables(
+        pipeline,
+        runfolder_path,
+        input_samplesheet_content,
+        config_params,
+    )
+    if input_samplesheet_content is not None:
+        _write_samplesheet(config_values["input_samplesheet_path"], input_samplesheet_content)
+
+    return config_values
+
+
+def _write_samplesheet(input_samplesheet_path, input_samplesheet_content):
+    with open(input_samplesheet_path, "w") as f:
+        f.write(input_samplesheet_content)
+
+
+def write_input_samplesheet(plan):
+    """
+    Write the input samplesheet of a planned command to the runfolder, if
+    the command has one.
+
+    Parameters
+    ----------
+    plan: dict
+        as returned by `plan_nextflow_command`
+    """
+    if plan["input_samplesheet_path"]:
+        _write_samplesheet(plan["input_samplesheet_path"], plan["input_samplesheet_content"])
+
+
+def _config_variables(pipeline, runfolder_path, input_samplesheet_content, config_params):
+    """
+    Fetch default values to be used with `interpolate_variables`, without
+    writing the input samplesheet, see `build_config_variables`.
+
+    Returns
+    -------
+    config_values, input_samplesheet_content: dict, str
+        the interpolated content of the input samplesheet is None if there is none
+    """
     runfolder_path = Path(runfolder_path)
     config_values = {
         "current_year": datetime.datetime.now().year,
@@ -156,21 +334,130 @@ def build_config_variables(pipeline, runfolder_path, input_samplesheet_content,
 
     if input_samplesheet_content:
         try:
-            input_samplesheet_content = input_samplesheet_content.format(**config_values)
+            input_samplesheet_content = render_template(input_samplesheet_content, config_values)
         except KeyError:
             log.exception('')
             raise
 
         input_samplesheet_path = runfolder_path / f"{pipeline}_samplesheet.csv"
-        with open(input_samplesheet_path, "w") as f:
-            f.write(input_samplesheet_content)
         config_values["input_samplesheet_path"] = str(input_samplesheet_path)
+    else:
+        input_samplesheet_content = None
 
     if config_params:
         for key, value in config_params.items():
             config_values[key] = value
 
-    return config_values
+    return config_values, input_samplesheet_content
+
+
+@functools.lru_cache(maxsize=1024)
+def template_variables(template):
+    """
+    Find the variables which a format string refers to.
+
+    Parameters
+    ----------
+    template: str
+        format string, e.g. "{runfolder_path}/Samplesheet.csv"
+
+    Returns
+    -------
+    variables: frozenset
+        names of the variables, e.g. {"runfolder_path"}
+    """
+    return frozenset(
+        re.split(r"[.\[]", field_name, maxsplit=1)[0]
+        for _, field_name, _, _ in string.Formatter().parse(template)
+        if field_name is not None
+    )
+
+
+def render_template(template, config_values):
+    """
+    Interpolate the variables of a format string.
+
+    Parameters
+    ----------
+    template: str
+        format string
+    config_values: dict
+        dict containing the values of the variables
+
+    Returns
+    -------
+    rendered: str
+
+    Raises
+    ------
+    MissingConfigVariables
+        if there are no values for some of the variables, listing all of them
+    """
+    missing = template_variables(template) - config_values.keys()
+    if missing:
+        raise MissingConfigVariables(sorted(missing))
+    return template.format(**config_values)
+
+
+class ConfigTemplate:
+    """
+    A pipeline config compiled for interpolation. It knows which fields of
+    the config contain variables or escaped braces, see `TEMPLATE_SECTIONS`,
+    so only those have to be formatted when it is rendered.
+
+    Attributes
+    ----------
+    config: dict
+        the config the template was compiled from, which must not be modified
+    variables: frozenset
+        names of all the variables the config refers to
+    digest: str
+        SHA-256 hex digest of the config file, if the template was loaded from one
+    """
+
+    def __init__(self, config, digest=None):
+        self.config = config
+        self.digest = digest
+        self._fields = [
+            (section, key, value)
+            for section in TEMPLATE_SECTIONS
+            for key, value in config.get(section, {}).items()
+            # Fields with escaped braces only, e.g. "{{literal}}", are formatted as well
+            if isinstance(value, str) and ("{" in value or "}" in value)
+        ]
+        self.variables = frozenset().union(*(template_variables(value) for _, _, value in self._fields))
+
+    def render(self, config_values):
+        """
+        Interpolate the variables of the config with the values in `config_values`.
+
+        Parameters
+        ----------
+        config_values: dict
+            dict containing the values of the variables
+
+        Returns
+        -------
+        config: dict
+            a copy of the config with interpolated variables. Fields outside
+            of `TEMPLATE_SECTIONS` are shared with the template.
+
+        Raises
+        ------
+        MissingConfigVariables
+            if there are no values for some of the variables, listing all of them
+        """
+        missing = self.variables - config_values.keys()
+        if missing:
+            raise MissingConfigVariables(sorted(missing))
+
+        config = dict(self.config)
+        for section in TEMPLATE_SECTIONS:
+            if section in config:
+                config[section] = dict(config[section])
+        for section, key, value in self._fields:
+            config[section][key] = value.format(**config_values)
+        return config
 
 
 def interpolate_variables(config, config_values):
@@ -190,21 +477,124 @@ def interpolate_variables(config, config_values):
     -------
     config: dict
         dictionaries with interpolated variables
+
+    Raises
+    ------
+    MissingConfigVariables
+        if some format strings contain keys that are not in `config_values`
     """
-    config = copy.deepcopy(config)
     try:
-        for section in [
-                    "environment",
-                    "pipeline_parameters",
-                    "nextflow_parameters",
-                ]:
-            if section in config:
-                for key, value in config[section].items():
-                    config[section][key] = value.format(**config_values)
+        return ConfigTemplate(config).render(config_values)
     except KeyError:
-        # This may happen if some format strings contain keys that are not in
-        # `config_values`.
         log.exception('')
         raise
 
-    return config
+
+def parse_log_progress(lines):
+    """
+    Summarize the progress reported in lines of Nextflow output.
+
+    Parameters
+    ----------
+    lines: [str]
+        lines of Nextflow output
+
+    Returns
+    -------
+    progress: dict
+        the number of tasks submitted and cached in `lines`, and the last
+        non-empty line
+    """
+    progress = {
+        "tasks_submitted": 0,
+        "tasks_cached": 0,
+        "last_log_line": None,
+    }
+    for line in lines:
+        matches = LOG_TASK_PATTERN.match(line)
+        if matches:
+            progress[f"tasks_{matches.group(1).lower()}"] += 1
+        if line.strip():
+            progress["last_log_line"] = line
+    return progress
+
+
+def with_trace(command, trace_path):
+    """
+    Add the options to write a trace file to a Nextflow command. Commands
+    which do not run a Nextflow pipeline are returned as they are.
+
+    Parameters
+    ----------
+    command: [str]
+        the command, as returned by `nextflow_command`
+    trace_path: str
+        path of the trace file to write
+
+    Returns
+    -------
+        command: [str]
+    """
+    if command[:2] != ["nextflow", "run"] or len(command) < 3:
+        return command
+    return command[:3] + ["-with-trace", str(trace_path)] + command[3:]
+
+
+def _parse_duration_ms(value):
+    """
+    Parse a duration from a trace file, e.g. `1h 2m 3s`, `4.5s` or `200ms`, into milliseconds.
+    """
+    units = {"d": 86_400_000, "h": 3_600_000, "m": 60_000, "s": 1000, "ms": 1}
+    total = 0.0
+    for amount, unit in TRACE_DURATION_PATTERN.findall(value):
+        total += float(amount) * units[unit]
+    return int(total)
+
+
+def _parse_memory_bytes(value):
+    """
+    Parse a memory size from a trace file, e.g. `1.2 GB` or `512 KB`, into bytes.
+    """
+    amount, _, unit = value.partition(" ")
+    units = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4, "PB": 1024 ** 5}
+    return int(float(amount) * units[unit.strip().upper()])
+
+
+def parse_trace_record(record):
+    """
+    Convert a row of a Nextflow trace file, written with the default trace
+    fields, into a task performance record. Fields which are not reported
+    for the task (`-`) are returned as None.
+
+    Parameters
+    ----------
+    record: dict
+        the row, keyed by the header of the trace file
+
+    Returns
+    -------
+        task: dict
+    """
+    def field(name, parse):
+        value = record.get(name, "-").strip()
+        if value in ("", "-"):
+            return None
+        try:
+            return parse(value)
+        except (ValueError, KeyError):
+            log.warning("Could not parse %s from trace field %s", value, name)
+            return None
+
+    name = record.get("name", "")
+    return {
+        "task_id": field("task_id", int),
+        "process": name.split(" (", 1)[0],
+        "name": name,
+        "status": field("status", str),
+        "exit_status": field("exit", int),
+        "realtime_ms": field("realtime", _parse_duration_ms),
+        "cpu_percent": field("%cpu", lambda value: float(value.rstrip("%"))),
+        "peak_rss": field("peak_rss", _parse_memory_bytes),
+        "read_bytes": field("rchar", _parse_memory_bytes),
+        "write_bytes": field("wchar", _parse_memory_bytes),
+    }
@@ -4,12 +4,39 @@ This module contains repository classes related to managing job objects.
 
 import logging
 
+from sqlalchemy import select, insert, update, func, case, or_, and_
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
-from sequencing_report_service.models.db_models import Job, State
+from sequencing_report_service.models.db_models import Job, JobTask, State, Priority
+from sequencing_report_service.models.job_record import JobRecord
 
 log = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 100
+
+# The columns backing a JobRecord, in the order of its fields
+JOB_RECORD_COLUMNS = (
+    Job.job_id,
+    Job._command,  # pylint: disable=W0212
+    Job._environment,  # pylint: disable=W0212
+    Job.pipeline,
+    Job.priority,
+    Job.pid,
+    Job.state,
+    Job.time_created,
+    Job.time_updated,
+    Job.log_offset,
+    Job.tasks_submitted,
+    Job.tasks_cached,
+    Job.last_log_line,
+    Job.cpu_user_seconds,
+    Job.cpu_system_seconds,
+    Job.max_rss_kb,
+    Job.block_input_ops,
+    Job.block_output_ops,
+    Job.wall_time_seconds,
+)
+
 
 class JobRepository:
     """
@@ -46,19 +73,66 @@ class JobRepository:
         """
         self.session_factory.remove()
 
-    def add_job(self, command_with_env):
+    def add_job(self, command_with_env, pipeline=None, priority=Priority.NORMAL, request_key=None,
+                input_fingerprint=None):
         """
         Add a new job for the specified runfolder. The state of the job will be set as pending.
         :param command_with_env: to start job with
+        :param pipeline: name of the pipeline the job runs
+        :param priority: Priority of the job in the queue
+        :param request_key: idempotency key, or fingerprint, of the request which started the job
+        :param input_fingerprint: fingerprint of the command and the runfolder of the job
         :return: the created Job
         """
         job = Job(command=command_with_env['command'],
                   state=State.PENDING,
-                  environment=command_with_env['environment'])
+                  environment=command_with_env['environment'],
+                  pipeline=pipeline,
+                  priority=priority,
+                  request_key=request_key,
+                  input_fingerprint=input_fingerprint)
         self.session.add(job)
         self.session.commit()
         return job
 
+    def get_in_flight_job_id(self, request_key):
+        """
+        Get the job started by an earlier request with the same key, if it is
+        still pending or running
+        :param request_key: idempotency key, or fingerprint, of the request
+        :return: the job id of the newest such job, or None if there is none
+        """
+        return self.session.execute(
+            select(Job.job_id)
+            .where(Job.request_key == request_key,
+                   Job.state.in_((State.PENDING, State.READY, State.STARTED)))
+            .order_by(Job.job_id.desc())
+            .limit(1)
+        ).scalar()
+
+    def has_job_with_request_key(self, request_key):
+        """
+        Check if any job, in any state, has been started by a request with the key
+        :param request_key: idempotency key, or fingerprint, of the request
+        :return: True if there is such a job
+        """
+        return self.session.execute(
+            select(Job.job_id).where(Job.request_key == request_key).limit(1)
+        ).first() is not None
+
+    def get_done_job_id(self, input_fingerprint):
+        """
+        Get a job which has finished successfully on the same inputs
+        :param input_fingerprint: fingerprint of the command and the runfolder of the job
+        :return: the job id of the newest such job, or None if there is none
+        """
+        return self.session.execute(
+            select(Job.job_id)
+            .where(Job.input_fingerprint == input_fingerprint, Job.state == State.DONE)
+            .order_by(Job.job_id.desc())
+            .limit(1)
+        ).scalar()
+
     def get_jobs(self):
         """
         Get all jobs
@@ -66,6 +140,60 @@ class JobRepository:
         """
         return self.session.query(Job).all()
 
+    @staticmethod
+    def _job_filters(after=None, states=None,
+                     created_after=None, created_before=None,
+                     updated_after=None, updated_before=None):
+        criteria = []
+        if after is not None:
+            criteria.append(Job.job_id > after)
+        if states:
+            criteria.append(Job.state.in_(states))
+        if created_after is not None:
+            criteria.append(Job.time_created >= created_after)
+        if created_before is not None:
+            criteria.append(Job.time_created < created_before)
+        if updated_after is not None:
+            criteria.append(Job.time_updated >= updated_after)
+        if updated_before is not None:
+            criteria.append(Job.time_updated < updated_before)
+        return criteria
+
+    def get_jobs_page(self, after=None, limit=DEFAULT_PAGE_SIZE, **filters):
+        """
+        Get one page of jobs, ordered by job id, as read-only JobRecords. Paging
+        is keyset based, i.e. the next page is fetched by passing the job id of
+        the last job of the current page as `after`. All filtering is done in
+        the database, and only the columns needed for the JobRecords are
+        selected, so only the requested page is ever loaded.
+        :param after: only return jobs with a job id larger than this
+        :param limit: maximum number of jobs to return
+        :param filters: optional filters, any of:
+            - states: list of States to filter on
+            - created_after: only return jobs created at or after this datetime
+            - created_before: only return jobs created before this datetime
+            - updated_after: only return jobs updated at or after this datetime
+            - updated_before: only return jobs updated before this datetime
+        :return: a list of at most `limit` JobRecords
+        """
+        statement = (
+            select(*JOB_RECORD_COLUMNS)
+            .where(*self._job_filters(after=after, **filters))
+            .order_by(Job.job_id)
+            .limit(limit)
+        )
+        return [JobRecord(*row) for row in self.session.execute(statement)]
+
+    def get_job_record(self, job_id):
+        """
+        Get a read-only JobRecord for the job with the specified job_id
+        :param job_id:
+        :return: a JobRecord, or None if it does not exist
+        """
+        statement = select(*JOB_RECORD_COLUMNS).where(Job.job_id == job_id)
+        row = self.session.execute(statement).first()
+        return JobRecord(*row) if row else None
+
     def get_jobs_with_state(self, state):
         """
         Get all jobs with specified state
@@ -82,12 +210,153 @@ class JobRepository:
         """
         return self.session.query(Job).get(job_id)
 
+    def get_job_log(self, job_id):
+        """
+        Get the log stored in the database for the job with the specified job_id. Only
+        jobs run before logs were kept on disk will have one.
+        :param job_id:
+        :return: the log as a str, or None if there is no such job or log
+        """
+        return self.session.execute(select(Job.log).where(Job.job_id == job_id)).scalar()
+
+    def get_log_offset(self, job_id):
+        """
+        Get the offset in bytes up to which the log of the job has been ingested
+        :param job_id:
+        :return: the offset, 0 if the job does not exist
+        """
+        return self.session.execute(select(Job.log_offset).where(Job.job_id == job_id)).scalar() or 0
+
+    def add_job_progress(self, job_id, log_offset, tasks_submitted=0, tasks_cached=0, last_log_line=None):
+        """
+        Record progress ingested from the log of the job. Task counts are added
+        to the ones already recorded.
+        :param job_id: of the job
+        :param log_offset: offset in bytes up to which the log has now been ingested
+        :param tasks_submitted: number of newly submitted tasks
+        :param tasks_cached: number of newly cached tasks
+        :param last_log_line: the most recent line of the log, if any
+        :return: None
+        """
+        values = {
+            'log_offset': log_offset,
+            'tasks_submitted': Job.tasks_submitted + tasks_submitted,
+            'tasks_cached': Job.tasks_cached + tasks_cached,
+        }
+        if last_log_line is not None:
+            values['last_log_line'] = last_log_line
+        self.session.execute(update(Job).where(Job.job_id == job_id).values(**values))
+        self.session.commit()
+
+    def get_trace_offset(self, job_id):
+        """
+        Get the offset in bytes up to which the trace file of the job has been ingested
+        :param job_id:
+        :return: the offset, 0 if the job does not exist
+        """
+        return self.session.execute(select(Job.trace_offset).where(Job.job_id == job_id)).scalar() or 0
+
+    def add_job_tasks(self, job_id, trace_offset, tasks):
+        """
+        Store task performance records ingested from the trace file of the job
+        :param job_id: of the job
+        :param trace_offset: offset in bytes up to which the trace file has now been ingested
+        :param tasks: list of dicts as returned by `nextflow.parse_trace_record`
+        :return: None
+        """
+        if tasks:
+            self.session.execute(insert(JobTask), [{**task, 'job_id': job_id} for task in tasks])
+        self.session.execute(update(Job).where(Job.job_id == job_id).values(trace_offset=trace_offset))
+        self.session.commit()
+
+    def get_task_summary(self, job_id):
+        """
+        Get the performance of the tasks of the job, aggregated per process, with the
+        processes that took the most time first
+        :param job_id: of the job
+        :return: a list of dicts, one per process
+        """
+        statement = (
+            select(
+                JobTask.process,
+                func.count().label('tasks'),
+                func.sum(case((JobTask.status == 'FAILED', 1), else_=0)).label('failed'),
+                func.sum(JobTask.realtime_ms).label('total_realtime_ms'),
+                func.max(JobTask.realtime_ms).label('max_realtime_ms'),
+                func.avg(JobTask.cpu_percent).label('mean_cpu_percent'),
+                func.max(JobTask.peak_rss).label('max_peak_rss'),
+                func.sum(JobTask.read_bytes).label('read_bytes'),
+                func.sum(JobTask.write_bytes).label('write_bytes'),
+            )
+            .where(JobTask.job_id == job_id)
+            .group_by(JobTask.process)
+            .order_by(func.sum(JobTask.realtime_ms).desc(), JobTask.process)
+        )
+        return [dict(row._mapping) for row in self.session.execute(statement)]  # pylint: disable=W0212
+
     def get_one_pending_job(self):
         """
-        Get the first available pending Job
+        Get the first available pending Job, by priority
         :return: A pending job or none.
         """
-        return self.session.query(Job).filter(Job.state == State.PENDING).first()
+        return (self.session.query(Job)
+                .filter(Job.state == State.PENDING)
+                .order_by(Job.priority, Job.job_id)
+                .first())
+
+    def get_pending_jobs(self):
+        """
+        Get the id and pipeline of all pending jobs, ordered by priority and then by age
+        :return: a list of (job_id, pipeline) tuples
+        """
+        statement = (
+            select(Job.job_id, Job.pipeline)
+            .where(Job.state == State.PENDING)
+            .order_by(Job.priority, Job.job_id)
+        )
+        return [tuple(row) for row in self.session.execute(statement)]
+
+    def get_pending_pipelines(self):
+        """
+        Get the pipelines which have pending jobs
+        :return: a list of pipeline names
+        """
+        statement = select(Job.pipeline).where(Job.state == State.PENDING).distinct()
+        return self.session.execute(statement).scalars().all()
+
+    def get_next_pending_job(self, pipeline):
+        """
+        Get the pending job of the specified pipeline which should be started
+        next, i.e. the oldest one in the highest priority class
+        :param pipeline: to get the next job for
+        :return: a (job_id, priority) tuple, or None if the pipeline has no pending jobs
+        """
+        statement = (
+            select(Job.job_id, Job.priority)
+            .where(Job.state == State.PENDING, Job.pipeline == pipeline)
+            .order_by(Job.priority, Job.job_id)
+            .limit(1)
+        )
+        row = self.session.execute(statement).first()
+        return tuple(row) if row else None
+
+    def get_queue_position(self, job_id):
+        """
+        Get the position of a pending job in the queue of pending jobs, counting the jobs
+        which have a higher priority, or the same priority and are older
+        :param job_id: of the pending job
+        :return: the 1-based position of the job
+        """
+        priority = select(Job.priority).where(Job.job_id == job_id).scalar_subquery()
+        statement = (
+            select(func.count())
+            .select_from(Job)
+            .where(
+                Job.state == State.PENDING,
+                or_(Job.priority < priority, and_(Job.priority == priority, Job.job_id < job_id)),
+            )
+        )
+        return self.session.execute(statement).scalar() + 1
 
     def expunge_object(self, obj):
         """
@@ -121,11 +390,12 @@ class JobRepository:
         self.session.commit()
         return job
 
-    def set_pid_of_job(self, job_id, pid):
+    def set_pid_of_job(self, job_id, pid, pid_start_time=None):
         """
         Sets the process id associated with a specific job
         :param job_id: to change pid of
         :param pid: to set
+        :param pid_start_time: start time of the process, to tell it apart from later processes with the same pid
         :return: the Job changed or None if no job was found
         """
         job = self.session.query(Job).get(job_id)
@@ -135,19 +405,38 @@ class JobRepository:
             return None
 
         job.pid = pid
+        job.pid_start_time = pid_start_time
 
         self.session.commit()
         return Job
 
-    def clear_out_stale_jobs_at_startup(self):
+    def set_resource_usage_of_job(self, job_id, **usage):
+        """
+        Sets the resource usage of the process of a job which has exited
+        :param job_id: to set resource usage of
+        :param usage: column values, i.e. cpu_user_seconds, cpu_system_seconds, max_rss_kb,
+                      block_input_ops, block_output_ops and wall_time_seconds
+        """
+        self.session.execute(update(Job).where(Job.job_id == job_id).values(**usage))
+        self.session.commit()
+
+    def clear_out_stale_jobs_at_startup(self, adopted_job_ids=()):
         """
         This method will set all jobs which have state started, i.e. jobs which
-        should be running, but are not when the service is started. Should only be
-        called once at the start up of the application
-        :param job_repo_factory
+        should be running, but are not when the service is started, to cancelled,
+        and put jobs which were about to be started back in the queue. Should only
+        be called once at the start up of the application
+        :param adopted_job_ids: ids of started jobs which are still running, and should be left as they are
         :return:
         """
         stale_jobs = self.get_jobs_with_state(State.STARTED)
         for job in stale_jobs:
+            if job.job_id in adopted_job_ids:
+                continue
             log.info("Setting state of job with id=%s, to %s because it was stale.", job.job_id, State.CANCELLED)
             self.set_state_of_job(job_id=job.job_id, state=State.CANCELLED)
+
+        # Jobs which had been taken from the queue, but not yet started, are put back in it.
+        for job in self.get_jobs_with_state(State.READY):
+            log.info("Setting state of job with id=%s, to %s since it was never started.", job.job_id, State.PENDING)
+            self.set_state_of_job(job_id=job.job_id, state=State.PENDING)
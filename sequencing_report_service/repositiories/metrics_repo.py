@@ -0,0 +1,156 @@
+"""
+This module contains repository classes related to the metrics of MultiQC reports.
+"""
+
+import logging
+
+from sqlalchemy import select, insert, exists
+from sqlalchemy.orm import aliased
+
+from sequencing_report_service.models.db_models import ReportVersion, SampleMetric, LaneMetric
+
+log = logging.getLogger(__name__)
+
+DEFAULT_VERSION_LIMIT = 100
+
+# The table of each level metrics are kept at, and the column identifying the
+# sample or lane a metric is for
+METRIC_LEVELS = {
+    'sample': (SampleMetric, SampleMetric.sample),
+    'lane': (LaneMetric, LaneMetric.lane),
+}
+
+
+class MetricsRepository:
+    """
+    The MetricsRepository keeps the general stats of the samples, and the
+    per-lane metrics, of MultiQC reports in the database, so that they can
+    be queried across runfolders. It should be used as a context handler, i.e.:
+
+        with MetricsRepository(db_session_factory) as metrics_repo:
+            metrics_repo.get_metric_names()
+    """
+
+    def __init__(self, session_factory):
+        """
+        Create a new metrics repository
+        :param session_factory: scoped_session object from sqlalchemy.
+        """
+        self.session_factory = session_factory
+
+    def __enter__(self):
+        self.session = self.session_factory()
+        return self
+
+    def __exit__(self, *args):
+        self.session_factory.remove()
+
+    def get_ingested_versions(self):
+        """
+        Get the report versions whose metrics have been ingested
+        :return: a set of (runfolder, version) tuples
+        """
+        statement = select(ReportVersion.runfolder, ReportVersion.version)
+        return {tuple(row) for row in self.session.execute(statement)}
+
+    def add_report_metrics(self, runfolder, version, report_time, sample_metrics, lane_metrics):
+        """
+        Store the metrics of a report version
+        :param runfolder: name of the runfolder
+        :param version: of the report, e.g. v1
+        :param report_time: datetime when the report was made
+        :param sample_metrics: list of (sample, metric, value) tuples
+        :param lane_metrics: list of (lane, metric, value) tuples
+        :return: the id of the report version
+        """
+        report_version = ReportVersion(
+            runfolder=runfolder,
+            version=version,
+            version_number=int(version.lstrip('v')),
+            report_time=report_time,
+        )
+        self.session.add(report_version)
+        self.session.flush()
+        if sample_metrics:
+            self.session.execute(insert(SampleMetric), [
+                {'report_version_id': report_version.id, 'sample': sample, 'metric': metric, 'value': value}
+                for sample, metric, value in sample_metrics
+            ])
+        if lane_metrics:
+            self.session.execute(insert(LaneMetric), [
+                {'report_version_id': report_version.id, 'lane': lane, 'metric': metric, 'value': value}
+                for lane, metric, value in lane_metrics
+            ])
+        self.session.commit()
+        return report_version.id
+
+    def get_metric_names(self):
+        """
+        Get the names of all metrics, and the level they are kept at
+        :return: a list of dicts with the `metric` and its `level`, ordered by name
+        """
+        names = []
+        for level, (table, _) in METRIC_LEVELS.items():
+            for metric in self.session.execute(select(table.metric).distinct()).scalars():
+                names.append({'metric': metric, 'level': level})
+        return sorted(names, key=lambda name: (name['metric'], name['level']))
+
+    def get_metric(self, metric, level='sample', runfolders=None, since=None, until=None,
+                   all_versions=False, limit=DEFAULT_VERSION_LIMIT):
+        """
+        Get the values of a metric across report versions. Only the latest
+        version of the report of each runfolder is included, unless
+        `all_versions` is set. The most recent report versions are picked
+        first, and are returned in the order they were made, so that the
+        previous page of a series is fetched by passing the `report_time`
+        of its first report version as `until`.
+        :param metric: name of the metric
+        :param level: `sample` or `lane`
+        :param runfolders: only include these runfolders
+        :param since: only include reports made at or after this datetime
+        :param until: only include reports made before this datetime
+        :param all_versions: include all versions of the reports of each runfolder
+        :param limit: maximum number of report versions to include
+        :return: a list of dicts with the `runfolder`, `version`, `report_time` and
+                 `values` of each report version, where values is a list of dicts
+                 with the `sample` or `lane` and the `value`
+        """
+        table, key = METRIC_LEVELS[level]
+
+        criteria = [exists().where(table.report_version_id == ReportVersion.id, table.metric == metric)]
+        if runfolders:
+            criteria.append(ReportVersion.runfolder.in_(runfolders))
+        if since is not None:
+            criteria.append(ReportVersion.report_time >= since)
+        if until is not None:
+            criteria.append(ReportVersion.report_time < until)
+        if not all_versions:
+            later = aliased(ReportVersion)
+            criteria.append(~exists().where(later.runfolder == ReportVersion.runfolder,
+                                            later.version_number > ReportVersion.version_number))
+
+        statement = (
+            select(ReportVersion.id, ReportVersion.runfolder, ReportVersion.version, ReportVersion.report_time)
+            .where(*criteria)
+            .order_by(ReportVersion.report_time.desc(), ReportVersion.id.desc())
+            .limit(limit)
+        )
+        versions = [
+            {'id': row.id, 'runfolder': row.runfolder, 'version': row.version, 'report_time': row.report_time,
+             'values': []}
+            for row in reversed(self.session.execute(statement).all())
+        ]
+        if not versions:
+            return []
+
+        by_id = {version['id']: version for version in versions}
+        statement = (
+            select(table.report_version_id, key, table.value)
+            .where(table.metric == metric, table.report_version_id.in_(list(by_id)))
+            .order_by(table.report_version_id, key)
+        )
+        for report_version_id, name, value in self.session.execute(statement):
+            by_id[report_version_id]['values'].append({level: name, 'value': value})
+        for version in versions:
+            del version['id']
+        return versions
@@ -1,10 +1,11 @@
 """
 The ReportsRepository finds and presents reports.
 """
+import collections
 import os
 from pathlib import Path
 import logging
-from queue import Queue
+import time
 import dataclasses
 
 
@@ -20,20 +21,51 @@ class ReportsRepository:
     There can be multiple reports associated with a single runfolder, these are denoted v1, v2, etc.
     There should be a link in the reports base directory which indicates which is the current report
     (normally this should be the most recent one).
+
+    Runfolders are looked up in an index of the directories in the reports
+    directory, down to `MAX_DEPTH` levels, which is kept current by calling
+    `rescan` periodically. Only directories which have changed since the
+    previous scan are listed again. The report versions of runfolders are
+    cached when they are first requested, and updated by `rescan` as well.
+
+    Runfolders which are not in the index are searched for on disk, for at
+    most `search_time_budget` seconds. Runfolders which are not found are
+    remembered for `negative_cache_ttl` seconds, or until a rescan finds
+    that the reports directory has changed, whichever comes first.
     """
 
-    def __init__(self, reports_dir):
+    MAX_DEPTH = 3
+
+    def __init__(self, reports_dir, negative_cache_ttl=60, search_time_budget=1):
         """
         Instantiate a ReportsRepository
         :param reports_dir: the base paths were runfolders/reports can be found.
+        :param negative_cache_ttl: seconds to remember that there are no reports for a runfolder
+        :param search_time_budget: maximum number of seconds to search for a runfolder which is not in the index
         """
         self._reports_dir = reports_dir
+        self._negative_cache_ttl = negative_cache_ttl
+        self._search_time_budget = search_time_budget
+        # Incremented whenever a rescan finds that a directory has changed
+        self._generation = 0
+        # Runfolder name to the time until which, and the generation in which,
+        # it is known not to have any reports
+        self._missing = {}
+        # The subdirectories of each listed directory, and the mtime of the
+        # directory when it was listed
+        self._listings = {}
+        # Runfolder name to its directory, the one closest to the reports directory wins
+        self._index = {}
+        # Runfolder name to the report versions of the runfolder, and the mtimes
+        # of its reports directory, and of the version directories, when they were listed
+        self._versions = {}
 
     @staticmethod
-    def _bf_search(search_for, root, max_depth):
+    def _bf_search(search_for, root, max_depth, deadline=None):
         """
         Search a directory for a directory with a `search_for` breath from `root` to a
         maximum recursion depth of `max_depth`
+        :raises: TimeoutError if the search is still not done at `deadline`, in `time.monotonic()` time
         """
 
         # pylint: disable=R0903
@@ -45,13 +77,12 @@ class ReportsRepository:
             path: Path
             level: int
 
-        queue = Queue()
-        queue.put(PathLevel(path=Path(root), level=0))
+        queue = collections.deque([PathLevel(path=Path(root), level=0)])
         while True:
-            if queue.empty():
+            if not queue:
                 return None
 
-            elem = queue.get()
+            elem = queue.popleft()
 
             if elem.level > max_depth:
                 return None
@@ -59,12 +90,174 @@ class ReportsRepository:
             if elem.path.name == search_for:
                 return elem.path
 
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Search for {search_for} in {root} took too long")
+
             dirs = [x for x in elem.path.iterdir() if x.is_dir()]
             for directory in dirs:
-                queue.put(PathLevel(path=directory, level=elem.level + 1))
+                queue.append(PathLevel(path=directory, level=elem.level + 1))
+
+    def _scan(self, directory, level, listings):
+        """
+        Add the listings of `directory`, and of the directories below it, to `listings`,
+        reusing the listings from the previous scan of directories which have not changed
+        """
+        if level >= self.MAX_DEPTH:
+            return
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return
+        listing = self._listings.get(directory)
+        if listing and listing[0] == mtime:
+            subdirs = listing[1]
+        else:
+            try:
+                subdirs = sorted(path for path in directory.iterdir() if path.is_dir())
+            except OSError:
+                return
+        listings[directory] = (mtime, subdirs)
+        for subdir in subdirs:
+            self._scan(subdir, level + 1, listings)
+
+    @staticmethod
+    def _list_versions(reports_dir):
+        """
+        List the report versions in a `reports` directory, with the metadata of their reports
+        :return: a tuple of the mtimes, see `_versions_mtimes`, and a list of dicts, see `get_report_versions`
+        """
+        mtimes = [os.stat(reports_dir).st_mtime_ns]
+        versions = []
+        with os.scandir(reports_dir) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if not entry.is_dir():
+                    continue
+                mtimes.append(entry.stat().st_mtime_ns)
+                report_path = Path(os.path.realpath(Path(entry.path) / 'multiqc_report.html'))
+                try:
+                    stat = os.stat(report_path)
+                except OSError:
+                    stat = None
+                versions.append({
+                    'version': entry.name,
+                    'path': report_path,
+                    'target': os.readlink(entry.path) if entry.is_symlink() else None,
+                    'size': stat.st_size if stat else None,
+                    'mtime': stat.st_mtime if stat else None,
+                    'mtime_ns': stat.st_mtime_ns if stat else None,
+                })
+        return tuple(mtimes), versions
+
+    @staticmethod
+    def _versions_mtimes(reports_dir, versions):
+        """
+        Get the mtimes of a `reports` directory and of its version directories,
+        which change when versions are added or removed, or reports are written
+        to them, respectively
+        :return: a tuple of mtimes
+        """
+        return (os.stat(reports_dir).st_mtime_ns,
+                *(os.stat(reports_dir / version['version']).st_mtime_ns for version in versions))
+
+    def rescan(self):
+        """
+        Update the index with the directories which have been added to, or
+        removed from, the reports directory since the previous scan, and the
+        cached report versions of runfolders whose reports have changed
+        :return: True if the index changed
+        """
+        listings = {}
+        self._scan(Path(self._reports_dir), 0, listings)
+
+        # Index the directories level by level, like `_bf_search` finds them
+        index = {}
+        directories = [Path(self._reports_dir)]
+        while directories:
+            subdirs = [subdir for directory in directories for subdir in listings.get(directory, (None, []))[1]]
+            for subdir in subdirs:
+                index.setdefault(subdir.name, subdir)
+            directories = subdirs
+
+        # Lookups add to the cached versions, and the index, meanwhile, from the
+        # IOLoop and from other executor threads, so they are iterated over copies
+        versions = {}
+        for runfolder, (mtimes, runfolder_versions) in list(self._versions.items()):
+            runfolder_dir = index.get(runfolder)
+            if not runfolder_dir:
+                continue
+            try:
+                if self._versions_mtimes(runfolder_dir / 'reports', runfolder_versions) == mtimes:
+                    versions[runfolder] = (mtimes, runfolder_versions)
+                else:
+                    versions[runfolder] = self._list_versions(runfolder_dir / 'reports')
+            except OSError:
+                continue
+
+        changed = index != self._index
+        if listings != self._listings:
+            self._generation += 1
+        self._listings = listings
+        self._index = index
+        self._versions = versions
+
+        # Lookups remember missing runfolders meanwhile as well
+        now = time.monotonic()
+        self._missing = {
+            runfolder: (expiry, generation) for runfolder, (expiry, generation) in list(self._missing.items())
+            if expiry > now and generation == self._generation
+        }
+        return changed
+
+    def get_runfolders(self):
+        """
+        Get the runfolders in the index which have reports, i.e. a `reports` directory
+        :return: a sorted list of runfolder names
+        """
+        return sorted(
+            name for name, path in list(self._index.items())
+            if path / 'reports' in self._listings.get(path, (None, []))[1]
+        )
+
+    def _is_missing(self, runfolder):
+        expiry, generation = self._missing.get(runfolder, (0, None))
+        return expiry > time.monotonic() and generation == self._generation
+
+    def is_cached(self, runfolder):
+        """
+        Check if looking up the runfolder is served from memory, i.e. if it is
+        in the index or known not to have any reports
+        :param runfolder: name of the runfolder
+        :return: True if the lookup will not touch the file system
+        """
+        return runfolder in self._index or self._is_missing(runfolder)
+
+    def warm(self, runfolder):
+        """
+        Look up the runfolder, so that later lookups of it are served from memory,
+        see `is_cached`. This may search the file system, so in the IOLoop it
+        should be run in an executor.
+        :param runfolder: name of the runfolder
+        """
+        try:
+            self._find_runfolder_dir(runfolder)
+        except RunfolderNotFound:
+            pass
 
     def _find_runfolder_dir(self, runfolder):
-        result = self._bf_search(runfolder, self._reports_dir, 3)
+        result = self._index.get(runfolder)
+        if not result and not self._is_missing(runfolder):
+            generation = self._generation
+            try:
+                result = self._bf_search(runfolder, self._reports_dir, self.MAX_DEPTH,
+                                         deadline=time.monotonic() + self._search_time_budget)
+            except TimeoutError:
+                log.warning("Gave up searching for reports of %s after %s seconds.",
+                            runfolder, self._search_time_budget)
+            else:
+                if result:
+                    self._index[runfolder] = result
+                else:
+                    self._missing[runfolder] = (time.monotonic() + self._negative_cache_ttl, generation)
         if not result:
             raise RunfolderNotFound(
                 f"Could not identify a runfolder with the name: "
@@ -91,14 +284,31 @@ class ReportsRepository:
         """
         return self.get_report_with_version(runfolder, 'current')
 
+    def get_report_versions(self, runfolder):
+        """
+        Get the report versions of the specified runfolder, with the metadata of
+        their reports. The metadata is cached, and only read again when a rescan
+        finds that the mtime of the `reports` directory of the runfolder, or of
+        one of its version directories, has changed.
+        :param runfolder:
+        :return: a list of dicts, ordered by version, with the `version`, e.g. v1, v2
+                 or current, the resolved `path` to the report, the `target` of the
+                 version if it is a link, e.g. v2 for current, or None, and the `size`,
+                 `mtime` and `mtime_ns` of the report, None if there is no report
+        :raises: RunfolderNotFound if there was no such runfolder
+        """
+        runfolder_dir = self._find_runfolder_dir(runfolder)
+        cached = self._versions.get(runfolder)
+        if not cached:
+            cached = self._list_versions(runfolder_dir / 'reports')
+            if runfolder in self._index:
+                self._versions[runfolder] = cached
+        return cached[1]
+
     def get_all_report_versions_for_runfolder(self, runfolder):
         """
         Find all the report versions for the specified runfolder
         :param runfolder:
         :return: a generator of available version, e.g. v1, v2, current
         """
-
-        runfolder_dir = self._find_runfolder_dir(runfolder)
-        for report_dir in os.listdir(runfolder_dir / 'reports'):
-            if (runfolder_dir / 'reports' / report_dir).is_dir():
-                yield report_dir
+        yield from (version['version'] for version in self.get_report_versions(runfolder))
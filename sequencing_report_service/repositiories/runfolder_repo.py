@@ -4,33 +4,192 @@
 Module for classes and functions related to the identification of runfolders.
 """
 
+import bisect
+import logging
+import os
+import time
 from pathlib import Path
 
 from sequencing_report_service.exceptions import ConfigurationError, RunfolderNotFound
 
+log = logging.getLogger(__name__)
+
+# Files written to runfolders when sequencing, and copying of the data, has finished
+COMPLETION_MARKERS = {"rta_complete": "RTAComplete.txt", "copy_complete": "CopyComplete.txt"}
+
 
 class RunfolderRepository():
     """
     The RunfolderRepository is used to monitor a list of directories and returns paths to runfolders in these.
+
+    Runfolders are looked up in an index of the monitored directories, which is
+    kept current by calling `rescan` periodically. Only monitored directories
+    which have changed since the previous scan are listed again, and only
+    runfolders which are not yet complete, see `COMPLETION_MARKERS`, are
+    checked for changes. Runfolders which are not in the index are looked
+    for on disk, and names which are not found there either are remembered
+    for `negative_cache_ttl` seconds, so that repeated requests for them do
+    not hit the file system every time.
     """
 
-    def __init__(self, monitored_directories):
+    def __init__(self, monitored_directories, negative_cache_ttl=30):
         """
         Input a list of monitored directories, for this repository to look at
+        :param monitored_directories: list of directories which contain runfolders
+        :param negative_cache_ttl: seconds to remember that a runfolder does not exist
         """
         self._monitored_dirs = monitored_directories
         if not isinstance(self._monitored_dirs, list) and self._monitored_dirs is not None:
             raise ConfigurationError('"monitored_directories" in the config must be a list!')
+        self._negative_cache_ttl = negative_cache_ttl
+        # Names of the runfolders in each monitored directory, and the mtime of
+        # the directory when it was listed
+        self._listings = {}
+        # Runfolder name to the metadata of the runfolder, the first monitored
+        # directory wins, and the names in sorted order
+        self._runfolders = {}
+        self._names = []
+        # Runfolder name to the time until which it is known not to exist
+        self._missing = {}
+
+    def rescan(self):
+        """
+        Update the index with the runfolders which have been added to, removed
+        from, or changed in the monitored directories since the previous scan
+        :return: the names of the runfolders which have been added, removed or changed
+        """
+        listings_changed = False
+        for directory in self._monitored_dirs or []:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                log.warning("Could not access monitored directory %s.", directory)
+                mtime = None
+            listing = self._listings.get(directory)
+            if listing and listing[0] == mtime:
+                continue
+
+            names = set()
+            if mtime is not None:
+                with os.scandir(directory) as entries:
+                    names = {entry.name for entry in entries if entry.is_dir()}
+            if not listing or listing[1] != names:
+                listings_changed = True
+            self._listings[directory] = (mtime, names)
+
+        if listings_changed:
+            located = {}
+            for directory in reversed(self._monitored_dirs or []):
+                located.update({name: directory for name in self._listings[directory][1]})
+        else:
+            located = {name: runfolder["monitored_directory"] for name, runfolder in self._runfolders.items()}
+
+        runfolders = {}
+        changed = []
+        for name, directory in located.items():
+            previous = self._runfolders.get(name)
+            if previous and previous["monitored_directory"] != directory:
+                previous = None
+            runfolder = previous if previous and _is_complete(previous) else _read_runfolder(name, directory, previous)
+            if runfolder:
+                runfolders[name] = runfolder
+            if runfolder is not previous:
+                changed.append(name)
+        changed.extend(name for name in self._runfolders if name not in runfolders)
+
+        if changed:
+            self._runfolders = runfolders
+            self._names = sorted(runfolders)
+
+        # Runs in an executor thread, while lookups remember missing runfolders
+        # from the IOLoop, so the negative cache is pruned from a copy of it
+        now = time.monotonic()
+        self._missing = {
+            name: expiry for name, expiry in list(self._missing.items())
+            if expiry > now and name not in self._runfolders
+        }
+        return changed
+
+    def list_runfolders(self, after=None, limit=100, prefix=None):
+        """
+        List the runfolders in the index, ordered by name
+        :param after: only list runfolders with names after this
+        :param limit: maximum number of runfolders to list, None for all of them
+        :param prefix: only list runfolders with names starting with this
+        :return: a list of dicts with the `name`, `path`, `monitored_directory`, `mtime`,
+                 `rta_complete` and `copy_complete` of the runfolders
+        """
+        names = self._names
+        start = bisect.bisect_right(names, after) if after is not None else 0
+        if prefix:
+            start = max(start, bisect.bisect_left(names, prefix))
+
+        listed = []
+        for name in names[start:]:
+            if (limit is not None and len(listed) >= limit) or (prefix and not name.startswith(prefix)):
+                break
+            runfolder = self._runfolders.get(name)
+            if runfolder:
+                listed.append(runfolder)
+        return listed
+
+    def get_runfolder_metadata(self, runfolder):
+        """
+        Get the metadata of a runfolder in the index
+        :param runfolder: name of the runfolder
+        :return: a dict on the format of `list_runfolders`, or None if the runfolder is not in the index
+        """
+        return self._runfolders.get(runfolder)
 
     def get_runfolder(self, runfolder):
         """
         Return the path to the specified runfolder if it exists in one of the monitored directories,
          otherwise raise RunfolderNotFound Exception.
         """
+        indexed = self._runfolders.get(runfolder)
+        if indexed:
+            return indexed["path"]
+
+        if self._missing.get(runfolder, 0) < time.monotonic():
+            for directory in self._monitored_dirs:
+                potential_runfolder = Path(directory) / runfolder
+                if potential_runfolder.exists():
+                    self._missing.pop(runfolder, None)
+                    return potential_runfolder
+            self._missing[runfolder] = time.monotonic() + self._negative_cache_ttl
 
-        for directory in self._monitored_dirs:
-            potential_runfolder = Path(directory) / runfolder
-            if potential_runfolder.exists():
-                return potential_runfolder
         raise RunfolderNotFound(
             f"Could not identify a runfolder with the name: {runfolder} in any of the monitored directories.")
+
+
+def _is_complete(runfolder):
+    return all(runfolder[marker] for marker in COMPLETION_MARKERS)
+
+
+def _read_runfolder(name, directory, previous=None):
+    """
+    Read the metadata of a runfolder. The completion markers are only looked
+    for if the runfolder has changed since it was last read.
+    :param name: of the runfolder
+    :param directory: monitored directory the runfolder is in
+    :param previous: metadata of the runfolder from the previous scan, if any
+    :return: the metadata as a dict, `previous` if it has not changed, or None if the runfolder is gone
+    """
+    path = Path(directory) / name
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if previous and previous["mtime_ns"] == stat.st_mtime_ns:
+        return previous
+
+    runfolder = {
+        "name": name,
+        "path": path,
+        "monitored_directory": directory,
+        "mtime": stat.st_mtime,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    for key, marker in COMPLETION_MARKERS.items():
+        runfolder[key] = os.path.exists(path / marker)
+    return runfolder
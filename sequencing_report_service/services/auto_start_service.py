@@ -0,0 +1,118 @@
+"""
+Start pipelines automatically when runfolders become ready.
+"""
+
+import datetime
+import logging
+import os
+
+from sequencing_report_service.repositiories.runfolder_repo import COMPLETION_MARKERS
+
+log = logging.getLogger(__name__)
+
+
+class AutoStartService:
+    """
+    The AutoStartService starts configured pipelines on runfolders when they
+    become ready, i.e. when a completion marker, see `COMPLETION_MARKERS`,
+    shows up in them. It is fed the runfolders which have changed on every
+    rescan of the runfolder index, and should be given all runfolders in the
+    index once at startup, see `check_all`, so that runfolders which became
+    ready while the service was down are picked up as well.
+
+    Each pipeline is started at most once per runfolder: the jobs are started
+    with an idempotency key derived from the pipeline and the runfolder, and
+    runfolders for which there already is a job with that key are skipped, as
+    are runfolders on which the pipeline is already running, e.g. since it was
+    started manually. Runfolders which were ready before the service was set up
+    to start pipelines are left alone: runfolders whose completion marker was
+    written before `ready_after`, the time it was, are skipped.
+    """
+
+    def __init__(self, runner_service, runfolder_repo, pipelines, ready_after):
+        """
+        Create a new AutoStartService
+        :param runner_service: LocalRunnerService to start jobs with
+        :param runfolder_repo: RunfolderRepository whose index is watched
+        :param pipelines: dict of the pipelines to start, to the completion marker
+                          which makes runfolders ready for them, e.g. {"seqreports": "copy_complete"}
+        :param ready_after: datetime, naive datetimes are taken to be in UTC. Runfolders whose
+                            completion marker was written before it are not started on.
+        """
+        if ready_after is None:
+            raise ValueError("A time after which runfolders became ready is needed to start pipelines "
+                             "automatically, or they would be started on every runfolder")
+        for pipeline, marker in pipelines.items():
+            if marker not in COMPLETION_MARKERS:
+                raise ValueError(f"Unknown completion marker {marker} for pipeline {pipeline}, "
+                                 f"should be one of {', '.join(COMPLETION_MARKERS)}")
+        self._runner_service = runner_service
+        self._runfolder_repo = runfolder_repo
+        self._pipelines = pipelines
+        if not ready_after.tzinfo:
+            ready_after = ready_after.replace(tzinfo=datetime.timezone.utc)
+        self._ready_after = ready_after.timestamp()
+        # Runfolders which have been checked since they became ready, per pipeline
+        self._ready = {pipeline: set() for pipeline in pipelines}
+
+    @staticmethod
+    def idempotency_key(pipeline, runfolder):
+        """
+        Get the idempotency key automatically started jobs are started with
+        :param pipeline: name of the pipeline
+        :param runfolder: name of the runfolder
+        :return: the key as a str
+        """
+        return f"auto-start:{pipeline}:{runfolder}"
+
+    def check_all(self):
+        """
+        Start the configured pipelines on all runfolders in the index which are ready
+        :return: the ids of the jobs which were started
+        """
+        return self.check([runfolder["name"] for runfolder in self._runfolder_repo.list_runfolders(limit=None)])
+
+    def _ready_before_cutoff(self, runfolder, marker):
+        try:
+            return os.stat(runfolder["path"] / COMPLETION_MARKERS[marker]).st_mtime < self._ready_after
+        except OSError:
+            return False
+
+    def check(self, runfolders):
+        """
+        Start the configured pipelines on the runfolders which have become ready
+        :param runfolders: names of the runfolders which have changed since the last check
+        :return: the ids of the jobs which were started
+        """
+        job_ids = []
+        for name in runfolders:
+            runfolder = self._runfolder_repo.get_runfolder_metadata(name)
+            for pipeline, marker in self._pipelines.items():
+                if not runfolder or not runfolder[marker]:
+                    self._ready[pipeline].discard(name)
+                    continue
+                if name in self._ready[pipeline]:
+                    continue
+                self._ready[pipeline].add(name)
+
+                if self._ready_before_cutoff(runfolder, marker):
+                    log.debug("%s was ready before pipelines were started automatically, will not start %s.",
+                              name, pipeline)
+                    continue
+                idempotency_key = self.idempotency_key(pipeline, name)
+                if self._runner_service.has_job_with_idempotency_key(idempotency_key):
+                    log.info("Pipeline %s has already been started on %s.", pipeline, name)
+                    continue
+                in_flight_job_id = self._runner_service.get_in_flight_job_id(pipeline, runfolder["path"])
+                if in_flight_job_id is not None:
+                    log.info("Pipeline %s is already running on %s, in job %s.", pipeline, name, in_flight_job_id)
+                    continue
+                try:
+                    job_id = self._runner_service.start(
+                        pipeline, runfolder["path"], idempotency_key=idempotency_key)
+                except Exception:  # pylint: disable=W0703
+                    log.exception("Failed to start pipeline %s on %s.", pipeline, name)
+                    continue
+                log.info("Started job %s, running pipeline %s on %s which is now ready.", job_id, pipeline, name)
+                job_ids.append(job_id)
+        return job_ids
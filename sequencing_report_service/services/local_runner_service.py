@@ -7,27 +7,150 @@ Contains classes to run and manage jobs.
 """
 
 import asyncio
+import collections
+import datetime
+import hashlib
+import io
+import json
 import logging
-import subprocess
 import os
 import signal
 import shlex
+import time
 
+from tornado.ioloop import IOLoop
 from tornado.process import Subprocess
 
-from sequencing_report_service.models.db_models import State
+from sequencing_report_service.models.db_models import State, Priority
 from sequencing_report_service.exceptions import UnableToStopJob
-from sequencing_report_service.nextflow import nextflow_command
+from sequencing_report_service.nextflow import plan_nextflow_command, write_input_samplesheet, \
+    get_config_template, with_trace
+from sequencing_report_service.services.log_tailer import LogTailer
 
 log = logging.getLogger(__name__)
 
+EXIT_CODE_FILE = ".exitcode"
+TRACE_FILE = "trace.txt"
+# Files of a runfolder whose size and mtime make up its signature
+RUNFOLDER_SIGNATURE_FILES = ("RunInfo.xml", "SampleSheet.csv", "RTAComplete.txt")
+# Maximum number of job plans to keep cached, see `LocalRunnerService.plan`
+PLAN_CACHE_SIZE = 1024
+# Seconds between checks of whether the process of a job has exited
+EXIT_POLL_INTERVAL = 0.5
+
+
+async def _wait_for_exit(proc):
+    """
+    Wait for a child process to exit without blocking the event loop, and
+    collect its resource usage, which `Subprocess.wait_for_exit` discards.
+    :param proc: the `subprocess.Popen` of the process
+    :return: a tuple of the exit code and the `resource.struct_rusage` of the process
+    """
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid == proc.pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return proc.returncode, rusage
+        await asyncio.sleep(EXIT_POLL_INTERVAL)
+
+
+def _resource_usage(rusage, wall_time):
+    """
+    Convert the resource usage of a finished job to the values stored on the job.
+    The usage includes that of all the processes of the job which have been
+    waited for, i.e. the Nextflow head and the tasks it ran locally. Note that
+    the max RSS is that of the largest single process, not of all of them together.
+    :param rusage: `resource.struct_rusage` of the process of the job
+    :param wall_time: in seconds
+    :return: a dict of resource usage values
+    """
+    return {
+        "cpu_user_seconds": rusage.ru_utime,
+        "cpu_system_seconds": rusage.ru_stime,
+        "max_rss_kb": rusage.ru_maxrss,
+        "block_input_ops": rusage.ru_inblock,
+        "block_output_ops": rusage.ru_oublock,
+        "wall_time_seconds": wall_time,
+    }
+
+
+def _request_fingerprint(pipeline, runfolder_path, input_samplesheet_content, ext_args, config_params):
+    """
+    Compute a fingerprint of the arguments of a job start request. Requests
+    with the same fingerprint would start identical jobs.
+    :return: the fingerprint as a hex str
+    """
+    request = json.dumps(
+        [pipeline, str(runfolder_path), input_samplesheet_content or "", ext_args or [], config_params or {}],
+        sort_keys=True,
+    )
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+def _runfolder_signature(runfolder_path):
+    """
+    Get a cheap signature of the state of a runfolder, from the sizes and
+    mtimes of its key files, see `RUNFOLDER_SIGNATURE_FILES`.
+    :param runfolder_path: path to the runfolder
+    :return: a list with a (name, size, mtime) tuple, or (name, None, None) if it is missing, per file
+    """
+    signature = []
+    for name in RUNFOLDER_SIGNATURE_FILES:
+        try:
+            stat = os.stat(os.path.join(runfolder_path, name))
+            signature.append((name, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append((name, None, None))
+    return signature
+
+
+def _input_fingerprint(command_with_env, input_samplesheet_content, runfolder_path):
+    """
+    Compute a fingerprint of the inputs of a job. Jobs with the same
+    fingerprint run the same command on a runfolder which has not changed.
+    :param command_with_env: the command of the job, see `plan_nextflow_command`
+    :param input_samplesheet_content: content of the input samplesheet of the job
+    :param runfolder_path: path to the runfolder the job processes
+    :return: the fingerprint as a hex str
+    """
+    inputs = json.dumps(
+        [command_with_env, input_samplesheet_content or "", _runfolder_signature(runfolder_path)],
+        sort_keys=True,
+    )
+    return hashlib.sha256(inputs.encode("utf-8")).hexdigest()
+
+
+def _process_start_time(pid):
+    """
+    Get the start time of a running process, in clock ticks since boot, from
+    `/proc/<pid>/stat`. Together with the pid it identifies the process, since
+    pids are reused.
+    :param pid: of the process
+    :return: the start time as a str, or None if there is no such running process
+    """
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return None
+
+    # The command name in the second field may contain spaces, so the fields
+    # are split after it. The state and the start time are then the first
+    # and the twentieth field.
+    fields = stat[stat.rindex(")") + 2:].split()
+    if fields[0] in ("Z", "X"):
+        return None
+    return fields[19]
+
 
 class LocalRunnerService:
     """
     The local runner service will start jobs one by one and attempt to run to
-    the command associated with it. In order for jobs to actually be started
-    `process_job_queue` must be called. This can e.g. be done periodically from
-    the application event loop.
+    the command associated with it. New jobs are queued as pending, and are
+    started by `process_job_queue` as long as the global and per pipeline
+    limits on the number of concurrently running jobs allow it. The queue is
+    processed whenever a job is added or finishes, and should also be
+    processed periodically from the application event loop.
 
     Please note that while the LocalRunnerService will use Job instances
     returned from the JobRepository, these should not be returned to the called
@@ -38,70 +161,281 @@ class LocalRunnerService:
     instance.
     """
 
-    def __init__(self, job_repo_factory, pipeline_config_dir, nextflow_log_dirs):
+    def __init__(
+        self,
+        job_repo_factory,
+        pipeline_config_dir,
+        nextflow_log_dirs,
+        max_concurrent_jobs=None,
+        max_concurrent_jobs_per_pipeline=None,
+        adopted_job_poll_interval=10,
+        log_poll_interval=5,
+    ):
         """
         Create a new instance of LocalRunnerService
         :param: job_repo_factory factory method which can produce new JobRepository instances
         :param: pipeline_config_dir directory containing the pipeline configs
         :param: nextflow_log_dirs specifies where nextflow logs should be stored
+        :param: max_concurrent_jobs maximum number of jobs to run at the same time, None for no limit
+        :param: max_concurrent_jobs_per_pipeline dict with the maximum number of jobs to run at the
+                same time for specific pipelines
+        :param: adopted_job_poll_interval how often, in seconds, to check if jobs adopted from a previous
+                instance of the service are still running
+        :param: log_poll_interval how often, in seconds, to ingest new output from the logs of running jobs
         """
         self._job_repo_factory = job_repo_factory
         self._pipeline_config_dir = pipeline_config_dir
         self._nextflow_log_dirs = nextflow_log_dirs
+        self._max_concurrent_jobs = max_concurrent_jobs
+        self._max_concurrent_jobs_per_pipeline = max_concurrent_jobs_per_pipeline or {}
+        # Jobs which have been dispatched by this service and have not yet
+        # finished, mapped to the pipeline they run.
+        self._running_jobs = {}
+        self._adopted_job_poll_interval = adopted_job_poll_interval
+        self._log_tailer = LogTailer(job_repo_factory, poll_interval=log_poll_interval)
+        # Least recently used cache of rendered job plans
+        self._plan_cache = collections.OrderedDict()
+
+    def _working_dir(self, job_id):
+        return os.path.join(self._nextflow_log_dirs, str(job_id))
+
+    def _log_path(self, job_id):
+        return os.path.join(self._working_dir(job_id), "nextflow.out")
+
+    def _trace_path(self, job_id):
+        return os.path.join(self._working_dir(job_id), TRACE_FILE)
 
     async def _start_process(self, job_id):
         with self._job_repo_factory() as job_repo:
             job = job_repo.get_job(job_id)
             assert job
 
-            working_dir = os.path.join(
-                self._nextflow_log_dirs, str(job_id))
+            if job.state not in (State.PENDING, State.READY):
+                log.info("Will not start job %s since it is no longer queued (state: %s).", job_id, job.state)
+                return
+
+            working_dir = self._working_dir(job_id)
             os.mkdir(working_dir)
-            nxf_log = os.path.join(working_dir, "nextflow.out")
+            nxf_log = self._log_path(job_id)
             sys_env = os.environ.copy() or {}
             job_env = job.environment or {}
             env = {**sys_env, **job_env}
-            cmd = shlex.split(shlex.quote(" ".join(job.command)))
+            # The exit code is written to a file, so that the outcome of the job
+            # can be found even if the service is restarted while it runs.
+            cmd = shlex.split(shlex.quote(
+                f"{' '.join(with_trace(job.command, TRACE_FILE))}; "
+                f"exit_code=$?; echo $exit_code > {EXIT_CODE_FILE}; exit $exit_code"
+            ))
 
-            try:
-                with open(nxf_log, "w", encoding="utf-8") as nxf_log_fh:
-                    log.debug("Will start command %s", cmd)
-                    process = Subprocess(
-                        cmd,
-                        stdout=nxf_log_fh,
-                        stderr=nxf_log_fh,
-                        env=env,
-                        cwd=working_dir,
-                        shell=True,
-                    )
+            with open(nxf_log, "w", encoding="utf-8") as nxf_log_fh:
+                log.debug("Will start command %s", cmd)
+                started_at = time.monotonic()
+                process = Subprocess(
+                    cmd,
+                    stdout=nxf_log_fh,
+                    stderr=nxf_log_fh,
+                    env=env,
+                    cwd=working_dir,
+                    shell=True,
+                    start_new_session=True,
+                )
 
-                    job_repo.set_state_of_job(job_id=job.job_id, state=State.STARTED)
-                    job_repo.set_pid_of_job(job.job_id, process.pid)
+                job_repo.set_state_of_job(job_id=job.job_id, state=State.STARTED)
+                job_repo.set_pid_of_job(job.job_id, process.pid, _process_start_time(process.pid))
 
-                    await process.wait_for_exit()
+                tail_task = asyncio.get_running_loop().create_task(self._log_tailer.follow(
+                    job_id, nxf_log, self._trace_path(job_id)))
+                try:
+                    exit_code, rusage = await _wait_for_exit(process.proc)
+                finally:
+                    tail_task.cancel()
+                    self._ingest_log(job_id, final=True)
 
-                with open(nxf_log, encoding="utf-8") as log_file:
-                    cmd_log = log_file.read()
+            job_repo.set_resource_usage_of_job(
+                job_id, **_resource_usage(rusage, wall_time=time.monotonic() - started_at))
 
+            if exit_code == 0:
                 log.info("Successfully completed process: %s", job.command)
-                job_repo.set_state_of_job(
-                    job_id=job.job_id,
-                    state=State.DONE,
-                    cmd_log=cmd_log,
-                )
-            except subprocess.CalledProcessError:
+                job_repo.set_state_of_job(job_id=job.job_id, state=State.DONE)
+                return
+
+            job = job_repo.get_job(job_id)
+            if job.state == State.CANCELLED:
+                return
+
+            log.error("Job %s failed with exit code %s.", job_id, exit_code)
+            job_repo.set_state_of_job(job_id=job_id, state=State.ERROR)
+
+    def _ingest_log(self, job_id, final=False):
+        try:
+            self._log_tailer.ingest(job_id, self._log_path(job_id), final=final)
+            self._log_tailer.ingest_trace(job_id, self._trace_path(job_id), final=final)
+        except Exception:  # pylint: disable=W0703
+            log.exception("Failed to ingest the log of job %s.", job_id)
+
+    def _read_exit_code(self, job_id):
+        try:
+            with open(os.path.join(self._working_dir(job_id), EXIT_CODE_FILE), encoding="utf-8") as exit_code_file:
+                return int(exit_code_file.read())
+        except (OSError, ValueError):
+            return None
+
+    def _finish_adopted_job(self, job_id):
+        exit_code = self._read_exit_code(job_id)
+        if exit_code is None:
+            state = State.CANCELLED
+        else:
+            state = State.DONE if exit_code == 0 else State.ERROR
+
+        with self._job_repo_factory() as job_repo:
+            job = job_repo.get_job(job_id)
+            if job.state == State.CANCELLED:
+                return
+            log.info("Job %s finished with exit code %s, setting its state to %s.", job_id, exit_code, state)
+            job_repo.set_state_of_job(job_id=job_id, state=state)
+
+    async def _monitor_adopted_job(self, job_id, pid, pid_start_time):
+        try:
+            while _process_start_time(pid) == pid_start_time:
+                await asyncio.sleep(self._adopted_job_poll_interval)
+                self._ingest_log(job_id)
+            self._ingest_log(job_id, final=True)
+            self._finish_adopted_job(job_id)
+        except Exception:  # pylint: disable=W0703
+            log.exception("Failed to monitor job %s.", job_id)
+        finally:
+            del self._running_jobs[job_id]
+            self.process_job_queue()
+
+    def reattach_running_jobs(self):
+        """
+        Reconcile jobs which were started by a previous instance of the service.
+        Should be called once at the start up of the application.
+
+        Jobs whose process is still running are adopted: they count towards the
+        concurrency limits, and their final state is recorded once the process
+        exits. Processes are identified by their pid together with their start
+        time, since pids are reused. Jobs whose process exited while the service
+        was down have the rest of their log and trace file ingested, and get
+        their final state from the exit code the process left behind. Jobs for
+        which the outcome cannot be told are cancelled.
+        :return: list of the ids of the adopted jobs
+        """
+        adopted = []
+        with self._job_repo_factory() as job_repo:
+            for job in job_repo.get_jobs_with_state(State.STARTED):
+                if job.pid and job.pid_start_time and _process_start_time(job.pid) == job.pid_start_time:
+                    log.info("Reattaching to job %s, with pid %s.", job.job_id, job.pid)
+                    self._running_jobs[job.job_id] = job.pipeline
+                    IOLoop.current().spawn_callback(
+                        self._monitor_adopted_job, job.job_id, job.pid, job.pid_start_time)
+                    adopted.append(job.job_id)
+                elif self._read_exit_code(job.job_id) is not None:
+                    self._ingest_log(job.job_id, final=True)
+                    self._finish_adopted_job(job.job_id)
+
+            # Anything left is cancelled, or put back in the queue
+            job_repo.clear_out_stale_jobs_at_startup(adopted_job_ids=adopted)
+        return adopted
+
+    def _running_in_pipeline(self, pipeline):
+        return sum(1 for running in self._running_jobs.values() if running == pipeline)
+
+    def _has_global_capacity(self):
+        return self._max_concurrent_jobs is None or len(self._running_jobs) < self._max_concurrent_jobs
+
+    def _has_capacity(self, pipeline):
+        pipeline_limit = self._max_concurrent_jobs_per_pipeline.get(pipeline)
+        return pipeline_limit is None or self._running_in_pipeline(pipeline) < pipeline_limit
+
+    def _fail_job(self, job_id):
+        try:
+            with self._job_repo_factory() as job_repo:
                 job = job_repo.get_job(job_id)
-                if job.state == State.CANCELLED:
-                    return
-
-                with open(nxf_log, encoding="utf-8") as log_file:
-                    cmd_log = log_file.read()
-                log.exception('Job failed with the following error:')
-                job_repo.set_state_of_job(
-                    job_id=job_id,
-                    state=State.ERROR,
-                    cmd_log=cmd_log,
+                if job and job.state in (State.READY, State.STARTED):
+                    job_repo.set_state_of_job(job_id=job_id, state=State.ERROR)
+        except Exception:  # pylint: disable=W0703
+            log.exception("Failed to set the state of job %s to error.", job_id)
+
+    async def _run_job(self, job_id):
+        try:
+            await self._start_process(job_id)
+        except Exception:  # pylint: disable=W0703
+            # e.g. the working directory of the job could not be created, the
+            # job must not be left as dispatched without a process
+            log.exception("Failed to run job %s.", job_id)
+            self._fail_job(job_id)
+        finally:
+            del self._running_jobs[job_id]
+            self.process_job_queue()
+
+    def process_job_queue(self):
+        """
+        Start pending jobs for as long as the concurrency limits allow it. Must
+        be called from within the running event loop.
+
+        Jobs in a higher priority class are always started first. Within a
+        priority class the pipelines share the available slots fairly: the next
+        job is taken from the pipeline which currently has the fewest running
+        jobs, and within a pipeline the oldest job goes first.
+        :return: list of the ids of the jobs that were started
+        """
+        started = []
+        if not self._has_global_capacity():
+            return started
+
+        loop = asyncio.get_running_loop()
+        with self._job_repo_factory() as job_repo:
+            # The next job of each pipeline which is not at its limit
+            candidates = {}
+            for pipeline in job_repo.get_pending_pipelines():
+                if self._has_capacity(pipeline):
+                    candidates[pipeline] = job_repo.get_next_pending_job(pipeline)
+
+            while candidates and self._has_global_capacity():
+                pipeline = min(
+                    candidates,
+                    key=lambda p: (candidates[p][1], self._running_in_pipeline(p), candidates[p][0]),
                 )
+                job_id, _ = candidates.pop(pipeline)
+
+                log.debug("Starting job %s for pipeline %s", job_id, pipeline)
+                # Jobs are moved out of the queue right away, so that they are
+                # not picked up again before their process has been started.
+                job_repo.set_state_of_job(job_id, State.READY)
+                self._running_jobs[job_id] = pipeline
+                loop.create_task(self._run_job(job_id))
+                started.append(job_id)
+
+                if self._has_capacity(pipeline):
+                    next_job = job_repo.get_next_pending_job(pipeline)
+                    if next_job:
+                        candidates[pipeline] = next_job
+        return started
+
+    def get_queue_status(self):
+        """
+        Get the state of the job queue
+        :return: a dict with the ids of the running and pending jobs (ordered by
+                 priority and age), and the concurrency limits
+        """
+        with self._job_repo_factory() as job_repo:
+            pending_jobs = job_repo.get_pending_jobs()
+        return {
+            "running": sorted(self._running_jobs),
+            "pending": [job_id for job_id, _ in pending_jobs],
+            "max_concurrent_jobs": self._max_concurrent_jobs,
+            "max_concurrent_jobs_per_pipeline": self._max_concurrent_jobs_per_pipeline,
+        }
+
+    def get_queue_position(self, job_id):
+        """
+        Get the position of a pending job in the job queue
+        :param job_id: of the pending job
+        :return: the 1-based position of the job in the queue
+        """
+        with self._job_repo_factory() as job_repo:
+            return job_repo.get_queue_position(job_id)
 
     def start(
         self,
@@ -110,19 +444,44 @@ class LocalRunnerService:
         input_samplesheet_content="",
         ext_args=None,
         config_params=None,
+        priority=Priority.NORMAL,
+        idempotency_key=None,
+        force=False,
     ):
         """
-        Start a new job for the specified runfolder
+        Queue a new job for the specified runfolder, it will be started as soon
+        as the concurrency limits allow it.
+
+        Starting jobs is idempotent: if a job started by an earlier request with
+        the same idempotency key, or with the same arguments if no key is given,
+        is still pending or running, that job is returned instead of queueing
+        a second one. Likewise, unless `force` is set, a job which has already
+        finished successfully with the same command, on a runfolder which has
+        not changed since, is returned instead of running it again.
         :param pipeline: name of the pipeline to run
         :param runfolder_path: path to the runfolder to process
         :param input_samplesheet_content: content of the input samplesheet
         :param ext_args: extra args to append to the nextflow command
         :param config_params: parameters to pass to the pipeline config file
+        :param priority: Priority class of the job in the queue
+        :param idempotency_key: optional key identifying the request
+        :param force: set to run the job even if an identical job has already finished
 
-        :return: the job id of the started job
+        :return: the job id of the queued, in flight, or finished job
         """
+        request_key = idempotency_key or _request_fingerprint(
+            pipeline, runfolder_path, input_samplesheet_content, ext_args, config_params)
         with self._job_repo_factory() as job_repo:
-            nf_cmd = nextflow_command(
+            in_flight_job_id = job_repo.get_in_flight_job_id(request_key)
+            if in_flight_job_id is not None:
+                log.info("Job %s is already in flight for this request, will not start another one.",
+                         in_flight_job_id)
+                return in_flight_job_id
+
+            # The input samplesheet is only written to the runfolder once it is
+            # known that a job will be queued, so that reusing the results of a
+            # finished job leaves the runfolder untouched.
+            plan = plan_nextflow_command(
                 pipeline,
                 runfolder_path,
                 self._pipeline_config_dir,
@@ -130,12 +489,108 @@ class LocalRunnerService:
                 ext_args,
                 config_params,
             )
-            job_id = job_repo.add_job(command_with_env=nf_cmd).job_id
-        log.debug("calling start_process with id %s" % str(job_id))
-        loop = asyncio.get_running_loop()
-        loop.create_task(self._start_process(job_id))
+            nf_cmd = {"command": plan["command"], "environment": plan["environment"]}
+            input_fingerprint = _input_fingerprint(nf_cmd, input_samplesheet_content, runfolder_path)
+            if not force:
+                done_job_id = job_repo.get_done_job_id(input_fingerprint)
+                if done_job_id is not None:
+                    log.info("Job %s has already run on the same inputs, will reuse its results.", done_job_id)
+                    return done_job_id
+
+            write_input_samplesheet(plan)
+            job_id = job_repo.add_job(
+                command_with_env=nf_cmd,
+                pipeline=pipeline,
+                priority=priority,
+                request_key=request_key,
+                input_fingerprint=input_fingerprint,
+            ).job_id
+        log.debug("Queued job %s", job_id)
+        self.process_job_queue()
         return job_id
 
+    def get_in_flight_job_id(
+        self,
+        pipeline,
+        runfolder_path,
+        input_samplesheet_content="",
+        ext_args=None,
+        config_params=None,
+    ):
+        """
+        Get the job started by an earlier request with the same arguments, and
+        without an idempotency key, if it is still pending or running
+        :param pipeline: name of the pipeline
+        :param runfolder_path: path to the runfolder
+        :param input_samplesheet_content: content of the input samplesheet
+        :param ext_args: extra args to append to the nextflow command
+        :param config_params: parameters to pass to the pipeline config file
+        :return: the job id, or None if there is no such job
+        """
+        request_key = _request_fingerprint(pipeline, runfolder_path, input_samplesheet_content, ext_args,
+                                           config_params)
+        with self._job_repo_factory() as job_repo:
+            return job_repo.get_in_flight_job_id(request_key)
+
+    def has_job_with_idempotency_key(self, idempotency_key):
+        """
+        Check if a job has ever been started with the idempotency key
+        :param idempotency_key: key identifying the request
+        :return: True if there is such a job, in any state
+        """
+        with self._job_repo_factory() as job_repo:
+            return job_repo.has_job_with_request_key(idempotency_key)
+
+    def plan(
+        self,
+        pipeline,
+        runfolder_path,
+        input_samplesheet_content="",
+        ext_args=None,
+        config_params=None,
+    ):
+        """
+        Render the job that `start` would queue with the same arguments, without
+        queueing it or writing anything to the runfolder. Rendered plans are
+        cached, until the config of the pipeline changes.
+        :param pipeline: name of the pipeline to run
+        :param runfolder_path: path to the runfolder to process
+        :param input_samplesheet_content: content of the input samplesheet
+        :param ext_args: extra args to append to the nextflow command
+        :param config_params: parameters to pass to the pipeline config file
+
+        :return: a dict with the `command`, `environment`, `input_samplesheet_path` and
+                 `input_samplesheet_content` of the job, its `input_fingerprint`, and the
+                 `reusable_job_id` of a finished job with the same inputs, if there is one
+        """
+        template = get_config_template(self._pipeline_config_dir, pipeline)
+        key = (
+            _request_fingerprint(pipeline, runfolder_path, input_samplesheet_content, ext_args, config_params),
+            template.digest,
+            datetime.date.today().year,
+        )
+        plan = self._plan_cache.get(key)
+        if plan is None:
+            plan = plan_nextflow_command(
+                pipeline,
+                runfolder_path,
+                self._pipeline_config_dir,
+                input_samplesheet_content,
+                ext_args,
+                config_params,
+            )
+            self._plan_cache[key] = plan
+            if len(self._plan_cache) > PLAN_CACHE_SIZE:
+                self._plan_cache.popitem(last=False)
+        else:
+            self._plan_cache.move_to_end(key)
+
+        command_with_env = {"command": plan["command"], "environment": plan["environment"]}
+        input_fingerprint = _input_fingerprint(command_with_env, input_samplesheet_content, runfolder_path)
+        with self._job_repo_factory() as job_repo:
+            reusable_job_id = job_repo.get_done_job_id(input_fingerprint)
+        return {**plan, "input_fingerprint": input_fingerprint, "reusable_job_id": reusable_job_id}
+
     def stop(self, job_id):
         """
         Stop the job with the specified id
@@ -144,27 +599,64 @@ class LocalRunnerService:
         """
         with self._job_repo_factory() as job_repo:
             job = job_repo.get_job(job_id)
-            if job and job.state == State.PENDING:
-                log.info("Found pending job: %s. Will set its state to cancelled.", job)
+            if job and job.state in (State.PENDING, State.READY):
+                log.info("Found queued job: %s. Will set its state to cancelled.", job)
                 job_repo.set_state_of_job(job_id, State.CANCELLED)
                 return job.job_id
             if job and job.state == State.STARTED:
                 log.info("Will stop the currently running job.")
                 job_repo.set_state_of_job(job_id, State.CANCELLED)
-                os.kill(job.pid, signal.SIGTERM)
+                # Jobs are started in their own process group, stop the whole group
+                os.killpg(job.pid, signal.SIGTERM)
                 return job.job_id
             log.debug("Found no job to cancel with with job id: {}. Or it was not in a cancellable state.")
             raise UnableToStopJob()
 
-    def get_jobs(self):
+    def get_jobs(self, **filters):
+        """
+        Return one page of jobs as a list of read-only JobRecords
+        :param filters: paging and filter arguments, see `JobRepository.get_jobs_page`
+        :return: list of JobRecords
+        """
+        with self._job_repo_factory() as job_repo:
+            return job_repo.get_jobs_page(**filters)
+
+    def get_job_record(self, job_id):
+        """
+        Get a read-only record of the job corresponding to the specific job id
+        :param job_id: to fetch job for.
+        :return: a JobRecord, or None if there is no job with the specified job id
+        """
+        with self._job_repo_factory() as job_repo:
+            return job_repo.get_job_record(job_id)
+
+    def open_job_log(self, job_id):
+        """
+        Open the log of the job with the specified id for reading, in binary
+        mode. The log is read from the job's `nextflow.out` file, for jobs run
+        before logs were kept on disk the log stored in the database is used.
+        :param job_id: to open the log for
+        :return: a binary file object, or None if there is no log for the job
+        """
+        try:
+            return open(self._log_path(job_id), "rb")
+        except FileNotFoundError:
+            pass
+
+        with self._job_repo_factory() as job_repo:
+            legacy_log = job_repo.get_job_log(job_id)
+        if legacy_log is None:
+            return None
+        return io.BytesIO(legacy_log.encode("utf-8"))
+
+    def get_task_summary(self, job_id):
         """
-        Return all jobs as a list
-        :return: list of all jobs
+        Get the performance of the tasks run by the job, aggregated per process
+        :param job_id: to get the task summary for
+        :return: a list of dicts, one per process, see `JobRepository.get_task_summary`
         """
         with self._job_repo_factory() as job_repo:
-            for job in job_repo.get_jobs():
-                job_repo.expunge_object(job)
-            return job_repo.get_jobs()
+            return job_repo.get_task_summary(job_id)
 
     def get_job(self, job_id):
         """
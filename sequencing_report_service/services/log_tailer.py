@@ -0,0 +1,111 @@
+"""
+Follow the output, and trace files, of running jobs and record their progress
+as it is written.
+"""
+
+import asyncio
+import logging
+
+from sequencing_report_service.nextflow import parse_log_progress, parse_trace_record
+
+log = logging.getLogger(__name__)
+
+
+def read_new_lines(path, offset, final=False):
+    """
+    Read the lines which have been added to a file since `offset`. Only
+    complete lines are returned, unless `final` is set, so that a line that
+    is being written is picked up in whole on the next read.
+    :param path: to the file to read
+    :param offset: in bytes, at which to start reading
+    :param final: set to also return a trailing line without a newline
+    :return: a (lines, offset) tuple, where offset is where the next read should start
+    """
+    lines = []
+    try:
+        with open(path, "rb") as file_handle:
+            file_handle.seek(offset)
+            for line in file_handle:
+                if not line.endswith(b"\n") and not final:
+                    break
+                offset += len(line)
+                lines.append(line.decode("utf-8", errors="replace").rstrip("\n"))
+    except FileNotFoundError:
+        pass
+    return lines, offset
+
+
+def _read_first_line(path):
+    with open(path, "rb") as file_handle:
+        return file_handle.readline().decode("utf-8", errors="replace").rstrip("\n")
+
+
+class LogTailer:
+    """
+    The LogTailer ingests the log and the trace file of a job in increments
+    while it runs. It keeps the byte offsets up to which the files have been
+    read on the job, so every pass only reads the bytes which have been
+    appended since the previous one. The progress of the job is updated from
+    the log, and the performance records of finished tasks are stored from the
+    trace file.
+    """
+
+    def __init__(self, job_repo_factory, poll_interval=5):
+        """
+        Create a new LogTailer
+        :param job_repo_factory: factory method which can produce new JobRepository instances
+        :param poll_interval: seconds to wait between passes while following a log
+        """
+        self._job_repo_factory = job_repo_factory
+        self._poll_interval = poll_interval
+
+    def ingest(self, job_id, log_path, final=False):
+        """
+        Ingest what has been appended to the log of the job since the last pass
+        :param job_id: of the job the log belongs to
+        :param log_path: path to the log file
+        :param final: set when the job has finished, to also ingest a trailing incomplete line
+        :return: the number of lines ingested
+        """
+        with self._job_repo_factory() as job_repo:
+            offset = job_repo.get_log_offset(job_id)
+            lines, new_offset = read_new_lines(log_path, offset, final=final)
+            if new_offset != offset:
+                job_repo.add_job_progress(job_id, new_offset, **parse_log_progress(lines))
+        return len(lines)
+
+    def ingest_trace(self, job_id, trace_path, final=False):
+        """
+        Ingest the tasks which have been appended to the trace file of the job since the last pass
+        :param job_id: of the job the trace file belongs to
+        :param trace_path: path to the tab separated trace file
+        :param final: set when the job has finished, to also ingest a trailing incomplete line
+        :return: the number of tasks ingested
+        """
+        with self._job_repo_factory() as job_repo:
+            offset = job_repo.get_trace_offset(job_id)
+            lines, new_offset = read_new_lines(trace_path, offset, final=final)
+            if not lines:
+                return 0
+
+            header = lines.pop(0) if offset == 0 else _read_first_line(trace_path)
+            columns = header.split("\t")
+            tasks = [parse_trace_record(dict(zip(columns, line.split("\t")))) for line in lines if line]
+            job_repo.add_job_tasks(job_id, new_offset, tasks)
+        return len(tasks)
+
+    async def follow(self, job_id, log_path, trace_path=None):
+        """
+        Ingest the log, and trace file, of the job every `poll_interval` seconds, until cancelled
+        :param job_id: of the job the files belong to
+        :param log_path: path to the log file
+        :param trace_path: path to the trace file, if any
+        """
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                self.ingest(job_id, log_path)
+                if trace_path:
+                    self.ingest_trace(job_id, trace_path)
+            except Exception:  # pylint: disable=W0703
+                log.exception("Failed to ingest the log of job %s.", job_id)
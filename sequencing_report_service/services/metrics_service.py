@@ -0,0 +1,123 @@
+"""
+Ingest the metrics of MultiQC reports, and query them across runfolders.
+"""
+
+import datetime
+import logging
+import os
+import re
+
+from tornado.ioloop import IOLoop
+
+from sequencing_report_service.exceptions import RunfolderNotFound
+from sequencing_report_service.multiqc import DATA_DIR, read_report_metrics
+
+log = logging.getLogger(__name__)
+
+# Report versions which are ingested, i.e. not the `current` link
+VERSION_PATTERN = re.compile(r"^v\d+$")
+
+
+def _read_report_version(report_dir):
+    """
+    Read the metrics of a report version, and when it was made
+    :return: a tuple of the time in naive UTC, the sample metrics and the lane metrics,
+             or None if the report has no MultiQC data
+    """
+    metrics = read_report_metrics(report_dir)
+    if metrics is None:
+        return None
+    mtime = os.stat(report_dir / DATA_DIR).st_mtime
+    report_time = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc).replace(tzinfo=None)
+    return (report_time, *metrics)
+
+
+class MetricsService:
+    """
+    The MetricsService ingests the general stats of the samples, and the
+    per-lane metrics, of each report version in the reports directory into
+    the database once, when `ingest_new_reports` first finds it, so that
+    they can be queried across runfolders without opening any reports.
+    Report versions without MultiQC data, e.g. while the report is still
+    being written, or whose data cannot be read, are tried again on the
+    next call.
+    """
+
+    def __init__(self, metrics_repo_factory, reports_repo):
+        """
+        Create a new MetricsService
+        :param metrics_repo_factory: factory method returning a MetricsRepository
+        :param reports_repo: ReportsRepository to find the report versions in
+        """
+        self._metrics_repo_factory = metrics_repo_factory
+        self._reports_repo = reports_repo
+        # (runfolder, version) of the report versions which have been ingested
+        self._ingested = None
+
+    def _find_new_versions(self):
+        new_versions = []
+        for runfolder in self._reports_repo.get_runfolders():
+            try:
+                versions = list(self._reports_repo.get_all_report_versions_for_runfolder(runfolder))
+            except (RunfolderNotFound, OSError):
+                continue
+            new_versions.extend(
+                (runfolder, version) for version in versions
+                if VERSION_PATTERN.match(version) and (runfolder, version) not in self._ingested
+            )
+        return new_versions
+
+    async def ingest_new_reports(self):
+        """
+        Ingest the metrics of the report versions which have not been ingested
+        yet. Reading the reports is done in an executor, so that it does not
+        hold up the IOLoop.
+        :return: the (runfolder, version) of the report versions which were ingested
+        """
+        if self._ingested is None:
+            with self._metrics_repo_factory() as metrics_repo:
+                self._ingested = metrics_repo.get_ingested_versions()
+
+        io_loop = IOLoop.current()
+        ingested = []
+        for runfolder, version in await io_loop.run_in_executor(None, self._find_new_versions):
+            try:
+                report_dir = self._reports_repo.get_report_with_version(runfolder, version).parent
+                report = await io_loop.run_in_executor(None, _read_report_version, report_dir)
+            except (RunfolderNotFound, OSError, ValueError) as exc:
+                log.warning("Could not read the MultiQC data of %s %s: %s", runfolder, version, exc)
+                continue
+            except Exception:  # pylint: disable=W0703
+                # e.g. MultiQC data which is laid out differently than expected,
+                # which must not keep the report versions after it from being ingested
+                log.exception("Failed to read the MultiQC data of %s %s.", runfolder, version)
+                continue
+            if report is None:
+                continue
+
+            report_time, sample_metrics, lane_metrics = report
+            with self._metrics_repo_factory() as metrics_repo:
+                metrics_repo.add_report_metrics(runfolder, version, report_time, sample_metrics, lane_metrics)
+            self._ingested.add((runfolder, version))
+            ingested.append((runfolder, version))
+            log.info("Ingested %s sample and %s lane metrics of %s %s.",
+                     len(sample_metrics), len(lane_metrics), runfolder, version)
+        return ingested
+
+    def get_metric_names(self):
+        """
+        Get the names of all ingested metrics
+        :return: a list of dicts with the `metric` and its `level`, `sample` or `lane`
+        """
+        with self._metrics_repo_factory() as metrics_repo:
+            return metrics_repo.get_metric_names()
+
+    def get_metric(self, metric, **filters):
+        """
+        Get the values of a metric across report versions
+        :param metric: name of the metric
+        :param filters: see `MetricsRepository.get_metric`
+        :return: a list of dicts, one per report version
+        """
+        with self._metrics_repo_factory() as metrics_repo:
+            return metrics_repo.get_metric(metric, **filters)
@@ -0,0 +1,93 @@
+"""
+Keep track of the pipeline configs which jobs can be started with.
+"""
+
+import datetime
+import logging
+from pathlib import Path
+
+from sequencing_report_service.nextflow import get_config_template
+
+log = logging.getLogger(__name__)
+
+
+class PipelineConfigService:
+    """
+    The PipelineConfigService loads, validates and compiles all pipeline
+    configs in the pipeline config directory, so that a broken config shows
+    up when the service starts, rather than when a job is first started with
+    it. Calling `reload` again picks up configs which have been added, changed
+    or removed since. Only configs which have changed on disk are parsed
+    again, and a new version of a config only replaces the previous one once
+    it has been parsed and validated in whole.
+    """
+
+    def __init__(self, pipeline_config_dir):
+        """
+        Create a new PipelineConfigService
+        :param pipeline_config_dir: directory containing the pipeline configs and their schema
+        """
+        self._pipeline_config_dir = Path(pipeline_config_dir)
+        # Status of each pipeline, by name
+        self._pipelines = {}
+
+    def reload(self):
+        """
+        Load every `*.yml` in the pipeline config directory which is new or has
+        changed since the last reload. Configs which fail to load are logged,
+        and reported by `get_pipelines`.
+        :return: the names of the pipelines which have been reloaded or failed to load
+        """
+        changed = []
+        found = set()
+        for config_path in sorted(self._pipeline_config_dir.glob("*.yml")):
+            pipeline = config_path.stem
+            found.add(pipeline)
+            previous = self._pipelines.get(pipeline, {})
+            try:
+                template = get_config_template(self._pipeline_config_dir, pipeline)
+            except Exception as exc:  # pylint: disable=W0703
+                if previous.get("error") != str(exc):
+                    log.error("Failed to load the config of pipeline %s: %s", pipeline, exc)
+                    changed.append(pipeline)
+                self._pipelines[pipeline] = {**previous, "error": str(exc)}
+                continue
+
+            if previous.get("template") is not template:
+                log.info("Loaded config of pipeline %s (%s).", pipeline, template.digest)
+                changed.append(pipeline)
+                self._pipelines[pipeline] = {
+                    "template": template,
+                    "loaded_at": datetime.datetime.now(datetime.timezone.utc),
+                    "error": None,
+                }
+            elif previous.get("error"):
+                log.info("Config of pipeline %s loads again.", pipeline)
+                changed.append(pipeline)
+                self._pipelines[pipeline] = {**previous, "error": None}
+
+        for pipeline in set(self._pipelines) - found:
+            log.info("Config of pipeline %s has been removed.", pipeline)
+            del self._pipelines[pipeline]
+            changed.append(pipeline)
+
+        return changed
+
+    def get_pipelines(self):
+        """
+        Get the pipelines which have a config
+        :return: a list of dicts with the name of each pipeline, the hash of its
+                 loaded config, when it was loaded, and the error from the
+                 last attempt to load it, if it failed
+        """
+        pipelines = []
+        for pipeline, status in sorted(self._pipelines.items()):
+            template = status.get("template")
+            loaded_at = status.get("loaded_at")
+            pipelines.append({
+                "pipeline": pipeline,
+                "config_hash": template.digest if template else None,
+                "loaded_at": loaded_at.isoformat() if loaded_at else None,
+                "error": status["error"],
+            })
+        return pipelines
@@ -0,0 +1,221 @@
+"""
+Build and keep compressed variants of report files.
+"""
+
+import functools
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from tornado.ioloop import IOLoop
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+# Content-Encodings which variants can be built for, in order of preference,
+# and the suffix of the files the variants are kept in
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+COPY_BUFFER_SIZE = 1024 * 1024
+# The default brotli quality of 11 takes minutes for reports of tens of MB,
+# holding up the shared executor meanwhile. Quality 5 is far faster, and still
+# compresses reports better than gzip.
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Parse an Accept-Encoding header
+    :param accept_encoding: value of the header, or None if there was none
+    :return: the set of encodings accepted by the client, i.e. with a q-value above zero
+    """
+    accepted = set()
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+class ReportCompressionService:
+    """
+    The ReportCompressionService builds gzip, and brotli if the brotli package
+    is installed, variants of report files. A variant is built once per
+    report, the first time it is asked for, in an executor so that it does
+    not hold up the IOLoop. Variants are kept in `cache_dir`, or next to the
+    reports if there is no cache directory, and are given the mtime of the
+    report they were built from, so that a variant of a report which has
+    changed since is known to be stale and is built again.
+    """
+
+    def __init__(self, cache_dir=None, encodings=None):
+        """
+        Create a new ReportCompressionService
+        :param cache_dir: directory to keep the variants in, None to keep them next to the reports
+        :param encodings: the encodings to build variants for, defaults to all which are available
+        """
+        self._cache_dir = Path(cache_dir) if cache_dir else None
+        available = [encoding for encoding in SUFFIXES if encoding != "br" or brotli]
+        self._encodings = [encoding for encoding in available if encodings is None or encoding in encodings]
+        # Variants being built, by path
+        self._building = {}
+        # Resolved report path and encoding, to the mtime of the report and
+        # whether there was an up to date variant of it, see `get_encodings`
+        self._known_variants = {}
+
+    @property
+    def encodings(self):
+        """
+        The encodings variants are built for, in order of preference
+        """
+        return list(self._encodings)
+
+    def variant_path(self, report_path, encoding):
+        """
+        Where the variant of a report is kept
+        :param report_path: path to the report, symlinks in it are resolved
+        :param encoding: one of `encodings`
+        :return: a Path to the variant
+        """
+        report_path = Path(os.path.realpath(report_path))
+        if self._cache_dir:
+            directory = self._cache_dir / report_path.parent.relative_to(report_path.anchor)
+        else:
+            directory = report_path.parent
+        return directory / (report_path.name + SUFFIXES[encoding])
+
+    def get_variant(self, report_path, accepted):
+        """
+        Find a variant of a report which is up to date, and which the client accepts
+        :param report_path: path to the report
+        :param accepted: the encodings accepted by the client, see `accepted_encodings`
+        :return: a tuple of the encoding and the Path to the variant, or (None, None)
+                 if there is no such variant yet
+        """
+        try:
+            report_mtime = os.stat(report_path).st_mtime_ns
+        except OSError:
+            return None, None
+        for encoding in self._encodings:
+            if encoding not in accepted:
+                continue
+            variant_path = self.variant_path(report_path, encoding)
+            try:
+                if os.stat(variant_path).st_mtime_ns == report_mtime:
+                    return encoding, variant_path
+            except OSError:
+                pass
+        return None, None
+
+    def get_encodings(self, report_path, report_mtime_ns):
+        """
+        Get the encodings which there are up to date variants of a report for.
+        What is found is remembered until the report changes, or the service
+        builds a variant of it, so that this mostly does not touch the file system.
+        :param report_path: resolved path to the report, as by `os.path.realpath`
+        :param report_mtime_ns: mtime of the report, in nanoseconds
+        :return: a list of encodings, in order of preference
+        """
+        encodings = []
+        for encoding in self._encodings:
+            key = (str(report_path), encoding)
+            known = self._known_variants.get(key)
+            if not known or known[0] != report_mtime_ns:
+                try:
+                    available = os.stat(self.variant_path(report_path, encoding)).st_mtime_ns == report_mtime_ns
+                except OSError:
+                    available = False
+                known = (report_mtime_ns, available)
+                self._known_variants[key] = known
+            if known[1]:
+                encodings.append(encoding)
+        return encodings
+
+    def build_variants(self, report_path):
+        """
+        Start building any variants of the report which are missing or stale,
+        unless they are being built already. Failures are logged.
+        :param report_path: path to the report
+        :return: a list of Futures which resolve when the variants have been built
+        """
+        futures = []
+        for encoding in self._encodings:
+            variant_path = self.variant_path(report_path, encoding)
+            future = self._building.get(variant_path)
+            if not future:
+                future = IOLoop.current().run_in_executor(None, self.build_variant, report_path, encoding)
+                self._building[variant_path] = future
+                future.add_done_callback(functools.partial(self._built, variant_path))
+            futures.append(future)
+        return futures
+
+    def _built(self, variant_path, future):
+        self._building.pop(variant_path, None)
+        if not future.cancelled() and future.exception():
+            log.error("Failed to build %s: %s", variant_path, future.exception())
+
+    def build_variant(self, report_path, encoding):
+        """
+        Build a variant of a report, if it is missing or stale. The variant is
+        written to a temporary file which replaces the variant once done, so
+        that an incomplete variant is never served.
+        :param report_path: path to the report
+        :param encoding: one of `encodings`
+        :return: the Path to the variant, or None if the report changed while it was compressed
+        """
+        variant_path = self.variant_path(report_path, encoding)
+        stat = os.stat(report_path)
+        try:
+            if os.stat(variant_path).st_mtime_ns == stat.st_mtime_ns:
+                return variant_path
+        except OSError:
+            pass
+
+        variant_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=variant_path.parent, prefix=f".{variant_path.name}.")
+        try:
+            with open(tmp_fd, "wb") as tmp_file, open(report_path, "rb") as report_file:
+                _compress(report_file, tmp_file, encoding)
+            if os.stat(report_path).st_mtime_ns != stat.st_mtime_ns:
+                log.info("%s changed while it was compressed, not keeping the %s variant.", report_path, encoding)
+                os.unlink(tmp_path)
+                return None
+            os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_path, variant_path)
+            self._known_variants[(os.path.realpath(report_path), encoding)] = (stat.st_mtime_ns, True)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        log.info("Built %s variant of %s.", encoding, report_path)
+        return variant_path
+
+
+def _compress(source, destination, encoding):
+    if encoding == "gzip":
+        # An mtime of 0 makes the variant depend on the contents of the report only
+        with gzip.GzipFile(fileobj=destination, mode="wb", mtime=0) as gzip_file:
+            shutil.copyfileobj(source, gzip_file, COPY_BUFFER_SIZE)
+    elif encoding == "br":
+        compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+        for chunk in iter(lambda: source.read(COPY_BUFFER_SIZE), b""):
+            destination.write(compressor.process(chunk))
+        destination.write(compressor.finish())
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
@@ -0,0 +1,53 @@
+import io
+import os
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from sequencing_report_service.archive import CHUNK_SIZE, tar_chunks, zip_chunks
+
+
+@pytest.fixture
+def report_dir():
+    with tempfile.TemporaryDirectory() as report_dir:
+        report_dir = Path(report_dir)
+        (report_dir / "multiqc_report.html").write_bytes(os.urandom(3 * CHUNK_SIZE + 1))
+        (report_dir / "multiqc_data").mkdir()
+        (report_dir / "multiqc_data" / "multiqc_data.json").write_text("{}")
+        (report_dir / "multiqc_report.html.gz").write_text("not included")
+        os.symlink("/etc/passwd", report_dir / "passwd")
+        yield report_dir
+
+
+def _exclude(name):
+    return name.endswith(".gz")
+
+
+def test_tar_chunks(report_dir):
+    chunks = list(tar_chunks(report_dir, "foo_v1", exclude=_exclude))
+    assert max(len(chunk) for chunk in chunks) <= CHUNK_SIZE
+    assert sum(len(chunk) for chunk in chunks) % tarfile.RECORDSIZE == 0
+
+    with tarfile.open(fileobj=io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.getnames() == ["foo_v1/multiqc_report.html", "foo_v1/multiqc_data/multiqc_data.json"]
+        assert archive.extractfile("foo_v1/multiqc_report.html").read() == \
+            (report_dir / "multiqc_report.html").read_bytes()
+
+
+def test_zip_chunks(report_dir):
+    chunks = list(zip_chunks(report_dir, "foo_v1", exclude=_exclude))
+    assert len(chunks) > 1
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == ["foo_v1/multiqc_report.html", "foo_v1/multiqc_data/multiqc_data.json"]
+        assert archive.testzip() is None
+        assert archive.read("foo_v1/multiqc_report.html") == (report_dir / "multiqc_report.html").read_bytes()
+
+
+def test_stop_streaming(report_dir):
+    for chunks in (tar_chunks(report_dir, "foo_v1"), zip_chunks(report_dir, "foo_v1")):
+        next(chunks)
+        chunks.close()
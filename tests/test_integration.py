@@ -1,11 +1,15 @@
 import json
 import codecs
+import gzip
+import io
 import tempfile
 from pathlib import Path
 import os
 import shutil
+import tarfile
 import time
 import yaml
+import zipfile
 
 from arteria.web.app import AppService
 
@@ -30,6 +34,7 @@ class TestIntegration(AsyncHTTPTestCase):
         self.db_file_path = Path(tempfile.NamedTemporaryFile().name)
         self.nextflow_log_dirs = tempfile.mkdtemp()
         self.config_dir = tempfile.mkdtemp()
+        self.report_cache_dir = tempfile.mkdtemp()
 
     @classmethod
     def tearDownClass(self):
@@ -40,6 +45,7 @@ class TestIntegration(AsyncHTTPTestCase):
             shutil.rmtree(self.nextflow_log_dirs, ignore_errors=True)
         if os.path.exists(self.config_dir):
             shutil.rmtree(self.config_dir, ignore_errors=True)
+        shutil.rmtree(self.report_cache_dir, ignore_errors=True)
 
     def get_app(self):
         src_path = (Path(__file__) / '..' / '..').resolve()
@@ -54,6 +60,8 @@ class TestIntegration(AsyncHTTPTestCase):
             'monitored_directories': [str(src_path / 'tests/resources/')],
             'nextflow_log_dirs': self.nextflow_log_dirs,
             'pipeline_config_dir': f'{self.config_dir}/pipeline_config/',
+            'report_cache_dir': self.report_cache_dir,
+            'report_sendfile': True,
         }
 
         pipeline_configs = {
@@ -134,6 +142,30 @@ class TestIntegration(AsyncHTTPTestCase):
         self.assertEqual(response.code, 200)
         self.assertEqual(json.loads(response.body), {'version': version})
 
+    def test_get_pipelines(self):
+        response = self.fetch('/api/1.0/pipelines')
+        self.assertEqual(response.code, 200)
+        pipelines = json.loads(response.body)['pipelines']
+        self.assertIn('seqreports', [pipeline['pipeline'] for pipeline in pipelines])
+        for pipeline in pipelines:
+            self.assertIsNone(pipeline['error'])
+            self.assertEqual(len(pipeline['config_hash']), 64)
+
+    def test_get_runfolders(self):
+        response = self.fetch('/api/1.0/runfolders?prefix=foo&metadata=true')
+        self.assertEqual(response.code, 200)
+        response_body = json.loads(response.body)
+        self.assertEqual([runfolder['name'] for runfolder in response_body['runfolders']], ['foo_runfolder'])
+        self.assertIn('rta_complete', response_body['runfolders'][0])
+        self.assertIsNone(response_body['next'])
+
+        response = self.fetch('/api/1.0/runfolders?prefix=foo&limit=1')
+        next_link = json.loads(response.body)['next']
+        self.assertTrue(next_link.endswith('/api/1.0/runfolders?prefix=foo&limit=1&after=foo_runfolder'))
+
+        response = self.fetch('/api/1.0/runfolders?limit=0')
+        self.assertEqual(response.code, 400)
+
     @gen_test(timeout=240)
     def test_start_job(self):
         response = yield self.http_client.fetch(
@@ -163,10 +195,10 @@ class TestIntegration(AsyncHTTPTestCase):
 
     def test_start_two_jobs(self):
         status_links = []
-        for _ in range(2):
+        for i in range(2):
             response = self.fetch(
                 '/api/1.0/jobs/start/seqreports/foo_runfolder',
-                method='POST', body=json.dumps({}))
+                method='POST', body=json.dumps({"force": True, "idempotency_key": f"two_jobs_{i}"}))
             self.assertEqual(response.code, 202)
             status_link = json.loads(response.body).get('link', None)
             status_links.append(status_link)
@@ -186,6 +218,19 @@ class TestIntegration(AsyncHTTPTestCase):
                 f'/api/1.0/jobs/stop/{job_id}',
                 method='POST', body=json.dumps({}))
 
+    def test_plan_job(self):
+        body = {
+            "input_samplesheet_content": "test,test",
+        }
+        response = self.fetch(
+            self.get_url('/api/1.0/jobs/plan/socks_samplesheet/foo_runfolder'),
+            method='POST', body=json.dumps(body))
+        self.assertEqual(response.code, 200)
+        plan = json.loads(response.body)
+        self.assertIn(plan["input_samplesheet_path"], plan["command"])
+        self.assertEqual(plan["input_samplesheet_content"], "test,test")
+        self.assertFalse(os.path.exists(plan["input_samplesheet_path"]))
+
     def test_start_job_missing_pipeline(self):
         response = self.fetch(
             self.get_url('/api/1.0/jobs/start/fake_pipeline/foo_runfolder'),
@@ -221,7 +266,10 @@ class TestIntegration(AsyncHTTPTestCase):
             time.sleep(1)
 
         self.assertEqual(status_response_body["state"], State.DONE.value)
-        self.assertTrue("🧦" in status_response_body["log"])
+        self.assertNotIn("log", status_response_body)
+        log_response = self.fetch(f"{status_link}/log")
+        self.assertEqual(log_response.code, 200)
+        self.assertTrue("🧦" in log_response.body.decode("utf-8"))
         self.assertTrue(
             "--test_pipeline_param" in status_response_body["command"]
         )
@@ -304,7 +352,7 @@ class TestIntegration(AsyncHTTPTestCase):
         # First start the job
         response = self.fetch(
             '/api/1.0/jobs/start/seqreports/foo_runfolder',
-            method='POST', body=json.dumps({}))
+            method='POST', body=json.dumps({"force": True, "idempotency_key": "stop_job"}))
         self.assertEqual(response.code, 202)
         status_link = json.loads(response.body).get('link', None)
         self.assertTrue(status_link)
@@ -338,6 +386,58 @@ class TestIntegration(AsyncHTTPTestCase):
         self.assertIn('MultiQC', decoded_body)
         self.assertIn('VERSION1', decoded_body)
 
+    def test_should_return_compressed_report(self):
+        headers = {'Accept-Encoding': 'gzip'}
+        response = self.fetch('/reports/foo_runfolder/v1/', headers=headers, decompress_response=False)
+        self.assertEqual(response.code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        etag = response.headers['Etag']
+
+        # The compressed report is built in the background after the first request
+        for _ in range(50):
+            response = self.fetch('/reports/foo_runfolder/v1/', headers=headers, decompress_response=False)
+            if 'Content-Encoding' in response.headers:
+                break
+            time.sleep(0.1)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Content-Type'], 'text/html')
+        self.assertIn('VERSION1', gzip.decompress(response.body).decode('UTF-8'))
+        self.assertNotEqual(response.headers['Etag'], etag)
+
+        response = self.fetch('/reports/foo_runfolder/v1/', headers={'If-None-Match': etag}, decompress_response=False)
+        self.assertEqual(response.code, 304)
+
+    def test_should_send_report_with_sendfile(self):
+        response = self.fetch('/reports/foo_runfolder/v2/', decompress_response=False)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Connection'], 'close')
+        self.assertEqual(int(response.headers['Content-Length']), len(response.body))
+        self.assertIn('VERSION2', response.body.decode('UTF-8'))
+
+        # Range requests are served by the StaticFileHandler
+        response = self.fetch('/reports/foo_runfolder/v2/', headers={'Range': 'bytes=0-9'},
+                              decompress_response=False)
+        self.assertEqual(response.code, 206)
+        self.assertEqual(len(response.body), 10)
+
+    def test_should_return_report_archive(self):
+        response = self.fetch('/reports/foo_runfolder/current.tar')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/x-tar')
+        with tarfile.open(fileobj=io.BytesIO(response.body)) as archive:
+            report = archive.extractfile('foo_runfolder_current/multiqc_report.html').read()
+        self.assertIn('VERSION2', report.decode('UTF-8'))
+
+        response = self.fetch('/reports/foo_runfolder/v1.zip')
+        self.assertEqual(response.code, 200)
+        with zipfile.ZipFile(io.BytesIO(response.body)) as archive:
+            report = archive.read('foo_runfolder_v1/multiqc_report.html')
+        self.assertIn('VERSION1', report.decode('UTF-8'))
+
+        self.assertEqual(self.fetch('/reports/foo_runfolder/v9.tar').code, 404)
+        self.assertEqual(self.fetch('/reports/no_such_runfolder/v1.zip').code, 404)
+
     def test_should_return_all_reports(self):
         response = self.fetch('/reports/foo_runfolder')
         self.assertEqual(response.code, 200)
@@ -347,3 +447,8 @@ class TestIntegration(AsyncHTTPTestCase):
                             set(['http://127.0.0.1:{}/reports/foo_runfolder/v1/'.format(self.get_http_port()),
                                  'http://127.0.0.1:{}/reports/foo_runfolder/current/'.format(self.get_http_port()),
                                  'http://127.0.0.1:{}/reports/foo_runfolder/v2/'.format(self.get_http_port())]))
+        versions = {version['version']: version for version in response_dict['versions']}
+        self.assertEqual(versions['current']['target'], 'v2')
+        self.assertIsNone(versions['v1']['target'])
+        self.assertEqual(versions['current']['size'], versions['v2']['size'])
+        self.assertTrue(versions['v1']['mtime'])
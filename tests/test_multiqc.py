@@ -0,0 +1,67 @@
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sequencing_report_service.multiqc import read_report_metrics
+
+
+@pytest.fixture
+def report_dir():
+    with tempfile.TemporaryDirectory() as report_dir:
+        report_dir = Path(report_dir)
+        (report_dir / "multiqc_data").mkdir()
+        yield report_dir
+
+
+def test_read_report_metrics_from_json(report_dir):
+    data = {
+        "report_general_stats_headers": [
+            {"percent_duplicates": {"namespace": "FastQC"}, "total_sequences": {"namespace": "FastQC"}},
+        ],
+        "report_general_stats_data": [
+            {"Sample_1": {"percent_duplicates": 12.5, "total_sequences": 1000, "status": "pass"}},
+        ],
+        "report_saved_raw_data": {
+            "multiqc_bcl2fastq_bylane": {"HXXXXXXXX - 1": {"yieldQ30": 900, "total": 1000}},
+            "multiqc_fastqc": {"Sample_1": {"total_sequences": 1000}},
+        },
+    }
+    with open(report_dir / "multiqc_data" / "multiqc_data.json", "w") as data_file:
+        json.dump(data, data_file)
+
+    sample_metrics, lane_metrics = read_report_metrics(report_dir)
+    assert sorted(sample_metrics) == [
+        ("Sample_1", "FastQC.percent_duplicates", 12.5),
+        ("Sample_1", "FastQC.total_sequences", 1000.0),
+    ]
+    assert sorted(lane_metrics) == [(1, "bcl2fastq.total", 1000.0), (1, "bcl2fastq.yieldQ30", 900.0)]
+
+
+def test_read_report_metrics_from_tsv(report_dir):
+    (report_dir / "multiqc_data" / "multiqc_general_stats.txt").write_text(
+        "Sample\tFastQC_mqc-generalstats-fastqc-percent_duplicates\tFastQC_mqc-generalstats-fastqc-status\n"
+        "Sample_1\t12.5\tpass\n"
+        "Sample_2\t7.0\tpass\n")
+    (report_dir / "multiqc_data" / "multiqc_bcl2fastq_bylane.txt").write_text(
+        "Sample\tyieldQ30\n"
+        "HXXXXXXXX - 1\t900\n"
+        "HXXXXXXXX - 2\t800\n")
+
+    sample_metrics, lane_metrics = read_report_metrics(report_dir)
+    assert sorted(sample_metrics) == [
+        ("Sample_1", "FastQC.percent_duplicates", 12.5),
+        ("Sample_2", "FastQC.percent_duplicates", 7.0),
+    ]
+    assert sorted(lane_metrics) == [(1, "bcl2fastq.yieldQ30", 900.0), (2, "bcl2fastq.yieldQ30", 800.0)]
+
+
+def test_read_report_metrics_without_data():
+    with tempfile.TemporaryDirectory() as report_dir:
+        assert read_report_metrics(Path(report_dir)) is None
+
+        # MultiQC has started, but not yet written the JSON or the general stats
+        (Path(report_dir) / "multiqc_data").mkdir()
+        (Path(report_dir) / "multiqc_data" / "multiqc_bcl2fastq_bylane.txt").touch()
+        assert read_report_metrics(Path(report_dir)) is None
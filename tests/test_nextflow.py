@@ -4,10 +4,12 @@ import pathlib
 import shutil
 import yaml
 
+import mock
 import pytest
 import jsonschema
 
 from sequencing_report_service.nextflow import *
+from sequencing_report_service.exceptions import MissingConfigVariables
 
 
 @pytest.fixture()
@@ -83,6 +85,30 @@ def test_nextflow_command(config_dir, runfolder):
         assert f.read() == "samplesheet,content"
 
 
+def test_plan_nextflow_command(config_dir, runfolder):
+    plan = plan_nextflow_command(
+        "foo_pipeline",
+        str(runfolder),
+        config_dir,
+        "samplesheet,{runfolder_name}",
+        ["--params", "foo"],
+    )
+
+    assert plan["command"] == nextflow_command(
+        "foo_pipeline", str(runfolder), config_dir, "samplesheet,{runfolder_name}", ["--params", "foo"],
+    )["command"]
+    assert plan["input_samplesheet_path"] == str(runfolder / "foo_pipeline_samplesheet.csv")
+    assert plan["input_samplesheet_content"] == f"samplesheet,{runfolder.name}"
+
+    (runfolder / "foo_pipeline_samplesheet.csv").unlink()
+    plan_nextflow_command("foo_pipeline", str(runfolder), config_dir, "samplesheet,content")
+    assert not (runfolder / "foo_pipeline_samplesheet.csv").exists()
+
+    plan = plan_nextflow_command("foo_pipeline", str(runfolder), config_dir)
+    assert plan["input_samplesheet_path"] is None
+    assert plan["input_samplesheet_content"] is None
+
+
 def test_get_config(config_dir, config):
     test_config = get_config(config_dir, "foo_pipeline")
     assert test_config == config
@@ -100,6 +126,21 @@ def test_config_not_found(config_dir):
         get_config(config_dir, "erronous_pipeline")
 
 
+def test_get_config_cached(config_dir, config):
+    clear_config_cache()
+    with mock.patch("sequencing_report_service.nextflow.yaml.safe_load", wraps=yaml.safe_load) as safe_load:
+        assert get_config(config_dir, "foo_pipeline") == config
+        get_config(config_dir, "foo_pipeline")["main_workflow_path"] = "changed/by/caller"
+        assert get_config(config_dir, "foo_pipeline") == config
+        assert safe_load.call_count == 1
+
+        config["main_workflow_path"] = "Molmed/another-workflow"
+        with open(pathlib.Path(config_dir) / "foo_pipeline.yml", 'w') as config_file:
+            config_file.write(yaml.dump(config))
+        assert get_config(config_dir, "foo_pipeline") == config
+        assert safe_load.call_count == 2
+
+
 def test_build_config_variables(runfolder):
     config_values = build_config_variables(
         "foo_pipeline",
@@ -146,3 +187,85 @@ def test_interpolate_variables(config):
     test_config = interpolate_variables(config, config_values)
 
     assert test_config == exp_config
+
+
+def test_interpolate_variables_missing(config):
+    with pytest.raises(KeyError) as exc_info:
+        interpolate_variables(config, {"current_year": 2024})
+    assert exc_info.value.variables == ["runfolder_name", "runfolder_path"]
+
+
+def test_config_template(config):
+    template = ConfigTemplate(config)
+    assert template.variables == {"runfolder_name", "runfolder_path", "current_year"}
+
+    rendered = template.render({"current_year": 2024, "runfolder_path": "/foo", "runfolder_name": "foo"})
+    assert rendered["environment"]["TEST_PATH"] == "/foo"
+    assert rendered["nextflow_parameters"] == config["nextflow_parameters"]
+    assert rendered["nextflow_parameters"] is not config["nextflow_parameters"]
+    assert config["environment"]["TEST_PATH"] == "{runfolder_path}"
+
+
+def test_config_template_escaped_braces(config):
+    config["pipeline_parameters"]["literal"] = "{{literal}}"
+    config["pipeline_parameters"]["mixed"] = "{{literal}}/{runfolder_name}"
+
+    rendered = ConfigTemplate(config).render(
+        {"current_year": 2024, "runfolder_path": "/foo", "runfolder_name": "foo"})
+    assert rendered["pipeline_parameters"]["literal"] == "{literal}"
+    assert rendered["pipeline_parameters"]["mixed"] == "{literal}/foo"
+
+
+def test_render_template():
+    assert render_template("{runfolder_name},{runfolder_path}", {"runfolder_name": "foo", "runfolder_path": "/foo"}) \
+        == "foo,/foo"
+    with pytest.raises(MissingConfigVariables):
+        render_template("{runfolder_name},{sample}", {"runfolder_name": "foo"})
+
+
+def test_parse_log_progress():
+    progress = parse_log_progress([
+        "N E X T F L O W  ~  version 23.04.1",
+        "[6a/1f03c2] Submitted process > FASTQC (sample_1)",
+        "[3b/99ab01] Cached process > MULTIQC",
+        "[0c/42de7f] Submitted process > FASTQC (sample_2)",
+        "",
+    ])
+    assert progress == {
+        "tasks_submitted": 2,
+        "tasks_cached": 1,
+        "last_log_line": "[0c/42de7f] Submitted process > FASTQC (sample_2)",
+    }
+
+
+def test_with_trace():
+    assert with_trace(["nextflow", "run", "main.nf", "--foo", "bar"], "trace.txt") == [
+        "nextflow", "run", "main.nf", "-with-trace", "trace.txt", "--foo", "bar",
+    ]
+    assert with_trace(["sleep", "1"], "trace.txt") == ["sleep", "1"]
+
+
+def test_parse_trace_record():
+    task = parse_trace_record({
+        "task_id": "3",
+        "name": "FASTQC (sample_1)",
+        "status": "COMPLETED",
+        "exit": "0",
+        "realtime": "1h 2m 3s",
+        "%cpu": "98.5%",
+        "peak_rss": "1.5 GB",
+        "rchar": "512 KB",
+        "wchar": "-",
+    })
+    assert task == {
+        "task_id": 3,
+        "process": "FASTQC",
+        "name": "FASTQC (sample_1)",
+        "status": "COMPLETED",
+        "exit_status": 0,
+        "realtime_ms": 3_723_000,
+        "cpu_percent": 98.5,
+        "peak_rss": int(1.5 * 1024 ** 3),
+        "read_bytes": 512 * 1024,
+        "write_bytes": None,
+    }
@@ -2,7 +2,7 @@ import contextlib
 import mock
 
 from sequencing_report_service.repositiories.job_repo import JobRepository
-from sequencing_report_service.models.db_models import Job, State
+from sequencing_report_service.models.db_models import Job, State, Priority
 
 
 class MockJobRepository():
@@ -15,14 +15,33 @@ class MockJobRepository():
     def __exit__(self, *args):
         pass
 
-    def add_job(self, command_with_env):
+    def add_job(self, command_with_env, pipeline=None, priority=Priority.NORMAL, request_key=None,
+                input_fingerprint=None):
         job = Job(command=command_with_env['command'],
                   environment=command_with_env['environment'],
+                  pipeline=pipeline,
+                  priority=priority,
+                  request_key=request_key,
+                  input_fingerprint=input_fingerprint,
                   state=State.PENDING,
                   job_id=len(self._jobs) + 1)
         self._jobs.append(job)
         return job
 
+    def get_in_flight_job_id(self, request_key):
+        in_flight = [job.job_id for job in self._jobs
+                     if job.request_key == request_key
+                     and job.state in (State.PENDING, State.READY, State.STARTED)]
+        return max(in_flight, default=None)
+
+    def has_job_with_request_key(self, request_key):
+        return any(job.request_key == request_key for job in self._jobs)
+
+    def get_done_job_id(self, input_fingerprint):
+        done = [job.job_id for job in self._jobs
+                if job.input_fingerprint == input_fingerprint and job.state == State.DONE]
+        return max(done, default=None)
+
     def get_jobs(self):
         return self._jobs
 
@@ -35,10 +54,51 @@ class MockJobRepository():
                 return job
         return None
 
+    def get_job_log(self, job_id):
+        job = self.get_job(job_id)
+        return job.log if job else None
+
+    def _queue(self):
+        return sorted(self.get_jobs_with_state(State.PENDING), key=lambda job: (job.priority, job.job_id))
+
+    def get_log_offset(self, job_id):
+        job = self.get_job(job_id)
+        return (job.log_offset or 0) if job else 0
+
+    def add_job_progress(self, job_id, log_offset, tasks_submitted=0, tasks_cached=0, last_log_line=None):
+        job = self.get_job(job_id)
+        job.log_offset = log_offset
+        job.tasks_submitted = (job.tasks_submitted or 0) + tasks_submitted
+        job.tasks_cached = (job.tasks_cached or 0) + tasks_cached
+        if last_log_line is not None:
+            job.last_log_line = last_log_line
+
+    def get_trace_offset(self, job_id):
+        job = self.get_job(job_id)
+        return (job.trace_offset or 0) if job else 0
+
+    def add_job_tasks(self, job_id, trace_offset, tasks):
+        job = self.get_job(job_id)
+        job.trace_offset = trace_offset
+
     def get_one_pending_job(self):
-        potential_job = self.get_jobs_with_state(State.PENDING)
-        if potential_job[0]:
-            return potential_job[0]
+        queue = self._queue()
+        return queue[0] if queue else None
+
+    def get_pending_jobs(self):
+        return [(job.job_id, job.pipeline) for job in self._queue()]
+
+    def get_pending_pipelines(self):
+        return list({job.pipeline for job in self._queue()})
+
+    def get_next_pending_job(self, pipeline):
+        for job in self._queue():
+            if job.pipeline == pipeline:
+                return job.job_id, job.priority
+        return None
+
+    def get_queue_position(self, job_id):
+        return [job.job_id for job in self._queue()].index(job_id) + 1
 
     def expunge_object(self, obj):
         return obj
@@ -50,12 +110,22 @@ class MockJobRepository():
             job.log = cmd_log
         return job
 
-    def set_pid_of_job(self, job_id, pid):
+    def set_pid_of_job(self, job_id, pid, pid_start_time=None):
         job = self.get_job(job_id)
         job.pid = pid
+        job.pid_start_time = pid_start_time
         return Job
 
-    def clear_out_stale_jobs_at_startup(self):
+    def set_resource_usage_of_job(self, job_id, **usage):
+        job = self.get_job(job_id)
+        for key, value in usage.items():
+            setattr(job, key, value)
+
+    def clear_out_stale_jobs_at_startup(self, adopted_job_ids=()):
         stale_jobs = self.get_jobs_with_state(State.STARTED)
         for job in stale_jobs:
+            if job.job_id in adopted_job_ids:
+                continue
             self.set_state_of_job(job_id=job.job_id, state=State.CANCELLED)
+        for job in self.get_jobs_with_state(State.READY):
+            self.set_state_of_job(job_id=job.job_id, state=State.PENDING)
@@ -1,5 +1,9 @@
 
+import datetime
+import io
 import json
+import os
+import tempfile
 from pathlib import Path
 
 
@@ -11,9 +15,14 @@ import mock
 from sequencing_report_service.app import routes
 from sequencing_report_service.services.local_runner_service import LocalRunnerService
 from sequencing_report_service.repositiories.runfolder_repo import RunfolderRepository
-from sequencing_report_service.models.db_models import Job, State
+from sequencing_report_service.services.auto_start_service import AutoStartService
+from sequencing_report_service.models.db_models import Job, State, Priority
+from sequencing_report_service.models.job_record import JobRecord
+from sequencing_report_service.exceptions import MissingConfigVariables
 import importlib.metadata
 
+from tests.test_utils import MockJobRepository
+
 version = importlib.metadata.version("sequencing-report-service")
 
 
@@ -22,14 +31,41 @@ class TestJobHandler(AsyncHTTPTestCase):
 
         mock_runner_service = mock.create_autospec(LocalRunnerService)
         job = Job(job_id=1, command=['foo'], state=State.PENDING)
-        mock_runner_service.get_jobs = mock.MagicMock(return_value=[job])
+        job_record = JobRecord(
+            job_id=1,
+            raw_command='foo',
+            raw_environment=None,
+            pipeline='foo',
+            priority=Priority.NORMAL,
+            pid=None,
+            state=State.PENDING,
+            time_created=None,
+            time_updated=None,
+            log_offset=0,
+            tasks_submitted=0,
+            tasks_cached=0,
+            last_log_line=None,
+        )
+        mock_runner_service.get_jobs = mock.MagicMock(return_value=[job_record])
         mock_runner_service.get_job = mock.MagicMock(return_value=job)
+        mock_runner_service.get_job_record = mock.MagicMock(return_value=job_record)
+        mock_runner_service.get_queue_position = mock.MagicMock(return_value=3)
+        mock_runner_service.get_task_summary = mock.MagicMock(return_value=[{"process": "FASTQC", "tasks": 2}])
+        mock_runner_service.get_queue_status = mock.MagicMock(return_value={
+            "running": [2],
+            "pending": [1, 3],
+            "max_concurrent_jobs": 1,
+            "max_concurrent_jobs_per_pipeline": {},
+        })
+        mock_runner_service.open_job_log = mock.MagicMock(
+            side_effect=lambda job_id: io.BytesIO(b"line1\nline2\nline3\n") if job_id == 1 else None)
         mock_runner_service.start = mock.MagicMock(return_value=job.job_id)
         mock_runner_service.stop = mock.MagicMock(return_value=job)
 
         mock_runfolder_repo = mock.create_autospec(RunfolderRepository)
         mock_runfolder_repo.get_runfolder = mock.MagicMock(return_value=mock)
 
+        self.mock_runner_service = mock_runner_service
         return Application(routes(runner_service=mock_runner_service,
                                   runfolder_repo=mock_runfolder_repo))
 
@@ -45,6 +81,38 @@ class TestJobHandler(AsyncHTTPTestCase):
         self.assertEqual(jobs_dict['job_id'], 1)
         self.assertEqual(jobs_dict['state'], 'pending')
 
+    def test_get_jobs_with_filters(self):
+        response = self.fetch(
+            '/api/1.0/jobs/?after=10&limit=1&state=done,error&created_after=2018-11-27T12:00:00%2B01:00')
+        self.assertEqual(response.code, 200)
+        self.mock_runner_service.get_jobs.assert_called_once_with(
+            after=10,
+            limit=1,
+            states=[State.DONE, State.ERROR],
+            created_after=datetime.datetime(2018, 11, 27, 11, 0, 0),
+        )
+        resp_dict = json.loads(response.body)
+        self.assertEqual(
+            resp_dict['next'],
+            'http://127.0.0.1:{}/api/1.0/jobs/?limit=1&state=done%2Cerror'
+            '&created_after=2018-11-27T12%3A00%3A00%2B01%3A00&after=1'.format(self.get_http_port()))
+
+    def test_get_jobs_with_utc_filter(self):
+        response = self.fetch('/api/1.0/jobs/?updated_before=2018-11-27T12:00:00Z')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(self.mock_runner_service.get_jobs.call_args.kwargs['updated_before'],
+                         datetime.datetime(2018, 11, 27, 12, 0, 0))
+
+    def test_get_jobs_last_page(self):
+        response = self.fetch('/api/1.0/jobs/')
+        self.assertEqual(response.code, 200)
+        self.assertIsNone(json.loads(response.body)['next'])
+
+    def test_get_jobs_with_invalid_filters(self):
+        for query in ['after=foo', 'limit=0', 'limit=100000', 'state=foo', 'updated_before=yesterday']:
+            response = self.fetch(f'/api/1.0/jobs/?{query}')
+            self.assertEqual(response.code, 400, query)
+
     def test_get_job(self):
         response = self.fetch('/api/1.0/jobs/1')
         self.assertEqual(response.code, 200)
@@ -52,8 +120,65 @@ class TestJobHandler(AsyncHTTPTestCase):
         self.assertEqual(resp_dict['command'], ['foo'])
         self.assertEqual(resp_dict['job_id'], 1)
         self.assertEqual(resp_dict['state'], 'pending')
+        self.assertEqual(resp_dict['queue_position'], 3)
         self.assertEqual(resp_dict['version'], version)
 
+    def test_get_job_queue(self):
+        response = self.fetch('/api/1.0/jobs/queue')
+        self.assertEqual(response.code, 200)
+        self.assertDictEqual(
+            json.loads(response.body),
+            {
+                'depth': 2,
+                'running': [2],
+                'pending': [1, 3],
+                'max_concurrent_jobs': 1,
+                'max_concurrent_jobs_per_pipeline': {},
+                'version': version,
+            }
+        )
+
+    def test_get_job_tasks(self):
+        response = self.fetch('/api/1.0/jobs/1/tasks')
+        self.assertEqual(response.code, 200)
+        self.assertDictEqual(
+            json.loads(response.body),
+            {'job_id': 1, 'processes': [{'process': 'FASTQC', 'tasks': 2}], 'version': version},
+        )
+        self.mock_runner_service.get_task_summary.assert_called_once_with(1)
+
+    def test_get_job_log(self):
+        response = self.fetch('/api/1.0/jobs/1/log')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b"line1\nline2\nline3\n")
+        self.assertEqual(response.headers['Content-Type'], 'text/plain; charset=utf-8')
+
+    def test_get_job_log_tail(self):
+        response = self.fetch('/api/1.0/jobs/1/log?tail=2')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b"line2\nline3\n")
+
+        response = self.fetch('/api/1.0/jobs/1/log?tail=10')
+        self.assertEqual(response.body, b"line1\nline2\nline3\n")
+
+    def test_get_job_log_range(self):
+        response = self.fetch('/api/1.0/jobs/1/log', headers={'Range': 'bytes=6-10'})
+        self.assertEqual(response.code, 206)
+        self.assertEqual(response.body, b"line2")
+        self.assertEqual(response.headers['Content-Range'], 'bytes 6-10/18')
+
+        response = self.fetch('/api/1.0/jobs/1/log', headers={'Range': 'bytes=-6'})
+        self.assertEqual(response.code, 206)
+        self.assertEqual(response.body, b"line3\n")
+
+        response = self.fetch('/api/1.0/jobs/1/log', headers={'Range': 'bytes=18-'})
+        self.assertEqual(response.code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */18')
+
+    def test_get_job_log_missing(self):
+        response = self.fetch('/api/1.0/jobs/2/log')
+        self.assertEqual(response.code, 404)
+
     def test_start_job(self):
         response = self.fetch('/api/1.0/jobs/start/foo/bar', method='POST', body=json.dumps({}))
         self.assertEqual(response.code, 202)
@@ -66,6 +191,41 @@ class TestJobHandler(AsyncHTTPTestCase):
             }
         )
 
+    def test_start_job_with_priority(self):
+        response = self.fetch('/api/1.0/jobs/start/foo/bar', method='POST', body=json.dumps({'priority': 'urgent'}))
+        self.assertEqual(response.code, 202)
+        self.assertEqual(self.mock_runner_service.start.call_args.kwargs['priority'], Priority.URGENT)
+
+        for priority in ['asap', 1, None]:
+            response = self.fetch('/api/1.0/jobs/start/foo/bar', method='POST',
+                                  body=json.dumps({'priority': priority}))
+            self.assertEqual(response.code, 400, priority)
+
+    def test_start_job_with_idempotency_key(self):
+        response = self.fetch('/api/1.0/jobs/start/foo/bar', method='POST', body=json.dumps({}),
+                              headers={'Idempotency-Key': 'abc'})
+        self.assertEqual(response.code, 202)
+        self.assertEqual(self.mock_runner_service.start.call_args.kwargs['idempotency_key'], 'abc')
+
+    def test_start_job_forced(self):
+        response = self.fetch('/api/1.0/jobs/start/foo/bar', method='POST', body=json.dumps({'force': 'true'}))
+        self.assertEqual(response.code, 202)
+        self.assertTrue(self.mock_runner_service.start.call_args.kwargs['force'])
+
+    def test_start_job_missing_config_variables(self):
+        self.mock_runner_service.start.side_effect = MissingConfigVariables(['sample'])
+        response = self.fetch('/api/1.0/jobs/start/foo/bar', method='POST', body=json.dumps({}))
+        self.assertEqual(response.code, 400)
+
+    def test_plan_job(self):
+        self.mock_runner_service.plan = mock.MagicMock(return_value={'command': ['nextflow', 'run', 'foo']})
+        response = self.fetch('/api/1.0/jobs/plan/foo/bar', method='POST',
+                              body=json.dumps({'ext_args': '--foo bar'}))
+        self.assertEqual(response.code, 200)
+        self.assertEqual(json.loads(response.body)['command'], ['nextflow', 'run', 'foo'])
+        self.assertEqual(self.mock_runner_service.plan.call_args.kwargs['ext_args'], ['--foo', 'bar'])
+        self.mock_runner_service.start.assert_not_called()
+
     def test_stop_job(self):
         response = self.fetch('/api/1.0/jobs/stop/1', method='POST', body=json.dumps({}))
         self.assertEqual(response.code, 202)
@@ -77,3 +237,42 @@ class TestJobHandler(AsyncHTTPTestCase):
                 'version': version,
             }
         )
+
+
+class TestJobStartHandlerWithAutoStart(AsyncHTTPTestCase):
+    def get_app(self):
+        self.monitored_dir = tempfile.TemporaryDirectory()
+        os.mkdir(Path(self.monitored_dir.name) / "foo_runfolder")
+        (Path(self.monitored_dir.name) / "foo_runfolder" / "CopyComplete.txt").touch()
+        self.runfolder_repo = RunfolderRepository([self.monitored_dir.name])
+        self.runfolder_repo.rescan()
+
+        data = []
+        self.runner_service = LocalRunnerService(lambda: MockJobRepository(data), "/path/to/config/dir",
+                                                 tempfile.mkdtemp())
+        return Application(routes(runner_service=self.runner_service, runfolder_repo=self.runfolder_repo))
+
+    def tearDown(self):
+        super().tearDown()
+        self.monitored_dir.cleanup()
+
+    @mock.patch.object(LocalRunnerService, "process_job_queue")
+    @mock.patch(
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
+        return_value={
+            "command": ["nextflow", "run", "seqreports"],
+            "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
+        },
+    )
+    def test_auto_start_skips_manually_started_job(self, mock_plan_nextflow_command, mock_process_job_queue):
+        response = self.fetch('/api/1.0/jobs/start/seqreports/foo_runfolder', method='POST', body=json.dumps({}))
+        self.assertEqual(response.code, 202)
+        self.assertEqual(mock_plan_nextflow_command.call_args.args[4], [])
+
+        auto_start_service = AutoStartService(self.runner_service, self.runfolder_repo,
+                                              {"seqreports": "copy_complete"},
+                                              ready_after=datetime.datetime(2020, 1, 1))
+        self.assertEqual(auto_start_service.check(["foo_runfolder"]), [])
+        self.assertEqual(mock_plan_nextflow_command.call_count, 1)
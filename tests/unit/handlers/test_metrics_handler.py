@@ -0,0 +1,49 @@
+import datetime
+import json
+
+from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application
+
+import mock
+
+from sequencing_report_service.app import routes
+from sequencing_report_service.services.metrics_service import MetricsService
+
+
+class TestMetricsHandler(AsyncHTTPTestCase):
+    def get_app(self):
+        self.metrics_service = mock.create_autospec(MetricsService)
+        self.metrics_service.get_metric_names.return_value = [{"metric": "bcl2fastq.yieldQ30", "level": "lane"}]
+        self.metrics_service.get_metric.return_value = [{
+            "runfolder": "foo_runfolder",
+            "version": "v1",
+            "report_time": datetime.datetime(2024, 1, 2, 3, 4, 5),
+            "values": [{"lane": 1, "value": 900.0}],
+        }]
+        return Application(routes(metrics_service=self.metrics_service))
+
+    def test_get_metrics(self):
+        response = self.fetch('/api/1.0/metrics')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(json.loads(response.body)["metrics"], [{"metric": "bcl2fastq.yieldQ30", "level": "lane"}])
+
+    def test_get_metric(self):
+        response = self.fetch('/api/1.0/metrics/bcl2fastq.yieldQ30?level=lane&runfolder=foo_runfolder'
+                              '&since=2024-01-01T01:00:00%2B01:00&limit=500')
+        self.assertEqual(response.code, 200)
+        response_dict = json.loads(response.body)
+        self.assertEqual(response_dict["reports"][0]["report_time"], "2024-01-02T03:04:05+00:00")
+        self.assertEqual(response_dict["reports"][0]["values"], [{"lane": 1, "value": 900.0}])
+        self.metrics_service.get_metric.assert_called_once_with(
+            "bcl2fastq.yieldQ30",
+            level="lane",
+            runfolders=["foo_runfolder"],
+            all_versions=False,
+            limit=500,
+            since=datetime.datetime(2024, 1, 1),
+        )
+
+    def test_get_metric_with_bad_arguments(self):
+        self.assertEqual(self.fetch('/api/1.0/metrics/foo?level=flowcell').code, 400)
+        self.assertEqual(self.fetch('/api/1.0/metrics/foo?limit=0').code, 400)
+        self.assertEqual(self.fetch('/api/1.0/metrics/foo?since=yesterday').code, 400)
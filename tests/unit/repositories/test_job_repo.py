@@ -1,3 +1,5 @@
+import datetime
+
 
 
 from sqlalchemy import create_engine
@@ -5,7 +7,8 @@ from sqlalchemy.orm import sessionmaker, scoped_session
 
 import pytest
 
-from sequencing_report_service.models.db_models import SQLAlchemyBase, State
+from sequencing_report_service.models.db_models import SQLAlchemyBase, State, Priority
+from sequencing_report_service.models.job_record import JobRecord
 from sequencing_report_service.repositiories.job_repo import JobRepository
 
 
@@ -59,3 +62,115 @@ class TestJobRepo(object):
             job_again = repo.get_one_pending_job()
 
             assert job_again is None
+
+    def test_get_jobs_page(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            for i in range(5):
+                repo.add_job(command_with_env={'command': [f'job{i}'], 'environment': {}})
+
+            first_page = repo.get_jobs_page(limit=2)
+            assert [job.job_id for job in first_page] == [1, 2]
+
+            second_page = repo.get_jobs_page(after=first_page[-1].job_id, limit=2)
+            assert [job.job_id for job in second_page] == [3, 4]
+
+            last_page = repo.get_jobs_page(after=4, limit=2)
+            assert [job.job_id for job in last_page] == [5]
+
+    def test_get_jobs_page_with_filters(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            for i in range(4):
+                repo.add_job(command_with_env={'command': [f'job{i}'], 'environment': {}})
+            repo.set_state_of_job(2, State.DONE)
+            repo.set_state_of_job(3, State.ERROR)
+
+            jobs = repo.get_jobs_page(states=[State.DONE, State.ERROR])
+            assert [job.job_id for job in jobs] == [2, 3]
+
+            now = datetime.datetime.utcnow()
+            assert repo.get_jobs_page(created_after=now + datetime.timedelta(days=1)) == []
+            assert len(repo.get_jobs_page(created_before=now + datetime.timedelta(days=1))) == 4
+            assert [job.job_id for job in repo.get_jobs_page(
+                updated_after=now - datetime.timedelta(days=1))] == [2, 3]
+
+    def test_get_job_record(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            job = repo.add_job(command_with_env={'command': ['foo', 'bar'], 'environment': {'FOO': 'bar'}})
+
+            record = repo.get_job_record(job.job_id)
+            assert isinstance(record, JobRecord)
+            assert record.to_dict() == job.to_dict()
+
+            assert repo.get_job_record(1111) is None
+
+    def test_set_resource_usage_of_job(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            job = repo.add_job(command_with_env={'command': ['foo'], 'environment': {}})
+            repo.set_resource_usage_of_job(job.job_id, cpu_user_seconds=1.5, max_rss_kb=2048, wall_time_seconds=3.0)
+
+            resource_usage = repo.get_job_record(job.job_id).to_dict()['resource_usage']
+            assert resource_usage['cpu_user_seconds'] == 1.5
+            assert resource_usage['max_rss_kb'] == 2048
+            assert resource_usage['wall_time_seconds'] == 3.0
+            assert resource_usage['block_input_ops'] is None
+
+    def test_get_in_flight_job_id(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            job = repo.add_job(command_with_env={'command': ['foo'], 'environment': {}}, request_key='abc')
+            assert repo.get_in_flight_job_id('abc') == job.job_id
+            assert repo.get_in_flight_job_id('def') is None
+
+            repo.set_state_of_job(job.job_id, State.DONE)
+            assert repo.get_in_flight_job_id('abc') is None
+
+    def test_has_job_with_request_key(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            job = repo.add_job(command_with_env={'command': ['foo'], 'environment': {}}, request_key='abc')
+            repo.set_state_of_job(job.job_id, State.ERROR)
+            assert repo.has_job_with_request_key('abc')
+            assert not repo.has_job_with_request_key('def')
+
+    def test_get_done_job_id(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            job = repo.add_job(command_with_env={'command': ['foo'], 'environment': {}}, input_fingerprint='abc')
+            assert repo.get_done_job_id('abc') is None
+
+            repo.set_state_of_job(job.job_id, State.DONE)
+            assert repo.get_done_job_id('abc') == job.job_id
+            assert repo.get_done_job_id('def') is None
+
+    def test_get_pending_jobs(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            for pipeline in ['foo', 'bar', 'foo']:
+                repo.add_job(command_with_env={'command': ['foo'], 'environment': {}}, pipeline=pipeline)
+            repo.set_state_of_job(1, State.READY)
+
+            assert repo.get_pending_jobs() == [(2, 'bar'), (3, 'foo')]
+            assert repo.get_queue_position(3) == 2
+
+    def test_clear_out_stale_jobs_at_startup(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            for _ in range(2):
+                repo.add_job(command_with_env={'command': ['foo'], 'environment': {}})
+            repo.set_state_of_job(1, State.STARTED)
+            repo.set_state_of_job(2, State.READY)
+
+            repo.clear_out_stale_jobs_at_startup()
+
+            assert repo.get_job(1).state == State.CANCELLED
+            assert repo.get_job(2).state == State.PENDING
+
+    def test_get_next_pending_job(self, db_session_factory):
+        with JobRepository(db_session_factory) as repo:
+            repo.add_job(command_with_env={'command': ['foo'], 'environment': {}}, pipeline='foo',
+                         priority=Priority.BULK)
+            repo.add_job(command_with_env={'command': ['foo'], 'environment': {}}, pipeline='foo')
+            repo.add_job(command_with_env={'command': ['bar'], 'environment': {}}, pipeline='bar',
+                         priority=Priority.URGENT)
+
+            assert sorted(repo.get_pending_pipelines()) == ['bar', 'foo']
+            assert repo.get_next_pending_job('foo') == (2, Priority.NORMAL)
+            assert repo.get_next_pending_job('baz') is None
+            assert repo.get_pending_jobs() == [(3, 'bar'), (2, 'foo'), (1, 'foo')]
+            assert repo.get_one_pending_job().job_id == 3
+            assert repo.get_queue_position(1) == 3
@@ -0,0 +1,63 @@
+import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+import pytest
+
+from sequencing_report_service.models.db_models import SQLAlchemyBase
+from sequencing_report_service.repositiories.metrics_repo import MetricsRepository
+
+
+class TestMetricsRepo(object):
+
+    @pytest.fixture
+    def db_session_factory(self):
+        engine = create_engine('sqlite:///:memory:', echo=False)
+        SQLAlchemyBase.metadata.create_all(engine)
+
+        session_factory = scoped_session(sessionmaker())
+        session_factory.configure(bind=engine)
+        return session_factory
+
+    @pytest.fixture
+    def metrics_repo(self, db_session_factory):
+        with MetricsRepository(db_session_factory) as repo:
+            for day, (runfolder, version) in enumerate([("foo", "v1"), ("bar", "v1"), ("foo", "v2"), ("baz", "v1")]):
+                repo.add_report_metrics(
+                    runfolder, version, datetime.datetime(2024, 1, day + 1),
+                    [("Sample_1", "FastQC.percent_duplicates", 10.0 + day), ("Sample_2", "FastQC.total", 5.0)],
+                    [(1, "bcl2fastq.yieldQ30", 100.0 + day)] if runfolder != "baz" else [],
+                )
+            yield repo
+
+    def test_get_ingested_versions(self, metrics_repo):
+        assert metrics_repo.get_ingested_versions() == {("foo", "v1"), ("bar", "v1"), ("foo", "v2"), ("baz", "v1")}
+
+    def test_get_metric_names(self, metrics_repo):
+        assert metrics_repo.get_metric_names() == [
+            {"metric": "FastQC.percent_duplicates", "level": "sample"},
+            {"metric": "FastQC.total", "level": "sample"},
+            {"metric": "bcl2fastq.yieldQ30", "level": "lane"},
+        ]
+
+    def test_get_metric(self, metrics_repo):
+        reports = metrics_repo.get_metric("bcl2fastq.yieldQ30", level="lane")
+        assert [(report["runfolder"], report["version"]) for report in reports] == [("bar", "v1"), ("foo", "v2")]
+        assert reports[1]["values"] == [{"lane": 1, "value": 102.0}]
+
+        reports = metrics_repo.get_metric("FastQC.percent_duplicates", all_versions=True, limit=3)
+        assert [(report["runfolder"], report["version"]) for report in reports] == \
+            [("bar", "v1"), ("foo", "v2"), ("baz", "v1")]
+        assert reports[0]["values"] == [{"sample": "Sample_1", "value": 11.0}]
+        assert reports[0]["report_time"] == datetime.datetime(2024, 1, 2)
+
+    def test_get_metric_with_filters(self, metrics_repo):
+        reports = metrics_repo.get_metric("FastQC.total", all_versions=True,
+                                          since=datetime.datetime(2024, 1, 2), until=datetime.datetime(2024, 1, 4))
+        assert [(report["runfolder"], report["version"]) for report in reports] == [("bar", "v1"), ("foo", "v2")]
+
+        reports = metrics_repo.get_metric("FastQC.total", runfolders=["foo"], all_versions=True)
+        assert [report["version"] for report in reports] == ["v1", "v2"]
+
+        assert metrics_repo.get_metric("no_such_metric") == []
@@ -0,0 +1,162 @@
+import os
+import tempfile
+from pathlib import Path
+
+import mock
+import pytest
+
+from sequencing_report_service.exceptions import RunfolderNotFound
+from sequencing_report_service.repositiories.reports_repo import ReportsRepository
+
+
+class TestReportsRepository(object):
+    @pytest.fixture
+    def reports_dir(self):
+        with tempfile.TemporaryDirectory() as reports_dir:
+            for version in ["v1", "v2", "current"]:
+                os.makedirs(Path(reports_dir) / "2019" / "foo_runfolder" / "reports" / version)
+            os.makedirs(Path(reports_dir) / "2020" / "bar_runfolder" / "reports" / "v1")
+            yield Path(reports_dir)
+
+    def test_get_report_with_version(self, reports_dir):
+        repo = ReportsRepository(reports_dir)
+        assert repo.rescan()
+
+        with mock.patch.object(ReportsRepository, "_bf_search") as bf_search:
+            assert repo.get_report_with_version("foo_runfolder", "v1") == \
+                reports_dir / "2019" / "foo_runfolder" / "reports" / "v1" / "multiqc_report.html"
+            assert repo.get_current_report_for_runfolder("bar_runfolder") == \
+                reports_dir / "2020" / "bar_runfolder" / "reports" / "current" / "multiqc_report.html"
+            bf_search.assert_not_called()
+
+    def test_get_report_without_index(self, reports_dir):
+        repo = ReportsRepository(reports_dir)
+        assert repo.get_report_with_version("foo_runfolder", "v1") == \
+            reports_dir / "2019" / "foo_runfolder" / "reports" / "v1" / "multiqc_report.html"
+        with pytest.raises(RunfolderNotFound):
+            repo.get_report_with_version("baz_runfolder", "v1")
+
+    def test_get_all_report_versions_for_runfolder(self, reports_dir):
+        repo = ReportsRepository(reports_dir)
+        repo.rescan()
+        assert list(repo.get_all_report_versions_for_runfolder("foo_runfolder")) == ["current", "v1", "v2"]
+
+        with mock.patch("os.listdir") as listdir:
+            assert list(repo.get_all_report_versions_for_runfolder("foo_runfolder")) == ["current", "v1", "v2"]
+            listdir.assert_not_called()
+
+        os.mkdir(reports_dir / "2019" / "foo_runfolder" / "reports" / "v3")
+        repo.rescan()
+        assert list(repo.get_all_report_versions_for_runfolder("foo_runfolder")) == ["current", "v1", "v2", "v3"]
+
+    def test_rescan(self, reports_dir):
+        repo = ReportsRepository(reports_dir)
+        repo.rescan()
+        assert not repo.rescan()
+
+        os.makedirs(reports_dir / "2021" / "baz_runfolder" / "reports" / "v1")
+        assert repo.rescan()
+        with mock.patch.object(ReportsRepository, "_bf_search", return_value=None):
+            assert repo.get_report_with_version("baz_runfolder", "v1") == \
+                reports_dir / "2021" / "baz_runfolder" / "reports" / "v1" / "multiqc_report.html"
+
+    def test_rescan_while_versions_are_cached(self, reports_dir):
+        repo = ReportsRepository(reports_dir)
+        repo.rescan()
+        repo.get_report_versions("foo_runfolder")
+
+        # Another thread caches the versions of a runfolder while the rescan runs
+        stat = os.stat
+
+        def stat_and_cache(path, *args, **kwargs):
+            if Path(path).name == "reports" and "bar_runfolder" not in repo._versions:
+                repo._versions["bar_runfolder"] = (0, [])
+            return stat(path, *args, **kwargs)
+
+        with mock.patch("os.stat", side_effect=stat_and_cache):
+            repo.rescan()
+        assert [version["version"] for version in repo.get_report_versions("foo_runfolder")] == \
+            ["current", "v1", "v2"]
+
+    def test_missing_runfolder_is_remembered(self, reports_dir):
+        repo = ReportsRepository(reports_dir, negative_cache_ttl=60)
+        repo.rescan()
+        assert not repo.is_cached("baz_runfolder")
+
+        with pytest.raises(RunfolderNotFound):
+            repo.get_report_with_version("baz_runfolder", "v1")
+        assert repo.is_cached("baz_runfolder")
+        with mock.patch.object(ReportsRepository, "_bf_search") as bf_search:
+            with pytest.raises(RunfolderNotFound):
+                repo.get_report_with_version("baz_runfolder", "v1")
+            bf_search.assert_not_called()
+
+        os.makedirs(reports_dir / "2020" / "baz_runfolder" / "reports" / "v1")
+        repo.rescan()
+        assert repo.get_report_with_version("baz_runfolder", "v1") == \
+            reports_dir / "2020" / "baz_runfolder" / "reports" / "v1" / "multiqc_report.html"
+
+    def test_missing_runfolder_is_forgotten_after_ttl(self, reports_dir):
+        repo = ReportsRepository(reports_dir, negative_cache_ttl=60)
+        with mock.patch("time.monotonic", return_value=1000):
+            with pytest.raises(RunfolderNotFound):
+                repo.get_report_with_version("baz_runfolder", "v1")
+
+        os.makedirs(reports_dir / "2020" / "baz_runfolder" / "reports" / "v1")
+        with mock.patch("time.monotonic", return_value=1030):
+            with pytest.raises(RunfolderNotFound):
+                repo.get_report_with_version("baz_runfolder", "v1")
+        with mock.patch("time.monotonic", return_value=1061):
+            assert repo.get_report_with_version("baz_runfolder", "v1") == \
+                reports_dir / "2020" / "baz_runfolder" / "reports" / "v1" / "multiqc_report.html"
+
+    def test_search_time_budget(self, reports_dir):
+        repo = ReportsRepository(reports_dir, search_time_budget=0)
+        with pytest.raises(RunfolderNotFound):
+            repo.get_report_with_version("foo_runfolder", "v1")
+        # Runfolders which could not be searched for in time are not remembered as missing
+        assert not repo.is_cached("foo_runfolder")
+
+    def test_warm(self, reports_dir):
+        repo = ReportsRepository(reports_dir)
+        repo.warm("foo_runfolder")
+        repo.warm("baz_runfolder")
+        assert repo.is_cached("foo_runfolder")
+        assert repo.is_cached("baz_runfolder")
+
+    def test_get_runfolders(self, reports_dir):
+        repo = ReportsRepository(reports_dir)
+        repo.rescan()
+        assert repo.get_runfolders() == ["bar_runfolder", "foo_runfolder"]
+
+    def test_get_report_versions(self, reports_dir):
+        reports = reports_dir / "2019" / "foo_runfolder" / "reports"
+        (reports / "v1" / "multiqc_report.html").write_text("<html>v1</html>")
+        os.rmdir(reports / "current")
+        os.symlink("v1", reports / "current")
+        repo = ReportsRepository(reports_dir)
+        repo.rescan()
+
+        current, v1, v2 = repo.get_report_versions("foo_runfolder")
+        assert current["version"] == "current"
+        assert current["target"] == "v1"
+        assert current["path"] == (reports / "v1" / "multiqc_report.html").resolve()
+        assert current["size"] == v1["size"] == len("<html>v1</html>")
+        assert v1["target"] is None
+        assert v2["size"] is None
+
+        with mock.patch("os.scandir") as scandir:
+            assert repo.get_report_versions("foo_runfolder")[0]["target"] == "v1"
+            repo.rescan()
+            scandir.assert_not_called()
+
+        os.unlink(reports / "current")
+        os.symlink("v2", reports / "current")
+        repo.rescan()
+        assert repo.get_report_versions("foo_runfolder")[0]["target"] == "v2"
+
+        # A report written to an existing version directory
+        (reports / "v2" / "multiqc_report.html").write_text("<html>v2</html>")
+        repo.rescan()
+        current, _, v2 = repo.get_report_versions("foo_runfolder")
+        assert current["size"] == v2["size"] == len("<html>v2</html>")
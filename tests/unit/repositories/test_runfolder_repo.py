@@ -0,0 +1,108 @@
+import os
+import tempfile
+from pathlib import Path
+
+import mock
+import pytest
+
+from sequencing_report_service.exceptions import ConfigurationError, RunfolderNotFound
+from sequencing_report_service.repositiories.runfolder_repo import RunfolderRepository
+
+
+class TestRunfolderRepository(object):
+    @pytest.fixture
+    def monitored_dirs(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            os.mkdir(Path(first) / "foo_runfolder")
+            os.mkdir(Path(second) / "foo_runfolder")
+            os.mkdir(Path(second) / "bar_runfolder")
+            yield [first, second]
+
+    def test_monitored_directories_must_be_a_list(self):
+        with pytest.raises(ConfigurationError):
+            RunfolderRepository("/foo")
+
+    def test_get_runfolder(self, monitored_dirs):
+        repo = RunfolderRepository(monitored_dirs)
+        assert repo.rescan()
+
+        with mock.patch.object(Path, "exists") as exists:
+            assert repo.get_runfolder("foo_runfolder") == Path(monitored_dirs[0]) / "foo_runfolder"
+            assert repo.get_runfolder("bar_runfolder") == Path(monitored_dirs[1]) / "bar_runfolder"
+            exists.assert_not_called()
+
+        with pytest.raises(RunfolderNotFound):
+            repo.get_runfolder("baz_runfolder")
+
+    def test_get_runfolder_without_index(self, monitored_dirs):
+        repo = RunfolderRepository(monitored_dirs)
+        assert repo.get_runfolder("bar_runfolder") == Path(monitored_dirs[1]) / "bar_runfolder"
+
+    def test_rescan(self, monitored_dirs):
+        repo = RunfolderRepository(monitored_dirs)
+        repo.rescan()
+        assert not repo.rescan()
+
+        os.mkdir(Path(monitored_dirs[1]) / "baz_runfolder")
+        os.rmdir(Path(monitored_dirs[1]) / "bar_runfolder")
+        assert repo.rescan()
+
+        with mock.patch.object(Path, "exists", return_value=False):
+            assert repo.get_runfolder("baz_runfolder") == Path(monitored_dirs[1]) / "baz_runfolder"
+            with pytest.raises(RunfolderNotFound):
+                repo.get_runfolder("bar_runfolder")
+
+    def test_negative_cache(self, monitored_dirs):
+        repo = RunfolderRepository(monitored_dirs, negative_cache_ttl=60)
+        repo.rescan()
+
+        with pytest.raises(RunfolderNotFound):
+            repo.get_runfolder("baz_runfolder")
+        # Created after the lookup, it is not found until it expires or is rescanned
+        os.mkdir(Path(monitored_dirs[0]) / "baz_runfolder")
+        with mock.patch.object(Path, "exists") as exists:
+            with pytest.raises(RunfolderNotFound):
+                repo.get_runfolder("baz_runfolder")
+            exists.assert_not_called()
+
+        repo.rescan()
+        assert repo.get_runfolder("baz_runfolder") == Path(monitored_dirs[0]) / "baz_runfolder"
+
+    def test_list_runfolders(self, monitored_dirs):
+        repo = RunfolderRepository(monitored_dirs)
+        for name in ["foo_2", "foo_1", "baz"]:
+            os.mkdir(Path(monitored_dirs[1]) / name)
+        repo.rescan()
+
+        def names(runfolders):
+            return [runfolder["name"] for runfolder in runfolders]
+
+        assert names(repo.list_runfolders()) == ["bar_runfolder", "baz", "foo_1", "foo_2", "foo_runfolder"]
+        assert names(repo.list_runfolders(limit=2)) == ["bar_runfolder", "baz"]
+        assert names(repo.list_runfolders(after="baz", limit=2)) == ["foo_1", "foo_2"]
+        assert names(repo.list_runfolders(prefix="foo_")) == ["foo_1", "foo_2", "foo_runfolder"]
+        assert names(repo.list_runfolders(prefix="foo_", after="foo_1")) == ["foo_2", "foo_runfolder"]
+        assert names(repo.list_runfolders(prefix="qux")) == []
+
+    def test_runfolder_metadata(self, monitored_dirs):
+        repo = RunfolderRepository(monitored_dirs)
+        repo.rescan()
+        [runfolder] = repo.list_runfolders(prefix="foo")
+        assert runfolder["monitored_directory"] == monitored_dirs[0]
+        assert not runfolder["rta_complete"]
+        assert not runfolder["copy_complete"]
+
+        path = Path(monitored_dirs[0]) / "foo_runfolder"
+        (path / "RTAComplete.txt").touch()
+        (path / "CopyComplete.txt").touch()
+        os.utime(path, (0, 0))
+        assert repo.rescan() == ["foo_runfolder"]
+        [runfolder] = repo.list_runfolders(prefix="foo")
+        assert runfolder["rta_complete"]
+        assert runfolder["copy_complete"]
+        assert runfolder["mtime"] == 0
+
+        # Complete runfolders are not checked again
+        with mock.patch("os.stat", wraps=os.stat) as stat:
+            assert repo.rescan() == []
+            assert str(path) not in [str(call.args[0]) for call in stat.call_args_list]
@@ -0,0 +1,111 @@
+import datetime
+import os
+import tempfile
+from pathlib import Path
+
+import mock
+import pytest
+
+from sequencing_report_service.repositiories.runfolder_repo import RunfolderRepository
+from sequencing_report_service.services.auto_start_service import AutoStartService
+
+
+class TestAutoStartService(object):
+    @pytest.fixture
+    def monitored_dir(self):
+        with tempfile.TemporaryDirectory() as monitored_dir:
+            for name in ["old_runfolder", "new_runfolder"]:
+                os.mkdir(Path(monitored_dir) / name)
+            (Path(monitored_dir) / "old_runfolder" / "CopyComplete.txt").touch()
+            yield Path(monitored_dir)
+
+    @pytest.fixture
+    def runner_service(self):
+        runner_service = mock.MagicMock()
+        runner_service.has_job_with_idempotency_key.return_value = False
+        runner_service.get_in_flight_job_id.return_value = None
+        runner_service.start.return_value = 1
+        return runner_service
+
+    def test_unknown_marker(self, runner_service):
+        with pytest.raises(ValueError):
+            AutoStartService(runner_service, RunfolderRepository([]), {"seqreports": "done"},
+                             ready_after=datetime.datetime(2020, 1, 1))
+
+    def test_missing_ready_after(self, runner_service):
+        # Without a cutoff, pipelines would be started on every runfolder which has ever been ready
+        with pytest.raises(ValueError):
+            AutoStartService(runner_service, RunfolderRepository([]), {"seqreports": "copy_complete"},
+                             ready_after=None)
+
+    def test_check(self, monitored_dir, runner_service):
+        runfolder_repo = RunfolderRepository([str(monitored_dir)])
+        runfolder_repo.rescan()
+        auto_start_service = AutoStartService(runner_service, runfolder_repo, {"seqreports": "copy_complete"},
+                                              ready_after=datetime.datetime(2020, 1, 1))
+
+        (monitored_dir / "new_runfolder" / "RTAComplete.txt").touch()
+        assert auto_start_service.check(runfolder_repo.rescan()) == []
+
+        (monitored_dir / "new_runfolder" / "CopyComplete.txt").touch()
+        os.utime(monitored_dir / "new_runfolder", (1, 1))
+        assert auto_start_service.check(runfolder_repo.rescan()) == [1]
+        runner_service.start.assert_called_once_with(
+            "seqreports",
+            monitored_dir / "new_runfolder",
+            idempotency_key="auto-start:seqreports:new_runfolder",
+        )
+
+        # Only once
+        assert auto_start_service.check(["new_runfolder"]) == []
+        assert runner_service.start.call_count == 1
+
+    def test_check_existing_job(self, monitored_dir, runner_service):
+        runfolder_repo = RunfolderRepository([str(monitored_dir)])
+        auto_start_service = AutoStartService(runner_service, runfolder_repo, {"seqreports": "copy_complete"},
+                                              ready_after=datetime.datetime(2020, 1, 1))
+        runner_service.has_job_with_idempotency_key.return_value = True
+
+        assert auto_start_service.check(runfolder_repo.rescan()) == []
+        runner_service.has_job_with_idempotency_key.assert_called_once_with("auto-start:seqreports:old_runfolder")
+        runner_service.start.assert_not_called()
+
+    def test_check_all(self, monitored_dir, runner_service):
+        runfolder_repo = RunfolderRepository([str(monitored_dir)])
+        runfolder_repo.rescan()
+        auto_start_service = AutoStartService(runner_service, runfolder_repo, {"seqreports": "copy_complete"},
+                                              ready_after=datetime.datetime(2020, 1, 1))
+
+        # Runfolders which became ready while the service was down are started on
+        assert auto_start_service.check_all() == [1]
+        runner_service.start.assert_called_once_with(
+            "seqreports",
+            monitored_dir / "old_runfolder",
+            idempotency_key="auto-start:seqreports:old_runfolder",
+        )
+
+    def test_check_ready_after(self, monitored_dir, runner_service):
+        os.utime(monitored_dir / "old_runfolder" / "CopyComplete.txt", (1, 1))
+        runfolder_repo = RunfolderRepository([str(monitored_dir)])
+        runfolder_repo.rescan()
+        auto_start_service = AutoStartService(runner_service, runfolder_repo, {"seqreports": "copy_complete"},
+                                              ready_after=datetime.datetime(2020, 1, 1))
+
+        # Runfolders which were ready before the cutoff are left alone
+        assert auto_start_service.check_all() == []
+
+        (monitored_dir / "new_runfolder" / "CopyComplete.txt").touch()
+        assert auto_start_service.check(runfolder_repo.rescan()) == [1]
+        runner_service.start.assert_called_once()
+
+    def test_check_in_flight_job(self, monitored_dir, runner_service):
+        runfolder_repo = RunfolderRepository([str(monitored_dir)])
+        runfolder_repo.rescan()
+        auto_start_service = AutoStartService(runner_service, runfolder_repo, {"seqreports": "copy_complete"},
+                                              ready_after=datetime.datetime(2020, 1, 1))
+        runner_service.get_in_flight_job_id.return_value = 2
+
+        # The pipeline is already running on the runfolder, e.g. started manually
+        assert auto_start_service.check_all() == []
+        runner_service.get_in_flight_job_id.assert_called_once_with("seqreports", monitored_dir / "old_runfolder")
+        runner_service.start.assert_not_called()
@@ -4,16 +4,25 @@ import asyncio
 import mock
 import tempfile
 import os
+import subprocess
 import time
 
 import pytest
 
-from sequencing_report_service.services.local_runner_service import LocalRunnerService
-from sequencing_report_service.models.db_models import Job, State
+from sequencing_report_service.services.local_runner_service import LocalRunnerService, EXIT_CODE_FILE, \
+    TRACE_FILE, _process_start_time
+from sequencing_report_service.models.db_models import Job, State, Priority
 
 from tests.test_utils import MockJobRepository
 
 
+async def _wait_for_running_jobs(local_runner_service):
+    for _ in range(50):
+        if not local_runner_service.get_queue_status()["running"]:
+            return
+        await asyncio.sleep(0.1)
+
+
 class TestLocalRunnerService(object):
     @pytest.fixture
     def job_repo_factory(self):
@@ -29,15 +38,17 @@ class TestLocalRunnerService(object):
 
     @pytest.mark.asyncio
     @mock.patch(
-        "sequencing_report_service.services.local_runner_service.nextflow_command",
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
         return_value={
             "command": ["nextflow", "run", "socks"],
             "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
         },
     )
     async def test_start(
             self,
-            mock_nextflow_command,
+            mock_plan_nextflow_command,
             job_repo_factory,
             nextflow_log_dirs,
             ):
@@ -56,15 +67,106 @@ class TestLocalRunnerService(object):
 
     @pytest.mark.asyncio
     @mock.patch(
-        "sequencing_report_service.services.local_runner_service.nextflow_command",
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
+        return_value={
+            "command": ["nextflow", "run", "socks"],
+            "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
+        },
+    )
+    async def test_start_coalesces_duplicate_requests(
+            self,
+            mock_plan_nextflow_command,
+            job_repo_factory,
+            nextflow_log_dirs,
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            nextflow_log_dirs,
+            max_concurrent_jobs=0,
+        )
+
+        job_id = local_runner_service.start("seqreports", "foo_runfolder")
+        assert local_runner_service.start("seqreports", "foo_runfolder") == job_id
+        assert mock_plan_nextflow_command.call_count == 1
+
+        # Other arguments, or another idempotency key, start a new job
+        assert local_runner_service.start("seqreports", "foo_runfolder", ext_args=["--foo"]) != job_id
+        keyed_job_id = local_runner_service.start("seqreports", "foo_runfolder", idempotency_key="abc")
+        assert keyed_job_id != job_id
+        assert local_runner_service.start("seqreports", "bar_runfolder", idempotency_key="abc") == keyed_job_id
+        assert local_runner_service.get_in_flight_job_id("seqreports", "foo_runfolder") == job_id
+        assert local_runner_service.get_in_flight_job_id("seqreports", "bar_runfolder") is None
+
+        # Once the job is no longer in flight, the request starts a new job
+        local_runner_service.stop(job_id)
+        assert local_runner_service.start("seqreports", "foo_runfolder") != job_id
+
+    @pytest.mark.asyncio
+    @mock.patch(
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
+        return_value={
+            "command": ["nextflow", "run", "seqreports"],
+            "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
+        },
+    )
+    async def test_start_reuses_finished_job(
+            self,
+            mock_plan_nextflow_command,
+            job_repo_factory,
+            nextflow_log_dirs,
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            nextflow_log_dirs,
+            max_concurrent_jobs=0,
+        )
+        runfolder = tempfile.mkdtemp()
+        with open(os.path.join(runfolder, "RTAComplete.txt"), "w") as f:
+            f.write("done")
+        samplesheet_path = os.path.join(runfolder, "seqreports_samplesheet.csv")
+        mock_plan_nextflow_command.return_value = {
+            **mock_plan_nextflow_command.return_value,
+            "input_samplesheet_path": samplesheet_path,
+            "input_samplesheet_content": "sample,lane",
+        }
+
+        job_id = local_runner_service.start("seqreports", runfolder)
+        with local_runner_service._job_repo_factory() as job_repo:
+            job_repo.set_state_of_job(job_id, State.DONE)
+        os.remove(samplesheet_path)
+
+        # Reusing the results does not write the samplesheet to the runfolder
+        assert local_runner_service.start("seqreports", runfolder) == job_id
+        assert not os.path.exists(samplesheet_path)
+
+        forced_job_id = local_runner_service.start("seqreports", runfolder, idempotency_key="rerun", force=True)
+        assert forced_job_id != job_id
+        local_runner_service.stop(forced_job_id)
+
+        # A changed runfolder invalidates the results
+        with open(os.path.join(runfolder, "RTAComplete.txt"), "w") as f:
+            f.write("done again")
+        assert local_runner_service.start("seqreports", runfolder) not in (job_id, forced_job_id)
+
+    @pytest.mark.asyncio
+    @mock.patch(
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
         return_value={
             "command": ["nextflow", "run", "socks"],
             "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
         },
     )
     async def test_stop(
             self,
-            mock_nextflow_command,
+            mock_plan_nextflow_command,
             job_repo_factory,
             nextflow_log_dirs
             ):
@@ -83,6 +185,45 @@ class TestLocalRunnerService(object):
         assert local_runner_service.get_job(stopped_id).state == State.CANCELLED
         assert stopped_id == job_id
 
+    @mock.patch(
+        "sequencing_report_service.services.local_runner_service.get_config_template",
+        return_value=mock.MagicMock(digest="abc"),
+    )
+    @mock.patch(
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
+        return_value={
+            "command": ["nextflow", "run", "seqreports"],
+            "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
+        },
+    )
+    def test_plan(
+            self,
+            mock_plan_nextflow_command,
+            mock_get_config_template,
+            job_repo_factory,
+            nextflow_log_dirs,
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            nextflow_log_dirs,
+        )
+
+        plan = local_runner_service.plan("seqreports", "foo_runfolder")
+        assert plan["command"] == ["nextflow", "run", "seqreports"]
+        assert plan["reusable_job_id"] is None
+        assert local_runner_service.plan("seqreports", "foo_runfolder") == plan
+        assert mock_plan_nextflow_command.call_count == 1
+        with local_runner_service._job_repo_factory() as job_repo:
+            assert job_repo.get_jobs() == []
+
+        # A new version of the config is rendered again
+        mock_get_config_template.return_value = mock.MagicMock(digest="def")
+        local_runner_service.plan("seqreports", "foo_runfolder")
+        assert mock_plan_nextflow_command.call_count == 2
+
     @pytest.mark.asyncio
     async def test_start_process(
             self,
@@ -96,7 +237,7 @@ class TestLocalRunnerService(object):
         )
 
         command_with_env = {
-            "command": ["sleep", "1"],
+            "command": ["sleep", "1", "&&", "echo", "done"],
             "environment": {},
         }
 
@@ -109,6 +250,14 @@ class TestLocalRunnerService(object):
 
             job = job_repo.get_job(job_id)
             assert job.state == State.DONE
+            assert job.log_offset == len(b"done\n")
+            assert job.last_log_line == "done"
+            assert job.wall_time_seconds >= 1
+            assert job.cpu_user_seconds is not None
+            assert job.max_rss_kb > 0
+
+        with local_runner_service.open_job_log(job_id) as log_file:
+            assert log_file.read() == b"done\n"
 
     @pytest.mark.asyncio
     async def test_start_process_fail(
@@ -136,3 +285,184 @@ class TestLocalRunnerService(object):
 
             job = job_repo.get_job(job_id)
             assert job.state == State.ERROR
+
+    @pytest.mark.asyncio
+    async def test_run_job_fails_to_start(
+            self,
+            job_repo_factory,
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            "/path/to/missing/log/dirs",
+        )
+
+        with local_runner_service._job_repo_factory() as job_repo:
+            job_id = job_repo.add_job(command_with_env={"command": ["true"], "environment": {}}).job_id
+
+        assert local_runner_service.process_job_queue() == [job_id]
+        await _wait_for_running_jobs(local_runner_service)
+        assert local_runner_service.get_job(job_id).state == State.ERROR
+        assert local_runner_service.get_queue_status()["running"] == []
+
+    def test_open_job_log_from_db(
+            self,
+            job_repo_factory,
+            nextflow_log_dirs
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            nextflow_log_dirs,
+        )
+
+        with local_runner_service._job_repo_factory() as job_repo:
+            job = job_repo.add_job(command_with_env={"command": ["foo"], "environment": {}})
+            job_repo.set_state_of_job(job.job_id, State.DONE, cmd_log="legacy log")
+
+        with local_runner_service.open_job_log(job.job_id) as log_file:
+            assert log_file.read() == b"legacy log"
+
+        assert local_runner_service.open_job_log(1111) is None
+
+    @pytest.mark.asyncio
+    @mock.patch(
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
+        return_value={
+            "command": ["sleep", "0.5"],
+            "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
+        },
+    )
+    async def test_concurrency_limits(
+            self,
+            mock_plan_nextflow_command,
+            job_repo_factory,
+            nextflow_log_dirs
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            nextflow_log_dirs,
+            max_concurrent_jobs=2,
+            max_concurrent_jobs_per_pipeline={"seqreports": 1},
+        )
+
+        first_id = local_runner_service.start("seqreports", "foo_runfolder")
+        second_id = local_runner_service.start("seqreports", "bar_runfolder")
+        third_id = local_runner_service.start("socks", "foo_runfolder")
+        fourth_id = local_runner_service.start("socks", "bar_runfolder")
+
+        queue_status = local_runner_service.get_queue_status()
+        assert queue_status["running"] == [first_id, third_id]
+        assert queue_status["pending"] == [second_id, fourth_id]
+        assert local_runner_service.get_queue_position(second_id) == 1
+        assert local_runner_service.get_queue_position(fourth_id) == 2
+
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            if local_runner_service.get_queue_status()["running"] == [second_id, fourth_id]:
+                break
+
+        assert local_runner_service.get_job(first_id).state == State.DONE
+        assert local_runner_service.get_job(second_id).state == State.STARTED
+        assert local_runner_service.get_queue_status()["running"] == [second_id, fourth_id]
+        await _wait_for_running_jobs(local_runner_service)
+
+    @pytest.mark.asyncio
+    @mock.patch(
+        "sequencing_report_service.services.local_runner_service.plan_nextflow_command",
+        return_value={
+            "command": ["sleep", "0.1"],
+            "environment": {},
+            "input_samplesheet_path": None,
+            "input_samplesheet_content": None,
+        },
+    )
+    async def test_priority_and_fair_share(
+            self,
+            mock_plan_nextflow_command,
+            job_repo_factory,
+            nextflow_log_dirs
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            nextflow_log_dirs,
+            max_concurrent_jobs=0,
+        )
+
+        bulk_id = local_runner_service.start("seqreports", "runfolder_1", priority=Priority.BULK)
+        seqreports_ids = [local_runner_service.start("seqreports", f"runfolder_{i}") for i in range(2, 4)]
+        socks_id = local_runner_service.start("socks", "runfolder_1")
+        urgent_id = local_runner_service.start("seqreports", "flowcell", priority=Priority.URGENT)
+
+        assert local_runner_service.get_queue_status()["pending"] == [
+            urgent_id, *seqreports_ids, socks_id, bulk_id]
+        assert local_runner_service.get_queue_position(urgent_id) == 1
+        assert local_runner_service.get_queue_position(bulk_id) == 5
+
+        local_runner_service._max_concurrent_jobs = 3
+        started = local_runner_service.process_job_queue()
+
+        # The urgent job goes first, then the socks pipeline gets its share
+        # even though its job was queued after the seqreports jobs.
+        assert started == [urgent_id, socks_id, seqreports_ids[0]]
+        await _wait_for_running_jobs(local_runner_service)
+
+    @pytest.mark.asyncio
+    async def test_reattach_running_jobs(
+            self,
+            job_repo_factory,
+            nextflow_log_dirs
+            ):
+        local_runner_service = LocalRunnerService(
+            job_repo_factory,
+            "/path/to/config/dir",
+            nextflow_log_dirs,
+            adopted_job_poll_interval=0.1,
+        )
+
+        process = subprocess.Popen(["sleep", "0.5"], start_new_session=True)
+        with local_runner_service._job_repo_factory() as job_repo:
+            running_job = job_repo.add_job(command_with_env={"command": ["sleep"], "environment": {}})
+            finished_job = job_repo.add_job(command_with_env={"command": ["false"], "environment": {}})
+            stale_job = job_repo.add_job(command_with_env={"command": ["foo"], "environment": {}})
+            for job in (running_job, finished_job, stale_job):
+                job_repo.set_state_of_job(job.job_id, State.STARTED)
+                os.mkdir(os.path.join(nextflow_log_dirs, str(job.job_id)))
+            job_repo.set_pid_of_job(running_job.job_id, process.pid, _process_start_time(process.pid))
+            # A pid which has been reused by another process
+            job_repo.set_pid_of_job(stale_job.job_id, process.pid, "1")
+
+        finished_dir = os.path.join(nextflow_log_dirs, str(finished_job.job_id))
+        with open(os.path.join(finished_dir, EXIT_CODE_FILE), "w") as f:
+            f.write("1\n")
+        with open(os.path.join(finished_dir, "nextflow.out"), "w") as f:
+            f.write("[ab/123456] Submitted process > FASTQC (1)\nERROR ~ Error executing process")
+        with open(os.path.join(finished_dir, TRACE_FILE), "w") as f:
+            f.write("task_id\tprocess\tstatus\n1\tFASTQC\tFAILED\n")
+
+        assert local_runner_service.reattach_running_jobs() == [running_job.job_id]
+        assert local_runner_service.get_job(running_job.job_id).state == State.STARTED
+        finished = local_runner_service.get_job(finished_job.job_id)
+        assert finished.state == State.ERROR
+        # The rest of the log and trace file of the job which finished while
+        # the service was down have been ingested
+        assert finished.tasks_submitted == 1
+        assert finished.last_log_line == "ERROR ~ Error executing process"
+        assert finished.trace_offset == os.path.getsize(os.path.join(finished_dir, TRACE_FILE))
+        assert local_runner_service.get_job(stale_job.job_id).state == State.CANCELLED
+        assert local_runner_service.get_queue_status()["running"] == [running_job.job_id]
+
+        with open(os.path.join(nextflow_log_dirs, str(running_job.job_id), EXIT_CODE_FILE), "w") as f:
+            f.write("0\n")
+        for _ in range(20):
+            await asyncio.sleep(0.1)
+            process.poll()
+            if local_runner_service.get_job(running_job.job_id).state != State.STARTED:
+                break
+
+        assert local_runner_service.get_job(running_job.job_id).state == State.DONE
+        assert local_runner_service.get_queue_status()["running"] == []
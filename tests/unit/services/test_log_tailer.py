@@ -0,0 +1,133 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+from sequencing_report_service.models.db_models import SQLAlchemyBase
+from sequencing_report_service.repositiories.job_repo import JobRepository
+from sequencing_report_service.services.log_tailer import LogTailer, read_new_lines
+
+from tests.test_utils import MockJobRepository
+
+
+class TestLogTailer(object):
+    @pytest.fixture
+    def job_repo_factory(self):
+        data = []
+
+        def f():
+            return MockJobRepository(data)
+        return f
+
+    @pytest.fixture
+    def log_path(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            yield Path(log_dir) / "nextflow.out"
+
+    def test_read_new_lines(self, log_path):
+        log_path.write_text("first\nsecond\nthi")
+
+        lines, offset = read_new_lines(log_path, 0)
+        assert lines == ["first", "second"]
+        assert offset == len("first\nsecond\n")
+
+        with open(log_path, "a") as log_file:
+            log_file.write("rd\nfour")
+
+        lines, offset = read_new_lines(log_path, offset)
+        assert lines == ["third"]
+
+        lines, offset = read_new_lines(log_path, offset, final=True)
+        assert lines == ["four"]
+        assert offset == log_path.stat().st_size
+
+    def test_read_new_lines_missing_file(self, log_path):
+        assert read_new_lines(log_path, 0) == ([], 0)
+
+    def test_ingest(self, job_repo_factory, log_path):
+        with job_repo_factory() as job_repo:
+            job_id = job_repo.add_job(command_with_env={"command": ["nextflow"], "environment": {}}).job_id
+
+        log_tailer = LogTailer(job_repo_factory)
+        log_path.write_text(
+            "N E X T F L O W  ~  version 23.04.1\n"
+            "[6a/1f03c2] Submitted process > FASTQC (sample_1)\n"
+            "[3b/99ab01] Cached process > MULTIQC\n"
+        )
+        assert log_tailer.ingest(job_id, log_path) == 3
+
+        with open(log_path, "a") as log_file:
+            log_file.write("[0c/42de7f] Submitted process > FASTQC (sample_2)\n")
+        assert log_tailer.ingest(job_id, log_path) == 1
+
+        with job_repo_factory() as job_repo:
+            progress = job_repo.get_job(job_id).to_dict()["progress"]
+        assert progress == {
+            "log_bytes": log_path.stat().st_size,
+            "tasks_submitted": 2,
+            "tasks_cached": 1,
+            "last_log_line": "[0c/42de7f] Submitted process > FASTQC (sample_2)",
+        }
+
+    def test_ingest_trace(self, log_path):
+        engine = create_engine('sqlite:///:memory:', echo=False)
+        SQLAlchemyBase.metadata.create_all(engine)
+        session_factory = scoped_session(sessionmaker())
+        session_factory.configure(bind=engine)
+
+        def job_repo_factory():
+            return JobRepository(session_factory)
+
+        with job_repo_factory() as job_repo:
+            job_id = job_repo.add_job(command_with_env={"command": ["nextflow"], "environment": {}}).job_id
+
+        header = "task_id\thash\tnative_id\tname\tstatus\texit\tsubmit\tduration\trealtime\t%cpu\tpeak_rss" \
+            "\tpeak_vmem\trchar\twchar\n"
+        log_path.write_text(
+            header +
+            "1\t6a/1f03c2\t101\tFASTQC (sample_1)\tCOMPLETED\t0\t2023-05-02 10:00:00.000\t2m\t1m 30s\t98.5%"
+            "\t512 MB\t1 GB\t2 GB\t10 MB\n"
+            "2\t0c/42de7f\t102\tFASTQC (sample_2)\tFAILED\t1\t2023-05-02 10:00:00.000\t1m\t30s\t50.5%"
+            "\t256 MB\t1 GB\t1 GB\t0\n"
+        )
+
+        log_tailer = LogTailer(job_repo_factory)
+        assert log_tailer.ingest_trace(job_id, log_path) == 2
+
+        with open(log_path, "a") as log_file:
+            log_file.write(
+                "3\t3b/99ab01\t103\tMULTIQC\tCOMPLETED\t0\t2023-05-02 10:03:00.000\t3m\t2m 30s\t100.0%"
+                "\t1 GB\t2 GB\t4 GB\t20 MB\n"
+                "4\t3b/99ab02\t-\tMULTIQC\tCOMPLETED\t"
+            )
+        assert log_tailer.ingest_trace(job_id, log_path) == 1
+
+        with job_repo_factory() as job_repo:
+            summary = job_repo.get_task_summary(job_id)
+
+        assert summary == [
+            {
+                "process": "MULTIQC",
+                "tasks": 1,
+                "failed": 0,
+                "total_realtime_ms": 150_000,
+                "max_realtime_ms": 150_000,
+                "mean_cpu_percent": 100.0,
+                "max_peak_rss": 1024 ** 3,
+                "read_bytes": 4 * 1024 ** 3,
+                "write_bytes": 20 * 1024 ** 2,
+            },
+            {
+                "process": "FASTQC",
+                "tasks": 2,
+                "failed": 1,
+                "total_realtime_ms": 120_000,
+                "max_realtime_ms": 90_000,
+                "mean_cpu_percent": 74.5,
+                "max_peak_rss": 512 * 1024 ** 2,
+                "read_bytes": 3 * 1024 ** 3,
+                "write_bytes": 10 * 1024 ** 2,
+            },
+        ]
@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import mock
+import pytest
+
+from sequencing_report_service.repositiories.metrics_repo import MetricsRepository
+from sequencing_report_service.repositiories.reports_repo import ReportsRepository
+from sequencing_report_service.services.metrics_service import MetricsService
+
+
+class TestMetricsService(object):
+    @pytest.fixture
+    def reports_dir(self):
+        with tempfile.TemporaryDirectory() as reports_dir:
+            reports_dir = Path(reports_dir)
+            for version in ["v1", "v2"]:
+                data_dir = reports_dir / "2024" / "foo_runfolder" / "reports" / version / "multiqc_data"
+                os.makedirs(data_dir)
+                with open(data_dir / "multiqc_data.json", "w") as data_file:
+                    json.dump({"report_general_stats_data": [{"Sample_1": {"total_sequences": 1000}}]}, data_file)
+            os.symlink("v2", reports_dir / "2024" / "foo_runfolder" / "reports" / "current")
+            # A report which is still being written
+            os.makedirs(reports_dir / "2024" / "bar_runfolder" / "reports" / "v1")
+            # A report whose MultiQC data is laid out differently than expected
+            data_dir = reports_dir / "2023" / "baz_runfolder" / "reports" / "v1" / "multiqc_data"
+            os.makedirs(data_dir)
+            with open(data_dir / "multiqc_data.json", "w") as data_file:
+                json.dump({"report_general_stats_data": {"Sample_1": {"total_sequences": 1000}}}, data_file)
+            yield reports_dir
+
+    @pytest.mark.asyncio
+    async def test_ingest_new_reports(self, reports_dir):
+        reports_repo = ReportsRepository(reports_dir)
+        reports_repo.rescan()
+        metrics_repo = mock.create_autospec(MetricsRepository)
+        metrics_repo.__enter__.return_value = metrics_repo
+        metrics_repo.get_ingested_versions.return_value = {("foo_runfolder", "v1")}
+        service = MetricsService(lambda: metrics_repo, reports_repo)
+
+        assert await service.ingest_new_reports() == [("foo_runfolder", "v2")]
+        runfolder, version, _, sample_metrics, lane_metrics = metrics_repo.add_report_metrics.call_args.args
+        assert (runfolder, version) == ("foo_runfolder", "v2")
+        assert sample_metrics == [("Sample_1", "total_sequences", 1000.0)]
+        assert lane_metrics == []
+
+        assert await service.ingest_new_reports() == []
+
+        data_dir = reports_dir / "2024" / "bar_runfolder" / "reports" / "v1" / "multiqc_data"
+        os.makedirs(data_dir)
+        with open(data_dir / "multiqc_data.json", "w") as data_file:
+            json.dump({}, data_file)
+        assert await service.ingest_new_reports() == [("bar_runfolder", "v1")]
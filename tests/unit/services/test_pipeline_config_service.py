@@ -0,0 +1,60 @@
+import pathlib
+import shutil
+import tempfile
+
+import pytest
+import yaml
+
+from sequencing_report_service.services.pipeline_config_service import PipelineConfigService
+
+
+class TestPipelineConfigService(object):
+    @pytest.fixture
+    def config_dir(self):
+        with tempfile.TemporaryDirectory() as config_dir:
+            config_dir = pathlib.Path(config_dir)
+            src_path = (pathlib.Path(__file__) / '..' / '..' / '..' / '..').resolve()
+            shutil.copyfile(src_path / "config" / "pipeline_config" / "schema.json", config_dir / "schema.json")
+            self._write_config(config_dir / "foo.yml", "foo/main.nf")
+            yield config_dir
+
+    @staticmethod
+    def _write_config(path, main_workflow_path):
+        with open(path, "w") as config_file:
+            config_file.write(yaml.dump({"main_workflow_path": main_workflow_path}))
+
+    def test_reload(self, config_dir):
+        service = PipelineConfigService(config_dir)
+        assert service.reload() == ["foo"]
+        assert service.reload() == []
+
+        [foo] = service.get_pipelines()
+        assert foo["pipeline"] == "foo"
+        assert foo["error"] is None
+        loaded_hash = foo["config_hash"]
+
+        self._write_config(config_dir / "foo.yml", "foo/another_main.nf")
+        self._write_config(config_dir / "bar.yml", "bar/main.nf")
+        assert sorted(service.reload()) == ["bar", "foo"]
+        assert [pipeline["pipeline"] for pipeline in service.get_pipelines()] == ["bar", "foo"]
+        assert service.get_pipelines()[1]["config_hash"] != loaded_hash
+
+        (config_dir / "bar.yml").unlink()
+        assert service.reload() == ["bar"]
+        assert [pipeline["pipeline"] for pipeline in service.get_pipelines()] == ["foo"]
+
+    def test_reload_broken_config(self, config_dir):
+        service = PipelineConfigService(config_dir)
+        service.reload()
+        loaded_hash = service.get_pipelines()[0]["config_hash"]
+
+        with open(config_dir / "foo.yml", "w") as config_file:
+            config_file.write(yaml.dump({"not_a_workflow": "foo"}))
+        assert service.reload() == ["foo"]
+        [foo] = service.get_pipelines()
+        assert foo["error"]
+        assert foo["config_hash"] == loaded_hash
+
+        self._write_config(config_dir / "foo.yml", "foo/main.nf")
+        assert service.reload() == ["foo"]
+        assert service.get_pipelines()[0]["error"] is None
@@ -0,0 +1,65 @@
+import gzip
+import os
+import tempfile
+from pathlib import Path
+
+import mock
+import pytest
+
+from sequencing_report_service.services.report_compression_service import ReportCompressionService, \
+    accepted_encodings
+
+
+def test_accepted_encodings():
+    assert accepted_encodings(None) == set()
+    assert accepted_encodings("gzip, deflate") == {"gzip", "deflate"}
+    assert accepted_encodings("br;q=0, GZIP;q=0.5, identity") == {"gzip", "identity"}
+
+
+class TestReportCompressionService(object):
+    @pytest.fixture
+    def report_path(self):
+        with tempfile.TemporaryDirectory() as reports_dir:
+            report_path = Path(reports_dir) / "v1" / "multiqc_report.html"
+            report_path.parent.mkdir()
+            report_path.write_text("<html>MultiQC</html>")
+            yield report_path
+
+    def test_build_variant(self, report_path):
+        service = ReportCompressionService(encodings=["gzip"])
+        assert service.get_variant(report_path, {"gzip"}) == (None, None)
+
+        variant_path = service.build_variant(report_path, "gzip")
+        assert variant_path == report_path.parent / "multiqc_report.html.gz"
+        assert gzip.decompress(variant_path.read_bytes()) == b"<html>MultiQC</html>"
+        assert service.get_variant(report_path, {"gzip"}) == ("gzip", variant_path)
+        assert service.get_variant(report_path, {"deflate"}) == (None, None)
+
+    def test_stale_variant(self, report_path):
+        service = ReportCompressionService(encodings=["gzip"])
+        variant_path = service.build_variant(report_path, "gzip")
+
+        report_path.write_text("<html>MultiQC v2</html>")
+        os.utime(report_path, ns=(0, os.stat(variant_path).st_mtime_ns + 1))
+        assert service.get_variant(report_path, {"gzip"}) == (None, None)
+        service.build_variant(report_path, "gzip")
+        assert gzip.decompress(variant_path.read_bytes()) == b"<html>MultiQC v2</html>"
+
+    def test_cache_dir(self, report_path):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            service = ReportCompressionService(cache_dir=cache_dir, encodings=["gzip"])
+            variant_path = service.build_variant(report_path, "gzip")
+            assert variant_path.parent == Path(cache_dir) / report_path.resolve().parent.relative_to("/")
+            assert not (report_path.parent / "multiqc_report.html.gz").exists()
+
+    def test_get_encodings(self, report_path):
+        service = ReportCompressionService(encodings=["gzip"])
+        report_mtime = os.stat(report_path).st_mtime_ns
+        assert service.get_encodings(report_path, report_mtime) == []
+
+        service.build_variant(report_path, "gzip")
+        resolved_path = report_path.resolve()
+        with mock.patch("os.stat") as stat:
+            assert service.get_encodings(resolved_path, report_mtime) == ["gzip"]
+            stat.assert_not_called()
+        assert service.get_encodings(resolved_path, report_mtime + 1) == []